@@ -1,5 +1,7 @@
 import logging
-from typing import Any
+import math
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 
 import uvicorn
 from fastapi import FastAPI
@@ -7,15 +9,26 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 
 from app.config import get_config
-from app.container import setup_container
+from app.container import (
+    get_async_nvi_service,
+    get_async_pseudonym_service,
+    get_invalidation_listener,
+    get_validation_executor,
+    setup_container,
+)
+from app.db.retry import CircuitOpenError, RequestDeadlineMiddleware
 from app.metadata.fhir import (
     OperationOutcome,
     OperationOutcomeDetail,
     OperationOutcomeIssue,
+    warm_up_resource_classes,
 )
+from app.routers.bundle import router as bundle_router
 from app.routers.default import router as default_router
+from app.routers.export import router as export_router
 from app.routers.health import router as health_router
 from app.routers.resource import router as resource_router
+from app.routers.resource_async import router as async_resource_router
 from app.stats import StatsdMiddleware, setup_stats
 from app.telemetry import setup_telemetry
 
@@ -55,6 +68,10 @@ def create_fastapi_app() -> FastAPI:
     if get_config().telemetry.enabled:
         setup_telemetry(fastapi)
 
+    # Every worker creates its own app, and listens for the writes of the other workers
+    if get_config().app.resource_cache_enabled and get_config().database.invalidation_enabled:
+        get_invalidation_listener().start()
+
     return fastapi
 
 
@@ -62,6 +79,9 @@ def application_init() -> None:
     setup_container()
     setup_logging()
 
+    if get_config().app.fhir_warmup:
+        warm_up_resource_classes()
+
 
 def setup_logging() -> None:
     loglevel = logging.getLevelName(get_config().app.loglevel.upper())
@@ -74,6 +94,19 @@ def setup_logging() -> None:
     )
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    yield
+
+    # Stop the validation workers, so they do not outlive the application (for instance on a reload)
+    get_validation_executor().shutdown()
+
+    # The asynchronous services keep pooled HTTP clients, which are closed on shutdown
+    if get_config().app.async_mode:
+        await get_async_pseudonym_service().aclose()
+        await get_async_nvi_service().aclose()
+
+
 def setup_fastapi() -> FastAPI:
     config = get_config()
 
@@ -89,18 +122,27 @@ def setup_fastapi() -> FastAPI:
             docs_url=config.uvicorn.docs_url,
             redoc_url=config.uvicorn.redoc_url,
             openapi_tags=tags_metadata,
+            lifespan=lifespan,
         )
         if config.uvicorn.swagger_enabled
-        else FastAPI(docs_url=None, redoc_url=None)
+        else FastAPI(docs_url=None, redoc_url=None, lifespan=lifespan)
     )
 
-    routers = [default_router, health_router, resource_router]
+    routers = [
+        default_router,
+        health_router,
+        async_resource_router if config.app.async_mode else resource_router,
+        bundle_router,
+        export_router,
+    ]
     for router in routers:
         fastapi.include_router(router)
 
+    fastapi.add_middleware(RequestDeadlineMiddleware, timeout=config.app.request_deadline)
     if get_config().stats.enabled:
         fastapi.add_middleware(StatsdMiddleware, module_name=get_config().stats.module_name or "default")
 
+    fastapi.add_exception_handler(CircuitOpenError, circuit_open_exception_handler)
     fastapi.add_exception_handler(Exception, default_fhir_exception_handler)
 
     return fastapi
@@ -121,3 +163,25 @@ def default_fhir_exception_handler(request: Request, exc: Exception) -> JSONResp
     )
 
     return JSONResponse(status_code=500, content=outcome.model_dump())
+
+
+def circuit_open_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+    """
+    Fail fast while the database is unavailable, and tell the client when to try again
+    """
+    retry_after = exc.retry_after if isinstance(exc, CircuitOpenError) else 0
+    outcome = OperationOutcome(
+        issue=[
+            OperationOutcomeIssue(
+                severity="error",
+                code="transient",
+                details=OperationOutcomeDetail(text=f"{exc}"),
+            )
+        ]
+    )
+
+    return JSONResponse(
+        status_code=503,
+        content=outcome.model_dump(),
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
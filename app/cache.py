@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+"""
+This module contains a small thread-safe in-memory cache with LRU eviction and an optional time-to-live per entry.
+Next to the maximum number of entries, the cache can be limited to a memory budget, for which the size of every
+value is measured with the given sizeof function.
+
+Usage:
+
+    cache = TtlLruCache[str, int](max_size=100, ttl=60)
+    cache.set("foo", 1)
+    cache.get("foo")  # 1, or None when expired or evicted
+"""
+
+
+class TtlLruCache(Generic[K, V]):
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        max_bytes: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+    ) -> None:
+        if max_size <= 0:
+            raise ValueError("max_size must be greater than 0")
+        if max_bytes is not None and sizeof is None:
+            raise ValueError("sizeof is required with max_bytes")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[K, tuple[float | None, int, V]] = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, key: K) -> V | None:
+        """
+        Returns the cached value for the key, or None when the key is not cached or has expired
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+
+            expires_at, _, value = item
+            if expires_at is not None and expires_at <= self._clock():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: K, value: V) -> None:
+        """
+        Stores a value in the cache, evicting the least recently used entries when the cache is full. A value that
+        is larger than the memory budget by itself is not stored.
+        """
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        size = self._sizeof(value) if self._sizeof is not None else 0
+
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+
+            while len(self._entries) > self.max_size or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        """
+        Removes a single key from the cache
+        """
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_where(self, predicate: Callable[[K], bool]) -> None:
+        """
+        Removes all keys matching the predicate. This walks over all entries, so it is meant for rare invalidations.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the cache
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def bytes(self) -> int:
+        """
+        Total size of the cached values, as measured by sizeof
+        """
+        return self._bytes
+
+    def _remove(self, key: K) -> None:
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key) is not None  # type: ignore[arg-type]
@@ -19,24 +19,57 @@ class LogLevel(str, Enum):
 class ConfigApp(BaseModel):
     loglevel: LogLevel = Field(default=LogLevel.info)
     provider_id: str
+    async_mode: bool = Field(default=False)
+    fhir_warmup: bool = Field(default=True)
+    search_streaming: bool = Field(default=False)
+    search_stream_batch_size: int = Field(default=100, gt=0)
+    search_max_count: int = Field(default=1000, gt=0)
+    bundle_max_entries: int = Field(default=1000, gt=0)
+    validation_workers: int = Field(default=0, ge=0)
+    validation_chunk_size: int = Field(default=50, gt=0)
+    export_dir: str = Field(default="exports")
+    export_batch_size: int = Field(default=1000, gt=0)
+    resource_cache_enabled: bool = Field(default=False)
+    resource_cache_max_size: int = Field(default=10000, gt=0)
+    resource_cache_max_bytes: int = Field(default=64 * 1024 * 1024, gt=0)
+    request_deadline: float = Field(default=30.0, gt=0)
 
 
 class ConfigDatabase(BaseModel):
     dsn: str
     create_tables: bool = Field(default=False)
     retry_backoff: list[float] = Field(default=[0.1, 0.2, 0.4, 0.8, 1.6, 3.2, 4.8, 6.4, 10.0])
+    retry_deadline: float = Field(default=10.0, gt=0)
+    breaker_failure_threshold: int = Field(default=5, gt=0)
+    breaker_reset_timeout: float = Field(default=30.0, gt=0)
     pool_size: int = Field(default=5, ge=0, lt=100)
     max_overflow: int = Field(default=10, ge=0, lt=100)
     pool_pre_ping: bool = Field(default=False)
     pool_recycle: int = Field(default=3600, ge=0)
+    invalidation_enabled: bool = Field(default=False)
+    invalidation_reconnect_delay: float = Field(default=5.0, gt=0)
 
 
 class ConfigNVIAPI(BaseModel):
     mock: bool = Field(default=False)
     endpoint: str
+    timeout: int = Field(default=30, gt=0)
     mtls_cert: str | None = Field(default=None)
     mtls_key: str | None = Field(default=None)
     mtls_ca: str | None = Field(default=None)
+    pool_connections: int = Field(default=10, gt=0)
+    pool_maxsize: int = Field(default=10, gt=0)
+    pool_block: bool = Field(default=False)
+    keep_alive: bool = Field(default=True)
+    outbox_enabled: bool = Field(default=False)
+    outbox_batch_size: int = Field(default=100, gt=0)
+    outbox_max_attempts: int = Field(default=10, gt=0)
+    outbox_backoff: float = Field(default=5.0, gt=0)
+    outbox_backoff_max: float = Field(default=3600.0, gt=0)
+    outbox_poll_interval: float = Field(default=5.0, gt=0)
+    outbox_lease: float = Field(default=300.0, gt=0)
+    registry_enabled: bool = Field(default=False)
+    registry_cache_size: int = Field(default=100000, gt=0)
 
 
 class ConfigPseudonymApi(BaseModel):
@@ -46,6 +79,13 @@ class ConfigPseudonymApi(BaseModel):
     mtls_cert: str | None = Field(default=None)
     mtls_key: str | None = Field(default=None)
     mtls_ca: str | None = Field(default=None)
+    pool_connections: int = Field(default=10, gt=0)
+    pool_maxsize: int = Field(default=10, gt=0)
+    pool_block: bool = Field(default=False)
+    keep_alive: bool = Field(default=True)
+    cache_enabled: bool = Field(default=False)
+    cache_ttl: int = Field(default=300, gt=0)
+    cache_max_size: int = Field(default=10000, gt=0)
 
 
 class ConfigUvicorn(BaseModel):
@@ -1,16 +1,40 @@
+from typing import Iterator
+
 import inject
+from fastapi import Depends
 
 from app.config import Config, get_config
-from app.db.db import Database
+from app.db.db import AsyncDatabase, Database
+from app.db.invalidation import InvalidationListener
+from app.db.session import DbSession
+from app.metadata.caching_adapter import AsyncCachingMetadataAdapter, CacheState, CachingMetadataAdapter
+from app.metadata.db.async_db_adapter import AsyncDbMetadataAdapter
 from app.metadata.db.db_adapter import DbMetadataAdapter
-from app.metadata.metadata_service import MetadataService
-from app.services.mock_nvi_api_service import MockNVIAPIService
-from app.services.nvi_api_service import NVIAPIService, NVIAPIServiceInterface
+from app.metadata.metadata_service import AsyncMetadataAdapter, AsyncMetadataService, MetadataAdapter, MetadataService
+from app.metadata.validation import ValidationExecutor
+from app.services.export_service import ExportService
+from app.services.mock_nvi_api_service import AsyncMockNVIAPIService, MockNVIAPIService
+from app.services.nvi_api_service import (
+    AsyncNVIAPIService,
+    AsyncNVIAPIServiceInterface,
+    NVIAPIService,
+    NVIAPIServiceInterface,
+)
 from app.services.pseudonym_service import (
+    AsyncCachedPseudonymService,
+    AsyncMockPseudonymService,
+    AsyncPseudonymService,
+    AsyncPseudonymServiceInterface,
+    CachedPseudonymService,
     MockPseudonymService,
     PseudonymService,
     PseudonymServiceInterface,
 )
+from app.services.referral_registry import (
+    AsyncRegistryNVIAPIService,
+    ReferralRegistry,
+    RegistryNVIAPIService,
+)
 
 
 def container_config(binder: inject.Binder) -> None:
@@ -19,11 +43,44 @@ def container_config(binder: inject.Binder) -> None:
     db = Database(dsn=config.database.dsn, create_tables=config.database.create_tables)
     binder.bind(Database, db)
 
-    metadata_service = MetadataService(DbMetadataAdapter(db))
+    validation_executor = ValidationExecutor(
+        workers=config.app.validation_workers,
+        chunk_size=config.app.validation_chunk_size,
+    )
+    binder.bind(ValidationExecutor, validation_executor)
+
+    adapter: MetadataAdapter = DbMetadataAdapter(db)
+    cache_state: CacheState | None = None
+    if config.app.resource_cache_enabled:
+        caching_adapter = CachingMetadataAdapter(
+            adapter,
+            max_size=config.app.resource_cache_max_size,
+            max_bytes=config.app.resource_cache_max_bytes,
+        )
+        adapter = caching_adapter
+        cache_state = caching_adapter.state
+
+        if config.database.invalidation_enabled:
+            listener = InvalidationListener(
+                config.database.dsn,
+                [caching_adapter],
+                reconnect_delay=config.database.invalidation_reconnect_delay,
+            )
+            binder.bind(InvalidationListener, listener)
+
+    metadata_service = MetadataService(adapter, validation_executor)
     binder.bind(MetadataService, metadata_service)
 
+    binder.bind(ExportService, ExportService(db, config.app.export_dir, config.app.export_batch_size))
+
+    registry = ReferralRegistry(db, cache_size=config.nvi_api.registry_cache_size)
+    binder.bind(ReferralRegistry, registry)
+
     _bind_pseudonym_service(config, binder)
-    _bind_nvi_api_service(config, binder)
+    _bind_nvi_api_service(config, registry, binder)
+
+    if config.app.async_mode:
+        _bind_async_services(config, registry, cache_state, binder)
 
 
 def get_nvi_service() -> NVIAPIServiceInterface:
@@ -31,31 +88,92 @@ def get_nvi_service() -> NVIAPIServiceInterface:
 
 
 def _bind_pseudonym_service(config: Config, binder: inject.Binder) -> None:
+    pseudonym_service: PseudonymServiceInterface
     if config.pseudonym_api.mock:
-        binder.bind(PseudonymServiceInterface, MockPseudonymService())
-        return
-
-    pseudonym_service = PseudonymService(
-        endpoint=config.pseudonym_api.endpoint,
-        timeout=config.pseudonym_api.timeout,
-        mtls_cert=config.pseudonym_api.mtls_cert,
-        mtls_key=config.pseudonym_api.mtls_key,
-        mtls_ca=config.pseudonym_api.mtls_ca,
-    )
+        pseudonym_service = MockPseudonymService()
+    else:
+        pseudonym_service = PseudonymService(
+            endpoint=config.pseudonym_api.endpoint,
+            timeout=config.pseudonym_api.timeout,
+            mtls_cert=config.pseudonym_api.mtls_cert,
+            mtls_key=config.pseudonym_api.mtls_key,
+            mtls_ca=config.pseudonym_api.mtls_ca,
+            pool_connections=config.pseudonym_api.pool_connections,
+            pool_maxsize=config.pseudonym_api.pool_maxsize,
+            pool_block=config.pseudonym_api.pool_block,
+            keep_alive=config.pseudonym_api.keep_alive,
+        )
+
+    if config.pseudonym_api.cache_enabled:
+        pseudonym_service = CachedPseudonymService(
+            pseudonym_service,
+            ttl=config.pseudonym_api.cache_ttl,
+            max_size=config.pseudonym_api.cache_max_size,
+        )
+
     binder.bind(PseudonymServiceInterface, pseudonym_service)
 
 
-def _bind_nvi_api_service(config: Config, binder: inject.Binder) -> None:
+def _bind_nvi_api_service(config: Config, registry: ReferralRegistry, binder: inject.Binder) -> None:
+    service: NVIAPIServiceInterface
     if config.nvi_api.mock:
-        binder.bind(NVIAPIServiceInterface, MockNVIAPIService())
-        return
+        service = MockNVIAPIService()
+    else:
+        service = NVIAPIService(
+            config=config.nvi_api,
+        )
+
+    if config.nvi_api.registry_enabled:
+        service = RegistryNVIAPIService(service, registry)
 
-    service = NVIAPIService(
-        config=config.nvi_api,
-    )
     binder.bind(NVIAPIServiceInterface, service)
 
 
+def _bind_async_services(
+    config: Config, registry: ReferralRegistry, cache_state: CacheState | None, binder: inject.Binder
+) -> None:
+    async_db = AsyncDatabase(dsn=config.database.dsn)
+    binder.bind(AsyncDatabase, async_db)
+
+    adapter: AsyncMetadataAdapter = AsyncDbMetadataAdapter(async_db)
+    if cache_state is not None:
+        # Share the cache of the synchronous adapter, which is the one registered for invalidation
+        adapter = AsyncCachingMetadataAdapter(adapter, cache_state)
+    binder.bind(AsyncMetadataService, AsyncMetadataService(adapter))
+
+    pseudonym_service: AsyncPseudonymServiceInterface
+    if config.pseudonym_api.mock:
+        pseudonym_service = AsyncMockPseudonymService()
+    else:
+        pseudonym_service = AsyncPseudonymService(
+            endpoint=config.pseudonym_api.endpoint,
+            timeout=config.pseudonym_api.timeout,
+            mtls_cert=config.pseudonym_api.mtls_cert,
+            mtls_key=config.pseudonym_api.mtls_key,
+            mtls_ca=config.pseudonym_api.mtls_ca,
+            pool_maxsize=config.pseudonym_api.pool_maxsize,
+            pool_block=config.pseudonym_api.pool_block,
+            keep_alive=config.pseudonym_api.keep_alive,
+        )
+
+    if config.pseudonym_api.cache_enabled:
+        pseudonym_service = AsyncCachedPseudonymService(
+            pseudonym_service,
+            ttl=config.pseudonym_api.cache_ttl,
+            max_size=config.pseudonym_api.cache_max_size,
+        )
+
+    binder.bind(AsyncPseudonymServiceInterface, pseudonym_service)
+
+    nvi_api_service: AsyncNVIAPIServiceInterface = (
+        AsyncMockNVIAPIService() if config.nvi_api.mock else AsyncNVIAPIService(config=config.nvi_api)
+    )
+    if config.nvi_api.registry_enabled:
+        nvi_api_service = AsyncRegistryNVIAPIService(nvi_api_service, registry)
+
+    binder.bind(AsyncNVIAPIServiceInterface, nvi_api_service)
+
+
 def get_database() -> Database:
     return inject.instance(Database)
 
@@ -64,9 +182,48 @@ def get_metadata_service() -> MetadataService:
     return inject.instance(MetadataService)
 
 
+def get_unit_of_work() -> Iterator[DbSession]:
+    """
+    Request scoped database session, which is committed when the request is handled without errors
+    """
+    with get_database().unit_of_work() as db_session:
+        yield db_session
+
+
+def get_request_metadata_service(db_session: DbSession = Depends(get_unit_of_work)) -> MetadataService:
+    """
+    Metadata service that does all database work of the request in the unit of work of the request
+    """
+    return get_metadata_service().with_session(db_session)
+
+
+def get_validation_executor() -> ValidationExecutor:
+    return inject.instance(ValidationExecutor)
+
+
+def get_export_service() -> ExportService:
+    return inject.instance(ExportService)
+
+
+def get_invalidation_listener() -> InvalidationListener:
+    return inject.instance(InvalidationListener)
+
+
 def get_pseudonym_service() -> PseudonymServiceInterface:
     return inject.instance(PseudonymServiceInterface)  # type: ignore
 
 
+def get_async_metadata_service() -> AsyncMetadataService:
+    return inject.instance(AsyncMetadataService)
+
+
+def get_async_pseudonym_service() -> AsyncPseudonymServiceInterface:
+    return inject.instance(AsyncPseudonymServiceInterface)  # type: ignore
+
+
+def get_async_nvi_service() -> AsyncNVIAPIServiceInterface:
+    return inject.instance(AsyncNVIAPIServiceInterface)  # type: ignore
+
+
 def setup_container() -> None:
     inject.configure(container_config)
@@ -0,0 +1,4 @@
+from app.cron import main
+
+if __name__ == "__main__":
+    main()
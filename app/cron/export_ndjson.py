@@ -0,0 +1,40 @@
+import argparse
+import logging
+from datetime import datetime
+from typing import Any
+
+import inject
+
+from app.services.export_service import ExportService
+
+logger = logging.getLogger(__name__)
+
+
+class ExportNdjsonCommand:
+    """
+    Exports the current resources to NDJSON files, with one file per resource type
+    """
+
+    @inject.autoparams()
+    def __init__(self, service: ExportService) -> None:
+        self.service = service
+
+    def init_arguments(self, subparser: Any) -> None:
+        parser = subparser.add_parser("export-ndjson", help="export resources to NDJSON files")
+        parser.add_argument("output", help="directory to write the NDJSON files to")
+        parser.add_argument("--type", help="comma separated resource types to export")
+        parser.add_argument(
+            "--since",
+            type=datetime.fromisoformat,
+            help="only export resources changed since this ISO 8601 time",
+        )
+
+    def run(self, args: argparse.Namespace) -> int:
+        resource_types = [t.strip() for t in args.type.split(",") if t.strip()] if args.type else None
+
+        files = self.service.export(args.output, resource_types, args.since)
+        for file in files:
+            logger.info("Exported %d %s resources to %s", file.count, file.type, file.filename)
+
+        logger.info("Exported %d resources", sum(file.count for file in files))
+        return 0
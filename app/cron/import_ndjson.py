@@ -0,0 +1,119 @@
+import argparse
+import json
+import logging
+from itertools import islice
+from typing import IO, Any
+
+import inject
+
+from app.data import Pseudonym
+from app.db.db import Database
+from app.db.repository.resource_entry import ResourceEntryRepository, ResourceWrite
+from app.metadata.validation import ValidationExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ImportNdjsonCommand:
+    """
+    Imports resources from FHIR NDJSON files, with one resource per line. A line can start with the pseudonym of
+    the resource, separated from the resource by a tab. Pseudonyms are stored as-is, so they must already be
+    pseudonyms of this register.
+
+    Files are read and validated in chunks, and every chunk is stored in a single transaction.
+    """
+
+    @inject.autoparams()
+    def __init__(self, db: Database, validation_executor: ValidationExecutor) -> None:
+        self.db = db
+        self.validation_executor = validation_executor
+
+    def init_arguments(self, subparser: Any) -> None:
+        parser = subparser.add_parser("import-ndjson", help="import resources from NDJSON files")
+        parser.add_argument("files", nargs="+", help="NDJSON files to import")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="number of lines per transaction")
+
+    def run(self, args: argparse.Namespace) -> int:
+        imported = 0
+        invalid = 0
+
+        for filename in args.files:
+            with open(filename, "r") as file:
+                file_imported, file_invalid = self.import_file(filename, file, args.chunk_size)
+
+            logger.info("Imported %d resources from %s, %d lines were invalid", file_imported, filename, file_invalid)
+            imported += file_imported
+            invalid += file_invalid
+
+        logger.info("Imported %d resources, %d lines were invalid", imported, invalid)
+        return 0 if invalid == 0 else 1
+
+    def import_file(self, filename: str, file: IO[str], chunk_size: int) -> tuple[int, int]:
+        """
+        Import all lines of the file, returns the number of imported resources and invalid lines
+        """
+        imported = 0
+        invalid = 0
+        line_number = 0
+
+        while lines := list(islice(file, chunk_size)):
+            resources: list[tuple[int, Pseudonym | None, dict[str, Any]]] = []
+            for line in lines:
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    resources.append((line_number, *parse_line(line)))
+                except ValueError as e:
+                    logger.error("%s:%d: %s", filename, line_number, e)
+                    invalid += 1
+
+            validations = self.validation_executor.validate_many(
+                [(data["resourceType"], data["id"], data) for _, _, data in resources]
+            )
+
+            writes = []
+            for (number, pseudonym, data), validation in zip(resources, validations):
+                if validation.error is not None:
+                    logger.error("%s:%d: %s", filename, number, validation.error)
+                    invalid += 1
+                    continue
+
+                writes.append(
+                    ResourceWrite(
+                        resource_type=data["resourceType"],
+                        resource_id=data["id"],
+                        data=data,
+                        pseudonym=pseudonym,
+                        resource_json=validation.resource_json,
+                    )
+                )
+
+            if writes:
+                with self.db.get_db_session() as session:
+                    imported += session.get_repository(ResourceEntryRepository).import_many(writes)
+
+        return imported, invalid
+
+
+def parse_line(line: str) -> tuple[Pseudonym | None, dict[str, Any]]:
+    """
+    Parse a line of an NDJSON file, with an optional pseudonym column
+    """
+    line = line.strip()
+
+    pseudonym = None
+    if not line.startswith("{"):
+        value, _, line = line.partition("\t")
+        pseudonym = Pseudonym(value)
+
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("Line is not a resource")
+    if not isinstance(data.get("resourceType"), str) or not isinstance(data.get("id"), str):
+        raise ValueError("Resource must have a resourceType and id string")
+
+    return pseudonym, data
@@ -0,0 +1,49 @@
+import argparse
+import logging
+import time
+from typing import Any
+
+import inject
+
+from app.config import get_config
+from app.db.db import Database
+from app.services.nvi_api_service import NVIAPIServiceInterface
+from app.services.referral_outbox_service import ReferralOutboxService
+
+logger = logging.getLogger(__name__)
+
+
+class ReferralOutboxCommand:
+    """
+    Sends the queued referrals in the referral outbox to the NVI
+    """
+
+    @inject.autoparams()
+    def __init__(self, db: Database, nvi_api_service: NVIAPIServiceInterface) -> None:
+        config = get_config().nvi_api
+        self.poll_interval = config.outbox_poll_interval
+        self.service = ReferralOutboxService(
+            db=db,
+            nvi_api_service=nvi_api_service,
+            batch_size=config.outbox_batch_size,
+            max_attempts=config.outbox_max_attempts,
+            backoff=config.outbox_backoff,
+            backoff_max=config.outbox_backoff_max,
+            lease=config.outbox_lease,
+        )
+
+    def init_arguments(self, subparser: Any) -> None:
+        parser = subparser.add_parser("referral-outbox", help="send queued referrals to the NVI")
+        parser.add_argument("--once", action="store_true", help="stop when there are no referrals due")
+
+    def run(self, args: argparse.Namespace) -> int:
+        while True:
+            count = self.service.dispatch_batch()
+            if count > 0:
+                logger.info("Processed %d referrals from the outbox", count)
+                continue
+
+            if args.once:
+                return 0
+
+            time.sleep(self.poll_interval)
@@ -0,0 +1,53 @@
+import argparse
+import logging
+from datetime import datetime
+from typing import Any
+
+import inject
+from sqlalchemy import text
+
+from app.db.db import Database
+
+logger = logging.getLogger(__name__)
+
+# Years of the entries that were stored in the default partition, because their partition did not exist yet
+DEFAULT_PARTITION_YEARS = "select distinct extract(year from created_dt)::integer from resource_entry_default"
+
+CREATE_PARTITION = "select resource_entry_create_partition(:year)"
+
+
+class ResourcePartitionsCommand:
+    """
+    Creates the yearly partitions of the resource history (resource_entry) ahead of time. Entries of a year without
+    a partition end up in the default partition, those are moved into the partition of their year when it is
+    created. Only the history on Postgres is partitioned, on other databases this command does nothing.
+    """
+
+    @inject.autoparams()
+    def __init__(self, db: Database) -> None:
+        self.db = db
+
+    def init_arguments(self, subparser: Any) -> None:
+        parser = subparser.add_parser("resource-partitions", help="create the yearly partitions of the history")
+        parser.add_argument(
+            "--years-ahead", type=int, default=2, help="number of years after the current year to create"
+        )
+
+    def run(self, args: argparse.Namespace) -> int:
+        with self.db.get_db_session() as session:
+            if "postgresql" not in session.get_dialect():
+                logger.info("The resource history is only partitioned on Postgres")
+                return 0
+
+            current_year = datetime.now().year
+            years = set(range(current_year, current_year + args.years_ahead + 1))
+            years.update(session.execute(text(DEFAULT_PARTITION_YEARS)).scalars())
+            session.commit()
+
+            # Every partition is created in a transaction of its own, as it locks the default partition
+            for year in sorted(years):
+                session.execute(text(CREATE_PARTITION), {"year": year})
+                session.commit()
+                logger.info("Partition of %d is in place", year)
+
+        return 0
@@ -1,5 +1,8 @@
+import base64
+import binascii
 import uuid
 from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
 from typing import Any, Optional
 
@@ -53,3 +56,34 @@ class Pseudonym:
 
     def __repr__(self) -> str:
         return f"Pseudonym({self.value})"
+
+
+@dataclass(frozen=True)
+class PageCursor:
+    """
+    Position in a keyset paged result, pointing at the (created_dt, id) of the last entry of a page (or the first
+    entry, when paging backwards). It is handed to clients as an opaque string.
+    """
+
+    created_dt: datetime
+    id: uuid.UUID
+    backwards: bool = False
+
+    def encode(self) -> str:
+        value = f"{'p' if self.backwards else 'n'}|{self.created_dt.isoformat()}|{self.id}"
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, value: str) -> "PageCursor":
+        """
+        Decode a cursor created by encode(), raises ValueError when the cursor is malformed
+        """
+        try:
+            decoded = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+            direction, created_dt, id = decoded.split("|")
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise ValueError("Malformed cursor")
+        if direction not in ("n", "p"):
+            raise ValueError("Malformed cursor")
+
+        return cls(datetime.fromisoformat(created_dt), uuid.UUID(id), direction == "p")
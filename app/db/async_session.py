@@ -0,0 +1,59 @@
+import logging
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.db.retry import get_retry_policy
+from app.db.session import DbSession
+
+"""
+This module contains the AsyncDbSession class, the asynchronous counterpart of DbSession. The repositories are
+written against the synchronous DbSession interface, so instead of duplicating them, the AsyncDbSession runs
+repository code on the synchronous view of the AsyncSession. All database IO is still done on the event loop.
+
+Usage:
+
+    async with AsyncDbSession(engine) as session:
+        entries = await session.run_sync(lambda s: s.get_repository(MyModelRepository).find_all())
+"""
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncDbSession:
+    def __init__(self, engine: AsyncEngine) -> None:
+        self._engine = engine
+
+    async def __aenter__(self) -> "AsyncDbSession":
+        """
+        Create a new session when entering the context manager
+        """
+        self.session = AsyncSession(self._engine, expire_on_commit=False)
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        """
+        Close the session when exiting the context manager
+        """
+        await self.session.close()
+
+    async def run_sync(self, f: Callable[[DbSession], T]) -> T:
+        """
+        Run a function that expects a (synchronous) DbSession, like repository calls. The function is retried as a
+        whole on database errors, waiting on the event loop instead of blocking it.
+        """
+        return await get_retry_policy().call_async(
+            lambda: self.session.run_sync(lambda session: f(DbSession.from_session(session, retry=False))),
+            rollback=self.session.rollback,
+        )
+
+    async def stream_scalars(self, stmt: Select[tuple[T]], batch_size: int) -> AsyncIterator[T]:
+        """
+        Iterate over the results of a statement with a server-side cursor, fetching batch_size rows at a time
+        """
+        result = await self.session.stream_scalars(stmt.execution_options(yield_per=batch_size))
+        async for row in result:
+            yield row
@@ -1,9 +1,13 @@
 import logging
+from contextlib import contextmanager
+from typing import Iterator
 
-from sqlalchemy import StaticPool, create_engine, text
+from sqlalchemy import NullPool, StaticPool, create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import Session
 
 from app.config import get_config
+from app.db.async_session import AsyncDbSession
 from app.db.models import Base
 from app.db.session import DbSession
 
@@ -59,3 +63,58 @@ class Database:
 
     def get_db_session(self) -> DbSession:
         return DbSession(self.engine)
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[DbSession]:
+        """
+        Opens a single session for multiple operations, for instance all operations of a request. Transactions begun
+        within the unit of work join its transaction, which is committed when the unit of work ends, or rolled back
+        when it ends with an error.
+        """
+        with DbSession(self.engine, unit_of_work=True) as session:
+            try:
+                yield session
+            except BaseException:
+                session.rollback()
+                raise
+            session.commit()
+
+
+def async_dsn(dsn: str) -> str:
+    """
+    Returns the DSN for the asynchronous driver of the given database. Psycopg supports both modes with the same
+    DSN, sqlite needs the aiosqlite driver.
+    """
+    if dsn.startswith("sqlite://"):
+        return dsn.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return dsn
+
+
+class AsyncDatabase:
+    """
+    Asynchronous counterpart of Database. Tables are generated by the synchronous Database, which means that
+    in-memory sqlite databases cannot be shared between both.
+    """
+
+    def __init__(self, dsn: str):
+        try:
+            if "sqlite" in dsn:
+                # Sqlite connections cannot be shared between event loops, so we do not pool them
+                self.engine = create_async_engine(async_dsn(dsn), poolclass=NullPool)
+            else:
+                config = get_config()
+                self.engine = create_async_engine(
+                    async_dsn(dsn),
+                    echo=False,
+                    pool_pre_ping=config.database.pool_pre_ping,
+                    pool_recycle=config.database.pool_recycle,
+                    pool_size=config.database.pool_size,
+                    max_overflow=config.database.max_overflow,
+                )
+
+        except BaseException as e:
+            logger.error("Error while connecting to database: %s", e)
+            raise e
+
+    def get_db_session(self) -> AsyncDbSession:
+        return AsyncDbSession(self.engine)
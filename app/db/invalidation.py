@@ -0,0 +1,169 @@
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Protocol, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from app.config import get_config
+from app.db.session import DbSession
+
+"""
+Invalidation bus for the in-process caches of the workers, on top of Postgres LISTEN/NOTIFY. Writes send a
+notification with the key of the written resource in the same transaction, so it is only delivered when the write
+is committed. Every worker runs an InvalidationListener that hands the notifications to its caches.
+
+Notifications are not queued while a worker is not listening, so the listener flushes the caches completely every
+time it (re)connects.
+"""
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "resource_invalidation"
+
+
+@dataclass(frozen=True)
+class Invalidation:
+    """
+    Key of a written resource. A flush invalidates everything, for instance after a bulk import.
+    """
+
+    resource_type: str | None = None
+    resource_id: str | None = None
+    pseudonym: str | None = None
+    deleted: bool = False
+    flush: bool = False
+
+    def encode(self) -> str:
+        if self.flush:
+            return json.dumps({"flush": True})
+        return json.dumps(
+            {"type": self.resource_type, "id": self.resource_id, "pseudonym": self.pseudonym, "deleted": self.deleted}
+        )
+
+    @classmethod
+    def decode(cls, payload: str) -> "Invalidation":
+        """
+        Decode a notification payload, raises ValueError when it is malformed
+        """
+        try:
+            data = json.loads(payload)
+        except json.JSONDecodeError:
+            raise ValueError("Malformed invalidation")
+        if not isinstance(data, dict):
+            raise ValueError("Malformed invalidation")
+        if data.get("flush"):
+            return cls(flush=True)
+        if not isinstance(data.get("type"), str) or not isinstance(data.get("id"), str):
+            raise ValueError("Malformed invalidation")
+
+        return cls(
+            resource_type=data["type"],
+            resource_id=data["id"],
+            pseudonym=data.get("pseudonym"),
+            deleted=bool(data.get("deleted")),
+        )
+
+
+class InvalidationHandler(Protocol):
+    def invalidate(self, invalidation: Invalidation) -> None: ...
+
+    def flush(self) -> None: ...
+
+
+def notify(db_session: DbSession, invalidations: Sequence[Invalidation]) -> None:
+    """
+    Send the invalidations within the current transaction. Only Postgres supports notifications, and only when
+    enabled in the configuration.
+    """
+    if not invalidations or not get_config().database.invalidation_enabled:
+        return
+    if "postgresql" not in db_session.get_dialect():
+        return
+
+    db_session.execute(
+        text("select pg_notify(:channel, :payload)"),
+        [{"channel": INVALIDATION_CHANNEL, "payload": invalidation.encode()} for invalidation in invalidations],
+    )
+
+
+class InvalidationListener:
+    """
+    Listens for invalidations on a dedicated connection in a background thread, and reconnects when the
+    connection is lost. The handlers are flushed on every (re)connect, as notifications sent while not listening
+    are lost.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        handlers: Sequence[InvalidationHandler],
+        reconnect_delay: float = 5.0,
+        poll_timeout: float = 1.0,
+    ):
+        # The listener uses psycopg directly instead of a connection from the SQLAlchemy pool
+        self.conninfo = make_url(dsn).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.handlers = handlers
+        self.reconnect_delay = reconnect_delay
+        self.poll_timeout = poll_timeout
+        self.connected = False
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, name="invalidation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def run(self) -> None:
+        import psycopg
+
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True) as connection:
+                    connection.execute(f"listen {INVALIDATION_CHANNEL}")
+                    self.connected = True
+                    self.flush()
+                    logger.info("Listening for cache invalidations")
+
+                    while not self._stop.is_set():
+                        for notification in connection.notifies(timeout=self.poll_timeout):
+                            self.handle(notification.payload)
+            except Exception as e:
+                logger.warning("Invalidation listener disconnected: %s", e)
+            finally:
+                self.connected = False
+
+            self._stop.wait(self.reconnect_delay)
+
+    def handle(self, payload: str) -> None:
+        try:
+            invalidation = Invalidation.decode(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed invalidation: %s", payload)
+            return
+
+        if invalidation.flush:
+            self.flush()
+            return
+
+        for handler in self.handlers:
+            self._call(handler.invalidate, invalidation)
+
+    def flush(self) -> None:
+        for handler in self.handlers:
+            self._call(handler.flush)
+
+    @staticmethod
+    def _call(f: Any, *args: Any) -> None:
+        # A failing handler must not stop the listener, or the other handlers from being invalidated
+        try:
+            f(*args)
+        except Exception:
+            logger.exception("Cache invalidation failed")
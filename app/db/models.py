@@ -3,7 +3,7 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 
-from sqlalchemy import JSON, Boolean, DateTime, Integer, String, Uuid
+from sqlalchemy import JSON, Boolean, DateTime, Index, Integer, String, Text, Uuid, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -16,12 +16,84 @@ class ResourceEntry(Base):
 
     id: Mapped[uuid.UUID] = mapped_column("id", Uuid, primary_key=True)
     pseudonym: Mapped[uuid.UUID] = mapped_column("pseudonym", Uuid, index=True)
-    resource_type: Mapped[str] = mapped_column("resource_type", String(64), nullable=False, index=True)
-    resource_id: Mapped[str] = mapped_column("resource_id", String(256), nullable=False, index=True)
+    resource_type: Mapped[str] = mapped_column("resource_type", String(64), nullable=False)
+    resource_id: Mapped[str] = mapped_column("resource_id", String(256), nullable=False)
     resource = mapped_column("resource", JSON, nullable=False)
+    # Canonical serialization of the validated resource, returned as-is on reads
+    resource_json: Mapped[str | None] = mapped_column("resource_json", Text, nullable=True)
     version: Mapped[int] = mapped_column("version", Integer, nullable=False, default=1)
     created_dt: Mapped[datetime] = mapped_column("created_dt", DateTime, nullable=False, default=datetime.utcnow)
     deleted: Mapped[bool] = mapped_column("deleted", Boolean, nullable=False, default=False)
 
+    # Resource types and ids are matched case-insensitively, so the indexes are on their lowercased values
+    __table_args__ = (
+        Index(
+            "ix_resource_entry_resource_version",
+            func.lower(resource_type),
+            func.lower(resource_id),
+            version.desc(),
+        ),
+        # Pseudonym searches, in the (created_dt, id) order used for keyset paging
+        Index(
+            "ix_resource_entry_pseudonym_page",
+            pseudonym,
+            func.lower(resource_type),
+            created_dt,
+            id,
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<FhirResource(id={self.id}, resource_type={self.resource_type}, resource_id={self.resource_id})>"
+
+
+class CurrentResource(Base):
+    """
+    Current state of every resource: its latest version and the history entry holding that version. The keys are
+    lowercased, as resources are matched case-insensitively. All versions are kept in the append-only
+    resource_entry table.
+    """
+
+    __tablename__ = "resource_current"
+
+    resource_type: Mapped[str] = mapped_column("resource_type", String(64), primary_key=True)
+    resource_id: Mapped[str] = mapped_column("resource_id", String(256), primary_key=True)
+    version: Mapped[int] = mapped_column("version", Integer, nullable=False)
+    entry_id: Mapped[uuid.UUID] = mapped_column("entry_id", Uuid, nullable=False)
+    # Creation time of the entry, which is the partition key of resource_entry
+    created_dt: Mapped[datetime] = mapped_column("created_dt", DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<CurrentResource(resource_type={self.resource_type}, resource_id={self.resource_id})>"
+
+
+class ReferralOutboxEntry(Base):
+    __tablename__ = "referral_outbox"
+
+    id: Mapped[uuid.UUID] = mapped_column("id", Uuid, primary_key=True, default=uuid.uuid4)
+    pseudonym: Mapped[uuid.UUID] = mapped_column("pseudonym", Uuid, nullable=False)
+    data_domain: Mapped[str] = mapped_column("data_domain", String(32), nullable=False)
+    ura_number: Mapped[str] = mapped_column("ura_number", String(8), nullable=False)
+    requesting_uzi_number: Mapped[str] = mapped_column("requesting_uzi_number", String(32), nullable=False)
+    attempts: Mapped[int] = mapped_column("attempts", Integer, nullable=False, default=0)
+    next_attempt_dt: Mapped[datetime] = mapped_column(
+        "next_attempt_dt", DateTime, nullable=False, default=datetime.now, index=True
+    )
+    last_error: Mapped[str | None] = mapped_column("last_error", Text, nullable=True)
+    failed: Mapped[bool] = mapped_column("failed", Boolean, nullable=False, default=False)
+    created_dt: Mapped[datetime] = mapped_column("created_dt", DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<ReferralOutboxEntry(id={self.id}, pseudonym={self.pseudonym}, attempts={self.attempts})>"
+
+
+class RegisteredReferral(Base):
+    __tablename__ = "registered_referral"
+
+    pseudonym: Mapped[uuid.UUID] = mapped_column("pseudonym", Uuid, primary_key=True)
+    data_domain: Mapped[str] = mapped_column("data_domain", String(32), primary_key=True)
+    ura_number: Mapped[str] = mapped_column("ura_number", String(8), primary_key=True)
+    created_dt: Mapped[datetime] = mapped_column("created_dt", DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<RegisteredReferral(pseudonym={self.pseudonym}, data_domain={self.data_domain})>"
@@ -0,0 +1,53 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.db.decorator import repository
+from app.db.models import CurrentResource
+from app.db.repository import RepositoryBase
+
+
+@repository(CurrentResource)
+class CurrentResourceRepository(RepositoryBase):
+    def claim_version(
+        self,
+        resource_type: str,
+        resource_id: str,
+        entry_id: uuid.UUID,
+        created_dt: datetime,
+        expected_version: int | None = None,
+    ) -> int | None:
+        """
+        Atomically claims the next version number of the resource and points the current state at the given
+        entry, in a single statement. The row stays locked until the transaction ends, so concurrent writers of the
+        same resource are serialized instead of colliding on the same version.
+
+        When an expected version is given, an existing resource is only updated when its current version matches.
+        Returns None when it does not.
+        """
+        dialect = self.db_session.get_dialect()
+        if "postgresql" not in dialect and "sqlite" not in dialect:
+            raise Exception("Unsupported database dialect")
+
+        insert = postgresql.insert if "postgresql" in dialect else sqlite.insert
+
+        values = insert(CurrentResource).values(
+            resource_type=resource_type.lower(),
+            resource_id=resource_id.lower(),
+            version=1,
+            entry_id=entry_id,
+            created_dt=created_dt,
+        )
+        stmt = values.on_conflict_do_update(
+            index_elements=[CurrentResource.resource_type, CurrentResource.resource_id],
+            set_={
+                "version": CurrentResource.version + 1,
+                "entry_id": values.excluded.entry_id,
+                "created_dt": values.excluded.created_dt,
+            },
+            where=CurrentResource.version == expected_version if expected_version is not None else None,
+        ).returning(CurrentResource.version)
+
+        version = self.db_session.execute(stmt).scalar_one_or_none()
+        return int(version) if version is not None else None
@@ -0,0 +1,53 @@
+import uuid
+from datetime import datetime
+from typing import Sequence
+
+from sqlalchemy import delete, select, update
+
+from app.db.decorator import repository
+from app.db.models import ReferralOutboxEntry
+from app.db.repository import RepositoryBase
+
+
+@repository(ReferralOutboxEntry)
+class ReferralOutboxRepository(RepositoryBase):
+    def claim_batch(self, limit: int, now: datetime, lease_until: datetime) -> Sequence[ReferralOutboxEntry]:
+        """
+        Claims the entries that are due for (re)delivery, by moving their next attempt to lease_until. On postgres
+        the rows are locked until the current transaction ends, and rows locked by other workers are skipped. Once
+        committed, the lease keeps other workers from claiming the entries without holding any locks.
+        """
+        stmt = (
+            select(ReferralOutboxEntry)
+            .where(ReferralOutboxEntry.failed.is_(False))
+            .where(ReferralOutboxEntry.next_attempt_dt <= now)
+            .order_by(ReferralOutboxEntry.next_attempt_dt)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+
+        entries: Sequence[ReferralOutboxEntry] = self.db_session.execute(stmt).scalars().all()
+        for entry in entries:
+            entry.next_attempt_dt = lease_until
+
+        return entries
+
+    def delete_many(self, ids: Sequence[uuid.UUID]) -> None:
+        if ids:
+            self.db_session.execute(delete(ReferralOutboxEntry).where(ReferralOutboxEntry.id.in_(ids)))
+
+    def save_attempt(self, entry: ReferralOutboxEntry) -> None:
+        """
+        Stores the outcome of a failed delivery of a (detached) entry
+        """
+        stmt = (
+            update(ReferralOutboxEntry)
+            .where(ReferralOutboxEntry.id == entry.id)
+            .values(
+                attempts=entry.attempts,
+                last_error=entry.last_error,
+                failed=entry.failed,
+                next_attempt_dt=entry.next_attempt_dt,
+            )
+        )
+        self.db_session.execute(stmt)
@@ -0,0 +1,43 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.db.decorator import repository
+from app.db.models import RegisteredReferral
+from app.db.repository import RepositoryBase
+
+
+@repository(RegisteredReferral)
+class RegisteredReferralRepository(RepositoryBase):
+    def exists(self, pseudonym: uuid.UUID, data_domain: str, ura_number: str) -> bool:
+        stmt = (
+            select(RegisteredReferral.pseudonym)
+            .where(RegisteredReferral.pseudonym == pseudonym)
+            .where(RegisteredReferral.data_domain == data_domain)
+            .where(RegisteredReferral.ura_number == ura_number)
+            .limit(1)
+        )
+
+        return self.db_session.execute(stmt).first() is not None
+
+    def add(self, pseudonym: uuid.UUID, data_domain: str, ura_number: str) -> None:
+        """
+        Registers the referral. Registering an already registered referral is a no-op.
+        """
+        insert = postgresql.insert if "postgresql" in self.db_session.get_dialect() else sqlite.insert
+
+        stmt = (
+            insert(RegisteredReferral)
+            .values(
+                pseudonym=pseudonym,
+                data_domain=data_domain,
+                ura_number=ura_number,
+                created_dt=datetime.now(),
+            )
+            .on_conflict_do_nothing()
+        )
+
+        self.db_session.execute(stmt)
+        self.db_session.commit()
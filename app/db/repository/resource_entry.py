@@ -1,52 +1,298 @@
+import json
 import uuid
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Sequence
+from typing import Any, Iterator, Sequence
 
-from sqlalchemy import func, select, update
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    Text,
+    and_,
+    cast,
+    func,
+    insert,
+    literal,
+    select,
+    text,
+    tuple_,
+    update,
+)
 
-from app.data import Pseudonym
+from app.data import PageCursor, Pseudonym
 from app.db.decorator import repository
-from app.db.models import ResourceEntry
+from app.db.invalidation import Invalidation, notify
+from app.db.models import CurrentResource, ReferralOutboxEntry, ResourceEntry
 from app.db.repository import RepositoryBase
+from app.db.repository.current_resource import CurrentResourceRepository
+
+# Staging table for imports on Postgres, rows are loaded with COPY and then moved into the history at once
+IMPORT_STAGING_TABLE = """
+create temporary table if not exists resource_entry_import
+(
+    seq           bigint       not null,
+    id            uuid         not null,
+    pseudonym     uuid,
+    resource_type varchar(64)  not null,
+    resource_id   varchar(256) not null,
+    resource      text         not null,
+    resource_json text,
+    created_dt    timestamp    not null
+) on commit delete rows
+"""
+
+IMPORT_COPY = """
+copy resource_entry_import (seq, id, pseudonym, resource_type, resource_id, resource, resource_json, created_dt)
+from stdin
+"""
+
+# Claims the versions of all staged resources in the current state, and appends them to the history. A resource
+# staged n times gets n consecutive versions, in the order in which they were staged.
+IMPORT_MOVE = """
+with staged as (
+    select s.*,
+           lower(s.resource_type) as type_key,
+           lower(s.resource_id) as id_key,
+           row_number() over (partition by lower(s.resource_type), lower(s.resource_id) order by s.seq) as n,
+           count(*) over (partition by lower(s.resource_type), lower(s.resource_id)) as total
+    from resource_entry_import s
+),
+claimed as (
+    insert into resource_current (resource_type, resource_id, version, entry_id, created_dt)
+    select type_key, id_key, total, id, created_dt from staged where n = total
+    on conflict (resource_type, resource_id) do update
+        set version    = resource_current.version + excluded.version,
+            entry_id   = excluded.entry_id,
+            created_dt = excluded.created_dt
+    returning resource_type, resource_id, version
+)
+insert into resource_entry (id, pseudonym, resource_type, resource_id, resource, resource_json, version, created_dt,
+                            deleted)
+select s.id, s.pseudonym, s.resource_type, s.resource_id, s.resource::jsonb, s.resource_json,
+       c.version - s.total + s.n, s.created_dt, false
+from staged s
+         join claimed c on c.resource_type = s.type_key and c.resource_id = s.id_key
+"""
+
+
+class VersionConflictError(Exception):
+    """
+    Raised when a conditional update expects another version than the current version of the resource
+    """
+
+    pass
+
+
+@dataclass
+class ResourceWrite:
+    resource_type: str
+    resource_id: str
+    data: dict[str, Any]
+    pseudonym: Pseudonym | None
+    outbox: ReferralOutboxEntry | None = None
+    resource_json: str | None = None
+    expected_version: int | None = None
+
+
+@dataclass
+class ResourceVersion:
+    """
+    Version information of a resource entry, without the resource itself
+    """
+
+    version: int
+    created_dt: datetime
+    deleted: bool
+
+
+@dataclass
+class ResourceEntryPage:
+    entries: Sequence[ResourceEntry]
+    next_cursor: PageCursor | None
+    previous_cursor: PageCursor | None
+
+
+def join_current() -> ColumnElement[bool]:
+    """
+    Join condition of the current state on the entry holding the latest version. The creation time is part of the
+    condition, so only a single partition of the history needs to be probed.
+    """
+    return and_(ResourceEntry.id == CurrentResource.entry_id, ResourceEntry.created_dt == CurrentResource.created_dt)
+
+
+def matches_type(resource_type: str) -> ColumnElement[bool]:
+    """
+    Case-insensitive match on the resource type, which can use the lower(resource_type) indexes
+    """
+    return func.lower(ResourceEntry.resource_type) == resource_type.lower()
+
+
+def matches_resource(resource_type: str, resource_id: str) -> ColumnElement[bool]:
+    """
+    Case-insensitive match on the resource type and id, which can use the lower(resource_type), lower(resource_id)
+    index
+    """
+    return and_(matches_type(resource_type), func.lower(ResourceEntry.resource_id) == resource_id.lower())
+
+
+def outbox_key(outbox: ReferralOutboxEntry) -> tuple[uuid.UUID, str, str]:
+    return outbox.pseudonym, outbox.data_domain, outbox.ura_number
 
 
 @repository(ResourceEntry)
 class ResourceEntryRepository(RepositoryBase):
-    def find_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str) -> Sequence[ResourceEntry]:
-        stmt = (
+    @staticmethod
+    def select_by_pseudonym(pseudonym: Pseudonym, resource_type: str) -> Select[tuple[ResourceEntry]]:
+        """
+        Select the latest versions of the resources of the given type for the pseudonym
+        """
+        return (
             select(ResourceEntry)
-            .where(ResourceEntry.pseudonym == str(pseudonym))
-            .where(ResourceEntry.resource_type.ilike(resource_type))
+            .join(CurrentResource, join_current())
+            .where(ResourceEntry.pseudonym == pseudonym.value)
+            .where(matches_type(resource_type))
         )
 
+    def find_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str) -> Sequence[ResourceEntry]:
+        stmt = self.select_by_pseudonym(pseudonym, resource_type)
+
         return self.db_session.execute(stmt).scalars().all()  # type: ignore
 
-    def find_by_resource(self, resource_type: str, resource_id: str, version: int) -> ResourceEntry | None:
+    def stream_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str, batch_size: int) -> Iterator[ResourceEntry]:
+        """
+        Iterates over the entries with a server-side cursor, fetching batch_size entries at a time. The session
+        must stay open until the iterator is exhausted.
+        """
+        stmt = self.select_by_pseudonym(pseudonym, resource_type).execution_options(yield_per=batch_size)
+
+        yield from self.db_session.execute(stmt).scalars()
+
+    def stream_current(
+        self,
+        resource_types: Sequence[str] | None,
+        since: datetime | None,
+        batch_size: int,
+    ) -> Iterator[tuple[str, str, str]]:
+        """
+        Iterates over the current versions of all resources that are not deleted, optionally limited to the given
+        types and to resources changed since the given time. Yields the lowercased type, the type as stored and the
+        JSON of the resource, ordered by type. Rows are fetched with a server-side cursor, batch_size at a time,
+        and the stored JSON is returned as-is so no resource models are built. The session must stay open until the
+        iterator is exhausted.
+        """
         stmt = (
-            select(ResourceEntry)
-            .where(ResourceEntry.resource_type.ilike(resource_type))
-            .where(ResourceEntry.resource_id.ilike(resource_id))
-            .limit(1)
+            select(
+                CurrentResource.resource_type,
+                ResourceEntry.resource_type,
+                # Older entries have no stored JSON, the database serializes those
+                func.coalesce(ResourceEntry.resource_json, cast(ResourceEntry.resource, Text)),
+            )
+            .join(CurrentResource, join_current())
+            .where(ResourceEntry.deleted.is_(False))
+            .order_by(CurrentResource.resource_type, CurrentResource.resource_id)
+            .execution_options(yield_per=batch_size)
         )
+        if resource_types:
+            stmt = stmt.where(CurrentResource.resource_type.in_([t.lower() for t in resource_types]))
+        if since is not None:
+            stmt = stmt.where(CurrentResource.created_dt >= since)
 
+        for type_key, resource_type, resource_json in self.db_session.execute(stmt):
+            yield type_key, resource_type, resource_json
+
+    def find_page_by_pseudonym(
+        self,
+        pseudonym: Pseudonym,
+        resource_type: str,
+        count: int,
+        cursor: PageCursor | None = None,
+    ) -> ResourceEntryPage:
+        """
+        Returns a page of at most count entries, ordered by (created_dt, id). Pages are found by seeking to the
+        cursor position in the index instead of skipping rows with an offset, so every page costs the same.
+        """
+        key = tuple_(ResourceEntry.created_dt, ResourceEntry.id)
+        backwards = cursor is not None and cursor.backwards
+
+        stmt = self.select_by_pseudonym(pseudonym, resource_type)
+        if cursor is not None:
+            position = tuple_(
+                literal(cursor.created_dt, ResourceEntry.created_dt.type), literal(cursor.id, ResourceEntry.id.type)
+            )
+            stmt = stmt.where(key < position if backwards else key > position)
+        if backwards:
+            stmt = stmt.order_by(ResourceEntry.created_dt.desc(), ResourceEntry.id.desc())
+        else:
+            stmt = stmt.order_by(ResourceEntry.created_dt.asc(), ResourceEntry.id.asc())
+
+        # Fetch one extra entry to find out if there is another page in this direction
+        entries = list(self.db_session.execute(stmt.limit(count + 1)).scalars().all())
+        has_more = len(entries) > count
+        entries = entries[:count]
+        if backwards:
+            entries.reverse()
+
+        # The cursor itself points at an existing entry, so there is always a page in the opposite direction
+        has_next = cursor is not None if backwards else has_more
+        has_previous = has_more if backwards else cursor is not None
+
+        return ResourceEntryPage(
+            entries=entries,
+            next_cursor=PageCursor(entries[-1].created_dt, entries[-1].id) if entries and has_next else None,
+            previous_cursor=(
+                PageCursor(entries[0].created_dt, entries[0].id, backwards=True) if entries and has_previous else None
+            ),
+        )
+
+    def find_by_resource(self, resource_type: str, resource_id: str, version: int) -> ResourceEntry | None:
         if version == 0:
-            # Get latest version
-            stmt = stmt.order_by(ResourceEntry.version.desc())
+            # Get latest version, through the primary key of the current state
+            stmt = (
+                select(ResourceEntry)
+                .join(CurrentResource, join_current())
+                .where(CurrentResource.resource_type == resource_type.lower())
+                .where(CurrentResource.resource_id == resource_id.lower())
+            )
         else:
-            stmt = stmt.where(ResourceEntry.version == version)
+            stmt = (
+                select(ResourceEntry)
+                .where(matches_resource(resource_type, resource_id))
+                .where(ResourceEntry.version == version)
+                .limit(1)
+            )
 
         return self.db_session.execute(stmt).scalars().first()  # type: ignore
 
+    def find_version(self, resource_type: str, resource_id: str, version: int) -> ResourceVersion | None:
+        """
+        Returns the version information of the entry find_by_resource() would return. Only the version columns are
+        selected, so the resource JSON is not loaded.
+        """
+        columns = (ResourceEntry.version, ResourceEntry.created_dt, ResourceEntry.deleted)
+        if version == 0:
+            stmt = (
+                select(*columns)
+                .join(CurrentResource, join_current())
+                .where(CurrentResource.resource_type == resource_type.lower())
+                .where(CurrentResource.resource_id == resource_id.lower())
+            )
+        else:
+            stmt = (
+                select(*columns)
+                .where(matches_resource(resource_type, resource_id))
+                .where(ResourceEntry.version == version)
+                .limit(1)
+            )
+
+        row = self.db_session.execute(stmt).first()
+        return ResourceVersion(row.version, row.created_dt, row.deleted) if row is not None else None
+
     def delete_by_resource(self, resource_type: str, resource_id: str) -> None:
-        stmt = (
-            update(ResourceEntry)
-            .where(ResourceEntry.resource_type.ilike(resource_type))
-            .where(ResourceEntry.resource_id.ilike(resource_id))
-            .values(deleted=True)
-        )
+        stmt = update(ResourceEntry).where(matches_resource(resource_type, resource_id)).values(deleted=True)
 
-        self.db_session.execute(stmt)
-        self.db_session.commit()
+        with self.db_session.begin():
+            self.db_session.execute(stmt)
+            notify(self.db_session, [Invalidation(resource_type, resource_id, deleted=True)])
 
     def upsert(
         self,
@@ -54,63 +300,116 @@ class ResourceEntryRepository(RepositoryBase):
         resource_id: str,
         data: dict[str, Any],
         pseudonym: Pseudonym | None,
+        outbox: ReferralOutboxEntry | None = None,
+        resource_json: str | None = None,
+        expected_version: int | None = None,
     ) -> ResourceEntry | None:
-        with self.db_session.begin():
-            # Create a new resource entry instance, assume version is 1
-            entry = ResourceEntry(
-                id=uuid.uuid4(),
-                pseudonym=uuid.UUID(str(pseudonym)) if pseudonym else None,
-                resource_type=resource_type,
-                resource_id=resource_id,
-                resource=data,
-                version=1,
-                created_dt=datetime.now(),
-                deleted=False,
-            )
+        """
+        Appends a new version of the resource to the history and makes it the current version. The (optional)
+        outbox entry is stored in the same transaction, so a referral is only queued when the resource is actually
+        stored. The resource_json is the canonical serialization of the validated resource, which is returned as-is
+        when the resource is read.
 
-            if "postgresql" in self.db_session.get_dialect():
-                subquery = (
-                    self.db_session.query(func.coalesce(func.max(ResourceEntry.version), 0) + 1).filter(
-                        ResourceEntry.resource_id == resource_id and ResourceEntry.resource_type == resource_type
-                    )
-                ).scalar_subquery()
-
-                from sqlalchemy.dialects.postgresql import insert
-
-                insert_stmt = (
-                    insert(ResourceEntry)
-                    .values(
-                        id=entry.id,
-                        pseudonym=entry.pseudonym,
-                        resource_type=entry.resource_type,
-                        resource_id=entry.resource_id,
-                        resource=entry.resource,
-                        version=entry.version,
-                        created_dt=entry.created_dt,
-                        deleted=entry.deleted,
-                    )
-                    .on_conflict_do_update(constraint="resource_type_id", set_={"version": subquery})
-                )
-                result = self.db_session.scalars(
-                    insert_stmt.returning(ResourceEntry),
-                    execution_options={"populate_existing": True},
+        With an expected version, the version check and the write are done in the same statement. When an existing
+        resource has another version, nothing is stored and a VersionConflictError is raised.
+        """
+        write = ResourceWrite(resource_type, resource_id, data, pseudonym, outbox, resource_json, expected_version)
+        return self.upsert_many([write], atomic=True)[0]
+
+    def upsert_many(self, writes: Sequence[ResourceWrite], atomic: bool = False) -> list[ResourceEntry | None]:
+        """
+        Appends new versions of multiple resources in a single transaction. The versions are claimed one by one,
+        after which all history entries are stored with a single multi-row insert.
+
+        Returns the stored entry for every write, or None when its expected version did not match. When atomic is
+        set, a version mismatch raises a VersionConflictError instead and nothing is stored. Outbox entries of stored
+        writes are queued once per referral.
+        """
+        current_repository = self.db_session.get_repository(CurrentResourceRepository)
+        entries: list[ResourceEntry | None] = []
+        queued: set[tuple[uuid.UUID, str, str]] = set()
+
+        with self.db_session.begin():
+            for write in writes:
+                entry = ResourceEntry(
+                    id=uuid.uuid4(),
+                    pseudonym=write.pseudonym.value if write.pseudonym else None,
+                    resource_type=write.resource_type,
+                    resource_id=write.resource_id,
+                    resource=write.data,
+                    resource_json=write.resource_json,
+                    created_dt=datetime.now(),
+                    deleted=False,
                 )
-                return result.first()  # type: ignore
-
-            if "sqlite" in self.db_session.get_dialect():
-                # Sqlite does not support on conflict do update, so we need to manually check the version
-                stmt = (
-                    select(func.max(ResourceEntry.version))
-                    .where(ResourceEntry.resource_type.ilike(resource_type))
-                    .where(ResourceEntry.resource_id.ilike(resource_id))
+                version = current_repository.claim_version(
+                    write.resource_type, write.resource_id, entry.id, entry.created_dt, write.expected_version
                 )
-                result = self.db_session.execute(stmt)
-                max_version = result.scalar()
-                entry.version = (max_version or 0) + 1
+                if version is None:
+                    if atomic:
+                        raise VersionConflictError(f"Resource is not at version {write.expected_version}")
+                    entries.append(None)
+                    continue
+
+                entry.version = version
+                entries.append(entry)
+                # Writes for the same pseudonym can carry the same referral, which only needs to be sent once
+                if write.outbox is not None and outbox_key(write.outbox) not in queued:
+                    queued.add(outbox_key(write.outbox))
+                    self.db_session.add(write.outbox)
 
-                self.db_session.add(entry)
-                self.db_session.commit()
+            rows = [
+                {column.key: getattr(entry, column.key) for column in ResourceEntry.__table__.columns}
+                for entry in entries
+                if entry is not None
+            ]
+            if rows:
+                self.db_session.execute(insert(ResourceEntry), rows)
+            notify(
+                self.db_session,
+                [
+                    Invalidation(
+                        entry.resource_type, entry.resource_id, str(entry.pseudonym) if entry.pseudonym else None
+                    )
+                    for entry in entries
+                    if entry is not None
+                ],
+            )
+
+        return entries
+
+    def import_many(self, writes: Sequence[ResourceWrite]) -> int:
+        """
+        Appends new versions of many resources in a single transaction, for bulk imports. Expected versions and
+        outbox entries are not supported. On Postgres, the resources are loaded into a staging table with COPY and
+        moved into the history with a single statement. Other databases fall back to upsert_many.
+
+        Returns the number of imported resources.
+        """
+        if "postgresql" not in self.db_session.get_dialect():
+            return len([entry for entry in self.upsert_many(writes) if entry is not None])
+
+        created_dt = datetime.now()
+        with self.db_session.begin():
+            self.db_session.execute(text(IMPORT_STAGING_TABLE))
+
+            cursor = self.db_session.connection().connection.cursor()
+            with cursor.copy(IMPORT_COPY) as copy:
+                for seq, write in enumerate(writes):
+                    copy.write_row(
+                        (
+                            seq,
+                            uuid.uuid4(),
+                            write.pseudonym.value if write.pseudonym else None,
+                            write.resource_type,
+                            write.resource_id,
+                            json.dumps(write.data),
+                            write.resource_json,
+                            created_dt,
+                        )
+                    )
 
-                return entry
+            result = self.db_session.execute(text(IMPORT_MOVE))
+            # Invalidating every imported resource separately would flood the listeners
+            notify(self.db_session, [Invalidation(flush=True)])
 
-            raise Exception("Unsupported database dialect")
+        return int(result.rowcount)
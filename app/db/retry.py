@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Any, Awaitable, Callable, Iterator, Sequence, TypeVar
+
+from sqlalchemy.exc import DatabaseError, OperationalError, PendingRollbackError
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import get_config
+from app.stats import get_stats
+
+"""
+Retry policy for database operations. Operations that fail with an OperationalError (lost connections, failovers)
+are retried with the configured backoff, but never beyond the deadline of the operation or of the current request.
+A circuit breaker keeps track of consecutive failures: once it opens, operations fail fast with a CircuitOpenError
+until the database has had time to recover, after which a single operation is let through to probe it.
+
+Usage:
+
+    policy = get_retry_policy()
+    result = policy.call(session.execute, stmt, rollback=session.rollback)
+    result = await policy.call_async(lambda: async_session.execute(stmt), rollback=async_session.rollback)
+"""
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when the circuit breaker is open, retry_after is the number of seconds until it lets operations through
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__("Database is unavailable")
+        self.retry_after = retry_after
+
+
+class RetryExhaustedError(Exception):
+    def __init__(self) -> None:
+        super().__init__("Operation failed after all retries")
+
+
+class CircuitState(int, Enum):
+    closed = 0
+    half_open = 1
+    open = 2
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CircuitState.closed
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """
+        Raises a CircuitOpenError when the operation is not allowed. When the breaker is half open, only a single
+        operation at a time is allowed to probe the database.
+        """
+        with self._lock:
+            if self.state == CircuitState.open:
+                remaining = self._opened_at + self.reset_timeout - self.clock()
+                if remaining > 0:
+                    raise CircuitOpenError(remaining)
+                self._set_state(CircuitState.half_open)
+
+            if self.state == CircuitState.half_open:
+                if self._probing:
+                    raise CircuitOpenError(self.reset_timeout)
+                self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != CircuitState.closed:
+                self._set_state(CircuitState.closed)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == CircuitState.half_open or self.failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+                if self.state != CircuitState.open:
+                    self._set_state(CircuitState.open)
+
+    def _set_state(self, state: CircuitState) -> None:
+        logger.warning("Database circuit breaker changed from %s to %s", self.state.name, state.name)
+        self.state = state
+        get_stats().inc(f"db.circuit.{state.name}")
+        get_stats().gauge("db.circuit.state", state.value)
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        backoff: Sequence[float],
+        deadline: float,
+        breaker: CircuitBreaker,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.backoff = backoff
+        self.deadline = deadline
+        self.breaker = breaker
+        self.clock = clock
+        self.sleep = sleep
+
+    def call(self, f: Callable[..., T], *args: Any, rollback: Callable[[], Any] | None = None, **kwargs: Any) -> T:
+        """
+        Call the function, and retry it on database errors
+        """
+        deadline = self._effective_deadline()
+        attempt = 0
+
+        while True:
+            self.breaker.allow()
+            try:
+                result = f(*args, **kwargs)
+            except BaseException as e:
+                self._handle_error(e, rollback)
+            else:
+                self.breaker.record_success()
+                return result
+
+            delay = self._next_delay(attempt, deadline)
+            attempt += 1
+            self.sleep(delay)
+
+    async def call_async(
+        self, f: Callable[[], Awaitable[T]], rollback: Callable[[], Awaitable[Any]] | None = None
+    ) -> T:
+        """
+        Asynchronous counterpart of call(), which waits without blocking the event loop
+        """
+        deadline = self._effective_deadline()
+        attempt = 0
+
+        while True:
+            self.breaker.allow()
+            try:
+                result = await f()
+            except BaseException as e:
+                self._handle_error(e, None)
+                if rollback is not None and isinstance(e, (PendingRollbackError, OperationalError)):
+                    await rollback()
+            else:
+                self.breaker.record_success()
+                return result
+
+            delay = self._next_delay(attempt, deadline)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _handle_error(self, e: BaseException, rollback: Callable[[], Any] | None) -> None:
+        """
+        Re-raises errors that are not retried, and reports the others to the circuit breaker
+        """
+        if isinstance(e, PendingRollbackError):
+            # The connection works, but an earlier statement failed
+            logger.warning("Retrying operation due to PendingRollbackError: %s", e)
+            self.breaker.record_success()
+            if rollback is not None:
+                rollback()
+        elif isinstance(e, OperationalError):
+            logger.warning("Retrying operation due to OperationalError: %s", e)
+            self.breaker.record_failure()
+        elif isinstance(e, DatabaseError):
+            logger.warning("Retrying operation due to DatabaseError: %s", e)
+            self.breaker.record_success()
+            raise e
+        else:
+            if isinstance(e, Exception):
+                logger.warning("Generic Exception during operation: %s", e)
+            self.breaker.record_success()
+            raise e
+
+    def _next_delay(self, attempt: int, deadline: float) -> float:
+        """
+        Returns the time to wait before the next attempt, or raises a RetryExhaustedError when the backoff is used up
+        or the next attempt would start after the deadline
+        """
+        if attempt >= len(self.backoff):
+            logger.error("Operation failed after all retries")
+            get_stats().inc("db.retry.give_up")
+            raise RetryExhaustedError()
+
+        delay = self.backoff[attempt] + random.uniform(0, 0.1)
+        if self.clock() + delay > deadline:
+            logger.error("Operation failed, the deadline does not allow another retry")
+            get_stats().inc("db.retry.give_up")
+            raise RetryExhaustedError()
+
+        logger.info("Retrying operation in %s seconds", delay)
+        get_stats().inc("db.retry")
+        return delay
+
+    def _effective_deadline(self) -> float:
+        deadline = self.clock() + self.deadline
+        request_deadline = _deadline.get()
+        return min(deadline, request_deadline) if request_deadline is not None else deadline
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Limit the time operations within the context may spend on retries. Nested deadlines cannot extend the deadline
+    of the enclosing context.
+    """
+    value = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(min(value, current) if current is not None else value)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class RequestDeadlineMiddleware:
+    """
+    Sets the deadline of every request, so database retries give up in time for the request to be answered
+    """
+
+    def __init__(self, app: ASGIApp, timeout: float):
+        self.app = app
+        self.timeout = timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with deadline(self.timeout):
+            await self.app(scope, receive, send)
+
+
+_RETRY_POLICY: RetryPolicy | None = None
+
+
+def get_retry_policy() -> RetryPolicy:
+    """
+    Returns the retry policy of this process. The circuit breaker is shared by all database sessions, so all of
+    them fail fast once the database is unavailable.
+    """
+    global _RETRY_POLICY
+    if _RETRY_POLICY is None:
+        config = get_config().database
+        _RETRY_POLICY = RetryPolicy(
+            backoff=config.retry_backoff,
+            deadline=config.retry_deadline,
+            breaker=CircuitBreaker(config.breaker_failure_threshold, config.breaker_reset_timeout),
+        )
+    return _RETRY_POLICY
@@ -1,15 +1,13 @@
 import logging
-import random
-from time import sleep
+from contextlib import nullcontext
 from typing import Any, Callable, Type, TypeVar
 
-from sqlalchemy import Engine
-from sqlalchemy.exc import DatabaseError, OperationalError, PendingRollbackError
+from sqlalchemy import Engine, event
 from sqlalchemy.orm import Session
 
-from app.config import get_config
 from app.db.models import Base
 from app.db.repository import RepositoryBase, TRepositoryBase
+from app.db.retry import RetryPolicy, get_retry_policy
 
 """
 This module contains the DbSession class, which is a context manager that provides a session to interact with
@@ -31,8 +29,22 @@ T = TypeVar("T")
 
 
 class DbSession:
-    def __init__(self, engine: Engine) -> None:
+    def __init__(self, engine: Engine, retry_policy: RetryPolicy | None = None, unit_of_work: bool = False) -> None:
         self._engine = engine
+        self._retry_policy = retry_policy
+        self._retry_enabled = True
+        self._unit_of_work = unit_of_work
+
+    @classmethod
+    def from_session(cls, session: Session, retry: bool = True) -> "DbSession":
+        """
+        Wrap an already opened session, for instance the synchronous view of an AsyncSession. Without retry, the
+        operations are only tried once, for callers that retry on their own.
+        """
+        db_session = cls(session.get_bind())  # type: ignore[arg-type]
+        db_session.session = session
+        db_session._retry_enabled = retry
+        return db_session
 
     def __enter__(self) -> "DbSession":
         """
@@ -90,23 +102,35 @@ class DbSession:
         """
         self._retry(self.session.rollback)
 
-    def execute(self, stmt: Any) -> Any:
+    def execute(self, stmt: Any, params: Any = None) -> Any:
         """
-        Execute a statement in the current session
+        Execute a statement in the current session. When params is a list of parameter sets, the statement is
+        executed for all of them at once (for instance a multi-row insert).
 
         :param stmt:
+        :param params:
         :return:
         """
-        return self._retry(self.session.execute, stmt)
+        return self._retry(self.session.execute, stmt, params)
 
     def begin(self) -> Any:
         """
-        Begin a new transaction
+        Begin a new transaction. In the session of a unit of work, the statements join the transaction of the unit of
+        work instead and are committed together with it. Outside a unit of work, beginning while a transaction is
+        already in progress (for instance after a read) raises an error, instead of leaving the writes uncommitted.
 
         :return:
         """
+        if self._unit_of_work:
+            return nullcontext()
         return self._retry(self.session.begin)
 
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """
+        Call the callback once, after the current transaction is committed
+        """
+        event.listen(self.session, "after_commit", lambda session: callback(), once=True)
+
     def get_dialect(self) -> str:
         """
         Get the dialect of the current session
@@ -115,32 +139,19 @@ class DbSession:
 
     def _retry(self, f: Callable[..., T], *args: Any, **kwargs: Any) -> T:
         """
-        Retry a function call in case of database errors
-        """
-        backoff = get_config().database.retry_backoff
-
-        while True:
-            try:
-                return f(*args, **kwargs)
-            except PendingRollbackError as e:
-                logger.warning("Retrying operation due to PendingRollbackError: %s", e)
-                self.session.rollback()
-            except OperationalError as e:
-                logger.warning("Retrying operation due to OperationalError: %s", e)
-            except DatabaseError as e:
-                logger.warning("Retrying operation due to DatabaseError: %s", e)
-                raise e
-            except Exception as e:
-                logger.warning("Generic Exception during operation: %s", e)
-                raise e
-
-            if len(backoff) == 0:
-                logger.error("Operation failed after all retries")
-                raise Exception("Operation failed after all retries")
-
-            logger.info("Retrying operation in %s seconds", backoff[0])
-            sleep(backoff[0] + random.uniform(0, 0.1))
-            backoff = backoff[1:]
+        Retry a function call in case of database errors, see app.db.retry
+        """
+        if not self._retry_enabled:
+            return f(*args, **kwargs)
+
+        policy = self._retry_policy or get_retry_policy()
+        return policy.call(f, *args, rollback=self.session.rollback, **kwargs)
+
+    def connection(self) -> Any:
+        """
+        Returns the connection of the current transaction, for driver specific operations like COPY
+        """
+        return self.session.connection()
 
     def query(self, *entities: Any) -> Any:
         """
@@ -0,0 +1,343 @@
+import copy
+import logging
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Iterator, Sequence
+
+from app.cache import TtlLruCache
+from app.data import PageCursor, Pseudonym
+from app.db.invalidation import Invalidation
+from app.db.models import ResourceEntry
+from app.db.repository.resource_entry import ResourceEntryPage, ResourceVersion
+from app.db.session import DbSession
+from app.metadata.db.db_adapter import sanitize
+from app.metadata.fhir import convert_resource_to_fhir
+from app.metadata.metadata_service import AsyncMetadataAdapter, MetadataAdapter, ResourceUpdate
+from app.services.models.create_referral_request_body import CreateReferralRequestBody
+from app.stats import get_stats
+
+logger = logging.getLogger(__name__)
+
+# Rough memory use of a cached resource next to its JSON, used for the memory budget
+ENTRY_OVERHEAD = 512
+
+CacheKey = tuple[str, str, int]
+
+
+@dataclass(frozen=True)
+class CachedResource:
+    """
+    Snapshot of a resource entry with its serialized resource, which is kept in the cache instead of the entry
+    itself so no database state is shared between requests
+    """
+
+    id: uuid.UUID
+    pseudonym: uuid.UUID | None
+    resource_type: str
+    resource_id: str
+    version: int
+    created_dt: datetime
+    deleted: bool
+    resource_json: str
+
+    @classmethod
+    def from_entry(cls, entry: ResourceEntry) -> "CachedResource | None":
+        resource_json = entry.resource_json
+        if resource_json is None:
+            fhir_resource = convert_resource_to_fhir(entry.resource)
+            if fhir_resource is None:
+                return None
+            resource_json = fhir_resource.model_dump_json()
+
+        return cls(
+            id=entry.id,
+            pseudonym=entry.pseudonym,
+            resource_type=entry.resource_type,
+            resource_id=entry.resource_id,
+            version=entry.version,
+            created_dt=entry.created_dt,
+            deleted=entry.deleted,
+            resource_json=resource_json,
+        )
+
+    def to_entry(self) -> ResourceEntry:
+        """
+        Returns a new (transient) entry. Only the serialized resource is cached, so the resource dict of the entry
+        is not set.
+        """
+        return ResourceEntry(
+            id=self.id,
+            pseudonym=self.pseudonym,
+            resource_type=self.resource_type,
+            resource_id=self.resource_id,
+            version=self.version,
+            created_dt=self.created_dt,
+            deleted=self.deleted,
+            resource_json=self.resource_json,
+        )
+
+    def sizeof(self) -> int:
+        return len(self.resource_json) + ENTRY_OVERHEAD
+
+
+@dataclass
+class CacheState:
+    """
+    State of the cache, shared by the caching adapters (sync, async and the adapters bound to a session) of a
+    process, so a write through any of them invalidates the resource for all of them
+    """
+
+    cache: TtlLruCache[CacheKey, CachedResource]
+    hits: int = 0
+    misses: int = 0
+    # Incremented on every invalidation, so reads that overlap with a write do not cache a stale version
+    generation: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @classmethod
+    def create(cls, max_size: int, max_bytes: int) -> "CacheState":
+        return cls(TtlLruCache(max_size=max_size, max_bytes=max_bytes, sizeof=CachedResource.sizeof))
+
+    def get(self, key: CacheKey) -> CachedResource | None:
+        """
+        Returns the cached resource and counts the hit or miss
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            get_stats().inc("resource.cache.hit")
+        else:
+            self.misses += 1
+            get_stats().inc("resource.cache.miss")
+        return cached
+
+    def store(self, key: CacheKey, entry: ResourceEntry | None, generation: int) -> None:
+        """
+        Cache an entry read from the database, unless the cache was invalidated since the read started
+        """
+        resource = CachedResource.from_entry(entry) if entry is not None else None
+        if resource is not None:
+            with self.lock:
+                if generation == self.generation:
+                    self.cache.set(key, resource)
+
+        get_stats().gauge("resource.cache.bytes", self.cache.bytes)
+
+    def invalidate(self, keys: Sequence[CacheKey]) -> None:
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                self.cache.invalidate(key)
+
+    def invalidate_resource(self, resource_type: str, resource_id: str) -> None:
+        # All versions are marked as deleted
+        type_key, id_key, _ = cache_key(resource_type, resource_id, 0)
+        with self.lock:
+            self.generation += 1
+            self.cache.invalidate_where(lambda key: key[0] == type_key and key[1] == id_key)
+
+    def flush(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.cache.clear()
+        get_stats().gauge("resource.cache.bytes", self.cache.bytes)
+
+
+def cache_key(resource_type: str, resource_id: str, version: int) -> CacheKey:
+    # Resources are matched case-insensitively, like the database does
+    resource_type, resource_id = sanitize(resource_type, resource_id)
+    return resource_type.lower(), resource_id.lower(), version
+
+
+class CachingMetadataAdapter(MetadataAdapter):
+    """
+    Read-through cache for single resources in front of another adapter. Reads of the current version (version 0)
+    are cached until the resource is updated or deleted through this adapter. Reads of a specific version are
+    immutable and stay cached until evicted, or until the resource is deleted (which marks all its versions as
+    deleted). The cache is limited by both the number of entries and the size of the cached resources.
+
+    Updates done by other processes are only seen when the cache is registered with an InvalidationListener, which
+    calls invalidate() and flush().
+    """
+
+    def __init__(self, inner: MetadataAdapter, max_size: int, max_bytes: int):
+        self.inner = inner
+        self.db_session: DbSession | None = None
+        self.state = CacheState.create(max_size, max_bytes)
+
+    @property
+    def cache(self) -> TtlLruCache[CacheKey, CachedResource]:
+        return self.state.cache
+
+    @property
+    def hits(self) -> int:
+        return self.state.hits
+
+    @property
+    def misses(self) -> int:
+        return self.state.misses
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def with_session(self, db_session: DbSession) -> "CachingMetadataAdapter":
+        """
+        Returns an adapter that shares this cache, but reads and writes through the given session
+        """
+        bound = copy.copy(self)
+        bound.inner = self.inner.with_session(db_session)
+        bound.db_session = db_session
+        return bound
+
+    def search(self, resource_type: str, resource_id: str, version: int) -> ResourceEntry | None:
+        key = cache_key(resource_type, resource_id, version)
+
+        cached = self.state.get(key)
+        if cached is not None:
+            return cached.to_entry()
+
+        generation = self.state.generation
+        entry = self.inner.search(resource_type, resource_id, version)
+        self.state.store(key, entry, generation)
+        return entry
+
+    def search_version(self, resource_type: str, resource_id: str, version: int) -> ResourceVersion | None:
+        cached = self.cache.get(cache_key(resource_type, resource_id, version))
+        if cached is not None:
+            return ResourceVersion(cached.version, cached.created_dt, cached.deleted)
+
+        return self.inner.search_version(resource_type, resource_id, version)
+
+    def delete(self, resource_type: str, resource_id: str) -> None:
+        try:
+            self.inner.delete(resource_type, resource_id)
+        finally:
+            self._after_write(lambda: self.state.invalidate_resource(resource_type, resource_id))
+
+    def invalidate(self, invalidation: Invalidation) -> None:
+        """
+        Invalidate a resource written by another process
+        """
+        if invalidation.flush or invalidation.resource_type is None or invalidation.resource_id is None:
+            self.flush()
+        elif invalidation.deleted:
+            self.state.invalidate_resource(invalidation.resource_type, invalidation.resource_id)
+        else:
+            self.state.invalidate([cache_key(invalidation.resource_type, invalidation.resource_id, 0)])
+
+    def flush(self) -> None:
+        self.state.flush()
+
+    def update(
+        self,
+        resource_type: str,
+        resource_id: str,
+        data: dict[str, Any],
+        pseudonym: Pseudonym | None,
+        referral: CreateReferralRequestBody | None = None,
+        resource_json: str | None = None,
+        expected_version: int | None = None,
+    ) -> ResourceEntry | None:
+        try:
+            return self.inner.update(
+                resource_type, resource_id, data, pseudonym, referral, resource_json, expected_version
+            )
+        finally:
+            keys = [cache_key(resource_type, resource_id, 0)]
+            self._after_write(lambda: self.state.invalidate(keys))
+
+    def update_many(self, updates: Sequence[ResourceUpdate], atomic: bool = False) -> list[ResourceEntry | None]:
+        try:
+            return self.inner.update_many(updates, atomic)
+        finally:
+            keys = [cache_key(update.resource_type, update.resource_id, 0) for update in updates]
+            self._after_write(lambda: self.state.invalidate(keys))
+
+    def search_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str) -> Sequence[ResourceEntry]:
+        return self.inner.search_by_pseudonym(pseudonym, resource_type)
+
+    def stream_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str, batch_size: int) -> Iterator[ResourceEntry]:
+        return self.inner.stream_by_pseudonym(pseudonym, resource_type, batch_size)
+
+    def page_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, count: int, cursor: PageCursor | None
+    ) -> ResourceEntryPage:
+        return self.inner.page_by_pseudonym(pseudonym, resource_type, count, cursor)
+
+    def _after_write(self, invalidate: Callable[[], None]) -> None:
+        invalidate()
+        # Within a session, the write is only visible to other sessions once it is committed. Reads in between could
+        # cache the old version again, so the resource is invalidated once more after the commit.
+        if self.db_session is not None:
+            self.db_session.after_commit(invalidate)
+
+
+class AsyncCachingMetadataAdapter(AsyncMetadataAdapter):
+    """
+    Asynchronous counterpart of CachingMetadataAdapter. It is given the state of the synchronous adapter, so both
+    serve the same cache and invalidations through either of them (or the InvalidationListener) apply to both.
+    Every operation of the inner adapter runs in its own session, so writes are committed when they return.
+    """
+
+    def __init__(self, inner: AsyncMetadataAdapter, state: CacheState):
+        self.inner = inner
+        self.state = state
+
+    async def search(self, resource_type: str, resource_id: str, version: int) -> ResourceEntry | None:
+        key = cache_key(resource_type, resource_id, version)
+
+        cached = self.state.get(key)
+        if cached is not None:
+            return cached.to_entry()
+
+        generation = self.state.generation
+        entry = await self.inner.search(resource_type, resource_id, version)
+        self.state.store(key, entry, generation)
+        return entry
+
+    async def search_version(self, resource_type: str, resource_id: str, version: int) -> ResourceVersion | None:
+        cached = self.state.cache.get(cache_key(resource_type, resource_id, version))
+        if cached is not None:
+            return ResourceVersion(cached.version, cached.created_dt, cached.deleted)
+
+        return await self.inner.search_version(resource_type, resource_id, version)
+
+    async def delete(self, resource_type: str, resource_id: str) -> None:
+        try:
+            await self.inner.delete(resource_type, resource_id)
+        finally:
+            self.state.invalidate_resource(resource_type, resource_id)
+
+    async def update(
+        self,
+        resource_type: str,
+        resource_id: str,
+        data: dict[str, Any],
+        pseudonym: Pseudonym | None,
+        referral: CreateReferralRequestBody | None = None,
+        resource_json: str | None = None,
+        expected_version: int | None = None,
+    ) -> ResourceEntry | None:
+        try:
+            return await self.inner.update(
+                resource_type, resource_id, data, pseudonym, referral, resource_json, expected_version
+            )
+        finally:
+            self.state.invalidate([cache_key(resource_type, resource_id, 0)])
+
+    async def search_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str) -> Sequence[ResourceEntry]:
+        return await self.inner.search_by_pseudonym(pseudonym, resource_type)
+
+    def stream_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, batch_size: int
+    ) -> AsyncIterator[ResourceEntry]:
+        return self.inner.stream_by_pseudonym(pseudonym, resource_type, batch_size)
+
+    async def page_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, count: int, cursor: PageCursor | None
+    ) -> ResourceEntryPage:
+        return await self.inner.page_by_pseudonym(pseudonym, resource_type, count, cursor)
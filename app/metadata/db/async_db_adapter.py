@@ -0,0 +1,110 @@
+import logging
+from typing import Any, AsyncIterator, Sequence
+
+from app.data import PageCursor, Pseudonym
+from app.db.db import AsyncDatabase
+from app.db.models import ResourceEntry
+from app.db.repository.resource_entry import ResourceEntryPage, ResourceEntryRepository, ResourceVersion
+from app.metadata.db.db_adapter import create_outbox_entry, sanitize
+from app.metadata.metadata_service import AsyncMetadataAdapter
+from app.services.models.create_referral_request_body import CreateReferralRequestBody
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDbMetadataAdapter(AsyncMetadataAdapter):
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def search_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str) -> Sequence[ResourceEntry]:
+        """
+        Search for metadata for a pseudonym
+        """
+        async with self.db.get_db_session() as session:
+            return await session.run_sync(
+                lambda s: s.get_repository(ResourceEntryRepository).find_by_pseudonym(pseudonym, resource_type)
+            )
+
+    async def stream_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, batch_size: int
+    ) -> AsyncIterator[ResourceEntry]:
+        """
+        Stream the metadata for a pseudonym. The database session stays open until the iterator is exhausted
+        or closed.
+        """
+        stmt = ResourceEntryRepository.select_by_pseudonym(pseudonym, resource_type)
+
+        async with self.db.get_db_session() as session:
+            async for entry in session.stream_scalars(stmt, batch_size):
+                yield entry
+
+    async def page_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, count: int, cursor: PageCursor | None
+    ) -> ResourceEntryPage:
+        """
+        Search for a page of metadata for a pseudonym
+        """
+        async with self.db.get_db_session() as session:
+            return await session.run_sync(
+                lambda s: s.get_repository(ResourceEntryRepository).find_page_by_pseudonym(
+                    pseudonym, resource_type, count, cursor
+                )
+            )
+
+    async def search(self, resource_type: str, resource_id: str, version: int) -> ResourceEntry | None:
+        """
+        Search for metadata for a resource
+        """
+        (resource_type, resource_id) = sanitize(resource_type, resource_id)
+
+        async with self.db.get_db_session() as session:
+            return await session.run_sync(
+                lambda s: s.get_repository(ResourceEntryRepository).find_by_resource(
+                    resource_type, resource_id, version
+                )
+            )
+
+    async def search_version(self, resource_type: str, resource_id: str, version: int) -> ResourceVersion | None:
+        """
+        Search for the version information of a resource
+        """
+        (resource_type, resource_id) = sanitize(resource_type, resource_id)
+
+        async with self.db.get_db_session() as session:
+            return await session.run_sync(
+                lambda s: s.get_repository(ResourceEntryRepository).find_version(resource_type, resource_id, version)
+            )
+
+    async def delete(self, resource_type: str, resource_id: str) -> None:
+        """
+        Delete metadata for a resource
+        """
+        (resource_type, resource_id) = sanitize(resource_type, resource_id)
+
+        async with self.db.get_db_session() as session:
+            await session.run_sync(
+                lambda s: s.get_repository(ResourceEntryRepository).delete_by_resource(resource_type, resource_id)
+            )
+
+    async def update(
+        self,
+        resource_type: str,
+        resource_id: str,
+        data: dict[str, Any],
+        pseudonym: Pseudonym | None,
+        referral: CreateReferralRequestBody | None = None,
+        resource_json: str | None = None,
+        expected_version: int | None = None,
+    ) -> ResourceEntry | None:
+        """
+        Update metadata for a resource. With an expected version, the update is only done when the resource is
+        at that version.
+        """
+        outbox = create_outbox_entry(referral) if referral is not None else None
+
+        async with self.db.get_db_session() as session:
+            return await session.run_sync(
+                lambda s: s.get_repository(ResourceEntryRepository).upsert(
+                    resource_type, resource_id, data, pseudonym, outbox, resource_json, expected_version
+                )
+            )
@@ -1,11 +1,21 @@
 import logging
-from typing import Any, Sequence, Tuple
+import uuid
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, ContextManager, Iterator, Sequence, Tuple
 
-from app.data import Pseudonym
+from app.data import PageCursor, Pseudonym
 from app.db.db import Database
-from app.db.models import ResourceEntry
-from app.db.repository.resource_entry import ResourceEntryRepository
-from app.metadata.metadata_service import MetadataAdapter
+from app.db.models import ReferralOutboxEntry, ResourceEntry
+from app.db.repository.resource_entry import (
+    ResourceEntryPage,
+    ResourceEntryRepository,
+    ResourceVersion,
+    ResourceWrite,
+)
+from app.db.session import DbSession
+from app.metadata.metadata_service import MetadataAdapter, ResourceUpdate
+from app.services.models.create_referral_request_body import CreateReferralRequestBody
 
 logger = logging.getLogger(__name__)
 
@@ -20,26 +30,66 @@ def sanitize(resource_type: str, resource_id: str) -> Tuple[str, str]:
     return resource_type, resource_id
 
 
+def create_outbox_entry(referral: CreateReferralRequestBody) -> ReferralOutboxEntry:
+    return ReferralOutboxEntry(
+        id=uuid.uuid4(),
+        pseudonym=referral.pseudonym.value,
+        data_domain=str(referral.data_domain),
+        ura_number=str(referral.ura_number),
+        requesting_uzi_number=referral.requesting_uzi_number,
+        attempts=0,
+        next_attempt_dt=datetime.now(),
+        failed=False,
+        created_dt=datetime.now(),
+    )
+
+
 class DbMetadataAdapter(MetadataAdapter):
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, db_session: DbSession | None = None):
         self.db = db
+        self.db_session = db_session
+
+    def with_session(self, db_session: DbSession) -> "DbMetadataAdapter":
+        """
+        Returns an adapter that does all its work in the given session, for instance the unit of work of a request
+        """
+        return DbMetadataAdapter(self.db, db_session)
 
     def search_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str) -> Sequence[ResourceEntry]:
         """
         Search for metadata for a pseudonym
         """
-        with self.db.get_db_session() as session:
+        with self._session() as session:
             resource_repository = session.get_repository(ResourceEntryRepository)
             if not resource_repository:
                 return []
 
             return resource_repository.find_by_pseudonym(pseudonym, resource_type)
 
+    def stream_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str, batch_size: int) -> Iterator[ResourceEntry]:
+        """
+        Stream the metadata for a pseudonym. The database session stays open until the iterator is exhausted
+        or closed. Streams are consumed after the request has ended, so they always use a session of their own.
+        """
+        with self.db.get_db_session() as session:
+            resource_repository = session.get_repository(ResourceEntryRepository)
+            yield from resource_repository.stream_by_pseudonym(pseudonym, resource_type, batch_size)
+
+    def page_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, count: int, cursor: PageCursor | None
+    ) -> ResourceEntryPage:
+        """
+        Search for a page of metadata for a pseudonym
+        """
+        with self._session() as session:
+            resource_repository = session.get_repository(ResourceEntryRepository)
+            return resource_repository.find_page_by_pseudonym(pseudonym, resource_type, count, cursor)
+
     def search(self, resource_type: str, resource_id: str, version: int) -> ResourceEntry | None:
         """
         Search for metadata for a resource
         """
-        with self.db.get_db_session() as session:
+        with self._session() as session:
             (resource_type, resource_id) = sanitize(resource_type, resource_id)
 
             resource_repository = session.get_repository(ResourceEntryRepository)
@@ -48,11 +98,21 @@ class DbMetadataAdapter(MetadataAdapter):
 
             return resource_repository.find_by_resource(resource_type, resource_id, version)
 
+    def search_version(self, resource_type: str, resource_id: str, version: int) -> ResourceVersion | None:
+        """
+        Search for the version information of a resource
+        """
+        with self._session() as session:
+            (resource_type, resource_id) = sanitize(resource_type, resource_id)
+
+            resource_repository = session.get_repository(ResourceEntryRepository)
+            return resource_repository.find_version(resource_type, resource_id, version)
+
     def delete(self, resource_type: str, resource_id: str) -> None:
         """
         Delete metadata for a resource
         """
-        with self.db.get_db_session() as session:
+        with self._session() as session:
             (resource_type, resource_id) = sanitize(resource_type, resource_id)
 
             resource_repository = session.get_repository(ResourceEntryRepository)
@@ -67,13 +127,45 @@ class DbMetadataAdapter(MetadataAdapter):
         resource_id: str,
         data: dict[str, Any],
         pseudonym: Pseudonym | None,
+        referral: CreateReferralRequestBody | None = None,
+        resource_json: str | None = None,
+        expected_version: int | None = None,
     ) -> ResourceEntry | None:
         """
-        Update metadata for a resource
+        Update metadata for a resource. With an expected version, the update is only done when the resource is
+        at that version.
         """
-        with self.db.get_db_session() as session:
+        with self._session() as session:
             resource_repository = session.get_repository(ResourceEntryRepository)
             if not resource_repository:
                 return None
 
-            return resource_repository.upsert(resource_type, resource_id, data, pseudonym)
+            outbox = create_outbox_entry(referral) if referral is not None else None
+            return resource_repository.upsert(
+                resource_type, resource_id, data, pseudonym, outbox, resource_json, expected_version
+            )
+
+    def update_many(self, updates: Sequence[ResourceUpdate], atomic: bool = False) -> list[ResourceEntry | None]:
+        """
+        Update metadata for multiple resources in a single transaction
+        """
+        writes = [
+            ResourceWrite(
+                resource_type=update.resource_type,
+                resource_id=update.resource_id,
+                data=update.data,
+                pseudonym=update.pseudonym,
+                outbox=create_outbox_entry(update.referral) if update.referral is not None else None,
+                resource_json=update.resource_json,
+                expected_version=update.expected_version,
+            )
+            for update in updates
+        ]
+
+        with self._session() as session:
+            return session.get_repository(ResourceEntryRepository).upsert_many(writes, atomic)
+
+    def _session(self) -> ContextManager[DbSession]:
+        if self.db_session is not None:
+            return nullcontext(self.db_session)
+        return self.db.get_db_session()
@@ -1,6 +1,6 @@
 import importlib
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, Type
 
 from fhir.resources.R4B.resource import Resource
 from pydantic import BaseModel
@@ -8,15 +8,19 @@ from pydantic import BaseModel
 logger = logging.getLogger(__name__)
 
 
-ALLOWED_RESOURCES = [
-    "Patient",
-    "ImagingStudy",
-    "Observation",
-    "Practitioner",
-    "Organization",
-    "Medication",
-    "MedicationStatement",
-]
+# Allowed resource types and the module their model class is defined in
+ALLOWED_RESOURCES: Dict[str, str] = {
+    "Patient": "fhir.resources.R4B.patient",
+    "ImagingStudy": "fhir.resources.R4B.imagingstudy",
+    "Observation": "fhir.resources.R4B.observation",
+    "Practitioner": "fhir.resources.R4B.practitioner",
+    "Organization": "fhir.resources.R4B.organization",
+    "Medication": "fhir.resources.R4B.medication",
+    "MedicationStatement": "fhir.resources.R4B.medicationstatement",
+}
+
+# Resolved model classes, filled on first use or by warm_up_resource_classes()
+_RESOURCE_CLASSES: Dict[str, Type[Resource]] = {}
 
 
 class OperationOutcomeDetail(BaseModel):
@@ -34,6 +38,35 @@ class OperationOutcome(BaseModel):
     issue: list[OperationOutcomeIssue]
 
 
+def get_resource_class(resource_type: str) -> Type[Resource] | None:
+    """
+    Returns the model class for an allowed resource type, or None when the type is not allowed
+    """
+    resource_class = _RESOURCE_CLASSES.get(resource_type)
+    if resource_class is not None:
+        return resource_class
+
+    module_name = ALLOWED_RESOURCES.get(resource_type)
+    if module_name is None:
+        return None
+
+    module_class = getattr(importlib.import_module(module_name), resource_type, None)
+    if not isinstance(module_class, type) or not issubclass(module_class, Resource):
+        raise ValueError(f"Resource type {resource_type} is not supported.")
+
+    _RESOURCE_CLASSES[resource_type] = module_class
+    return module_class
+
+
+def warm_up_resource_classes() -> None:
+    """
+    Resolve the model classes of all allowed resource types, so the first requests do not pay for the imports
+    """
+    for resource_type in ALLOWED_RESOURCES:
+        get_resource_class(resource_type)
+    logger.info("Loaded %d FHIR resource classes", len(_RESOURCE_CLASSES))
+
+
 def convert_resource_to_fhir(data: Dict[str, Any]) -> Resource | None:
     """
     Convert a resource entry (database entry) to a FHIR resource model
@@ -51,20 +84,20 @@ def convert_resource_to_fhir(data: Dict[str, Any]) -> Resource | None:
         return None
 
     try:
-        module = importlib.import_module(f"fhir.resources.R4B.{resource_type.lower()}")
-        resource_class = getattr(module, resource_type, None)
-        if resource_class:
-            try:
-                resource = resource_class.model_validate(data)
-                if isinstance(resource, Resource):
-                    return resource
-            except Exception as e:
-                logger.error(f"Could not parse resource {data}: {e}")
-                return None
-        else:
-            logger.error(f"Resource type {resource_type} is not supported.")
-
+        resource_class = get_resource_class(resource_type)
     except Exception as e:
         logger.error(f"Could not parse resource type {resource_type}: {e}")
+        return None
+
+    if resource_class is None:
+        logger.error(f"Resource type {resource_type} is not supported.")
+        return None
+
+    try:
+        resource = resource_class.model_validate(data)
+        if isinstance(resource, Resource):
+            return resource
+    except Exception as e:
+        logger.error(f"Could not parse resource {data}: {e}")
 
     return None
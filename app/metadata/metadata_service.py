@@ -1,24 +1,56 @@
-from typing import Any, Protocol, Sequence
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Iterator, Protocol, Sequence
 
-from app.data import Pseudonym
+from fhir.resources.R4B.resource import Resource
+
+from app.data import PageCursor, Pseudonym
 from app.db.models import ResourceEntry
-from app.metadata.fhir import convert_resource_to_fhir
-from app.metadata.validators.ImagingStudy import ImagingStudyValidator
-from app.metadata.validators.medication import MedicationValidator
-from app.metadata.validators.medication_statement import MedicationStatementValidator
-from app.metadata.validators.Patient import PatientValidator
-from app.metadata.validators.Validator import (
-    InvalidResourceError,
-    ValidationError,
-    Validator,
-)
+from app.db.repository.resource_entry import ResourceEntryPage, ResourceVersion, VersionConflictError
+from app.db.session import DbSession
+from app.metadata.validation import ValidationExecutor, validate_resource
+from app.services.models.create_referral_request_body import CreateReferralRequestBody
+
+
+@dataclass
+class ResourceUpdate:
+    """
+    A single resource write in a bulk update
+    """
+
+    resource_type: str
+    resource_id: str
+    data: dict[str, Any]
+    pseudonym: Pseudonym | None = None
+    referral: CreateReferralRequestBody | None = None
+    expected_version: int | None = None
+    resource_json: str | None = None
+
+
+@dataclass
+class ResourceUpdateResult:
+    """
+    Outcome of a single resource write in a bulk update: either the stored entry or the error
+    """
+
+    entry: ResourceEntry | None = None
+    error: Exception | None = None
 
 
 class MetadataAdapter(Protocol):
     def search_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str) -> Sequence[ResourceEntry]: ...
 
+    def stream_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, batch_size: int
+    ) -> Iterator[ResourceEntry]: ...
+
+    def page_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, count: int, cursor: PageCursor | None
+    ) -> ResourceEntryPage: ...
+
     def search(self, resource_type: str, resource_id: str, version: int) -> ResourceEntry | None: ...
 
+    def search_version(self, resource_type: str, resource_id: str, version: int) -> ResourceVersion | None: ...
+
     def delete(self, resource_type: str, resource_id: str) -> None: ...
 
     def update(
@@ -27,56 +59,77 @@ class MetadataAdapter(Protocol):
         resource_id: str,
         data: dict[str, Any],
         pseudonym: Pseudonym | None,
+        referral: CreateReferralRequestBody | None = None,
+        resource_json: str | None = None,
+        expected_version: int | None = None,
     ) -> ResourceEntry | None: ...
 
+    def update_many(self, updates: Sequence[ResourceUpdate], atomic: bool = False) -> list[ResourceEntry | None]: ...
+
+    def with_session(self, db_session: DbSession) -> "MetadataAdapter": ...
+
 
-def create_validator(resource_type: str) -> Validator | None:
-    match resource_type:
-        case "ImagingStudy":
-            return ImagingStudyValidator()
-        case "Patient":
-            return PatientValidator()
-        case "Medication":
-            return MedicationValidator()
-        case "MedicationStatement":
-            return MedicationStatementValidator()
-        case _:
-            return None
+class AsyncMetadataAdapter(Protocol):
+    async def search_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str) -> Sequence[ResourceEntry]: ...
 
+    def stream_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, batch_size: int
+    ) -> AsyncIterator[ResourceEntry]: ...
 
-def validate_resource(resource_type: str, resource_id: str, data: dict[str, Any]) -> None:
-    if data is None:
-        raise ValidationError()
+    async def page_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, count: int, cursor: PageCursor | None
+    ) -> ResourceEntryPage: ...
 
-    if "resourceType" not in data:
-        raise ValidationError("resourceType is required in the resource data")
-    if data["resourceType"].lower() != resource_type.lower():
-        raise InvalidResourceError("resource type does not match the resource type in the URL")
+    async def search(self, resource_type: str, resource_id: str, version: int) -> ResourceEntry | None: ...
 
-    if "id" not in data:
-        raise ValidationError("id is required in the resource data")
-    if data["id"].lower() != resource_id.lower():
-        raise ValidationError("id in the resource data does not match the resource id in the URL")
+    async def search_version(self, resource_type: str, resource_id: str, version: int) -> ResourceVersion | None: ...
 
-    fhir_resource = convert_resource_to_fhir(data)
-    if fhir_resource is None:
-        raise InvalidResourceError("Resource is invalid")
+    async def delete(self, resource_type: str, resource_id: str) -> None: ...
 
-    validator = create_validator(resource_type)
-    if validator:
-        validator.validate(fhir_resource)
+    async def update(
+        self,
+        resource_type: str,
+        resource_id: str,
+        data: dict[str, Any],
+        pseudonym: Pseudonym | None,
+        referral: CreateReferralRequestBody | None = None,
+        resource_json: str | None = None,
+        expected_version: int | None = None,
+    ) -> ResourceEntry | None: ...
 
 
 class MetadataService:
-    def __init__(self, adapter: MetadataAdapter):
+    def __init__(self, adapter: MetadataAdapter, validation_executor: ValidationExecutor | None = None):
         self.adapter = adapter
+        self.validation_executor = validation_executor or ValidationExecutor()
+
+    def with_session(self, db_session: DbSession) -> "MetadataService":
+        """
+        Returns a service that does all its database work in the given session, so multiple operations share a
+        single connection and transaction
+        """
+        return MetadataService(self.adapter.with_session(db_session), self.validation_executor)
 
     def search_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str) -> Sequence[ResourceEntry]:
         return self.adapter.search_by_pseudonym(pseudonym, resource_type)
 
+    def stream_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str, batch_size: int) -> Iterator[ResourceEntry]:
+        return self.adapter.stream_by_pseudonym(pseudonym, resource_type, batch_size)
+
+    def page_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, count: int, cursor: PageCursor | None = None
+    ) -> ResourceEntryPage:
+        return self.adapter.page_by_pseudonym(pseudonym, resource_type, count, cursor)
+
     def search(self, resource_type: str, resource_id: str, version: int) -> ResourceEntry | None:
         return self.adapter.search(resource_type, resource_id, version)
 
+    def search_version(self, resource_type: str, resource_id: str, version: int) -> ResourceVersion | None:
+        """
+        Returns only the version information of a resource, which is enough to answer conditional reads
+        """
+        return self.adapter.search_version(resource_type, resource_id, version)
+
     def delete(self, resource_type: str, resource_id: str) -> None:
         return self.adapter.delete(resource_type, resource_id)
 
@@ -86,6 +139,90 @@ class MetadataService:
         resource_id: str,
         data: dict[str, Any],
         pseudonym: Pseudonym | None,
-    ) -> ResourceEntry | None:
-        validate_resource(resource_type, resource_id, data)
-        return self.adapter.update(resource_type, resource_id, data, pseudonym)
+        referral: CreateReferralRequestBody | None = None,
+        expected_version: int | None = None,
+    ) -> tuple[ResourceEntry | None, Resource]:
+        """
+        Validate and store the resource. When a referral is given, it is queued in the referral outbox together
+        with the resource. With an expected version, an existing resource is only updated when it is at that
+        version, otherwise a VersionConflictError is raised. Returns the stored entry together with the validated
+        FHIR resource, so callers do not need to parse the resource again.
+        """
+        fhir_resource = validate_resource(resource_type, resource_id, data)
+        resource_json = fhir_resource.model_dump_json()
+        entry = self.adapter.update(
+            resource_type, resource_id, data, pseudonym, referral, resource_json, expected_version
+        )
+        return entry, fhir_resource
+
+    def update_many(self, updates: Sequence[ResourceUpdate], atomic: bool = False) -> list[ResourceUpdateResult]:
+        """
+        Validate and store multiple resources in a single transaction. Invalid resources and version mismatches
+        are reported per update, and do not keep the other updates from being stored. When atomic is set, the first
+        error is raised instead and nothing is stored.
+        """
+        results = [ResourceUpdateResult() for _ in updates]
+        validations = self.validation_executor.validate_many(
+            [(update.resource_type, update.resource_id, update.data) for update in updates]
+        )
+
+        valid: list[tuple[int, ResourceUpdate]] = []
+        for index, (update, validation) in enumerate(zip(updates, validations)):
+            if validation.error is not None:
+                if atomic:
+                    raise validation.error
+                results[index].error = validation.error
+                continue
+            valid.append((index, replace(update, resource_json=validation.resource_json)))
+
+        entries = self.adapter.update_many([update for _, update in valid], atomic)
+        for (index, update), entry in zip(valid, entries):
+            if entry is None:
+                results[index].error = VersionConflictError(f"Resource is not at version {update.expected_version}")
+            else:
+                results[index].entry = entry
+
+        return results
+
+
+class AsyncMetadataService:
+    def __init__(self, adapter: AsyncMetadataAdapter):
+        self.adapter = adapter
+
+    async def search_by_pseudonym(self, pseudonym: Pseudonym, resource_type: str) -> Sequence[ResourceEntry]:
+        return await self.adapter.search_by_pseudonym(pseudonym, resource_type)
+
+    def stream_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, batch_size: int
+    ) -> AsyncIterator[ResourceEntry]:
+        return self.adapter.stream_by_pseudonym(pseudonym, resource_type, batch_size)
+
+    async def page_by_pseudonym(
+        self, pseudonym: Pseudonym, resource_type: str, count: int, cursor: PageCursor | None = None
+    ) -> ResourceEntryPage:
+        return await self.adapter.page_by_pseudonym(pseudonym, resource_type, count, cursor)
+
+    async def search(self, resource_type: str, resource_id: str, version: int) -> ResourceEntry | None:
+        return await self.adapter.search(resource_type, resource_id, version)
+
+    async def search_version(self, resource_type: str, resource_id: str, version: int) -> ResourceVersion | None:
+        return await self.adapter.search_version(resource_type, resource_id, version)
+
+    async def delete(self, resource_type: str, resource_id: str) -> None:
+        return await self.adapter.delete(resource_type, resource_id)
+
+    async def update(
+        self,
+        resource_type: str,
+        resource_id: str,
+        data: dict[str, Any],
+        pseudonym: Pseudonym | None,
+        referral: CreateReferralRequestBody | None = None,
+        expected_version: int | None = None,
+    ) -> tuple[ResourceEntry | None, Resource]:
+        fhir_resource = validate_resource(resource_type, resource_id, data)
+        resource_json = fhir_resource.model_dump_json()
+        entry = await self.adapter.update(
+            resource_type, resource_id, data, pseudonym, referral, resource_json, expected_version
+        )
+        return entry, fhir_resource
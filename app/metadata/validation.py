@@ -0,0 +1,134 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+from fhir.resources.R4B.resource import Resource
+
+from app.metadata.fhir import convert_resource_to_fhir, warm_up_resource_classes
+from app.metadata.validators.ImagingStudy import ImagingStudyValidator
+from app.metadata.validators.medication import MedicationValidator
+from app.metadata.validators.medication_statement import MedicationStatementValidator
+from app.metadata.validators.Patient import PatientValidator
+from app.metadata.validators.Validator import (
+    InvalidResourceError,
+    ValidationError,
+    Validator,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def create_validator(resource_type: str) -> Validator | None:
+    match resource_type:
+        case "ImagingStudy":
+            return ImagingStudyValidator()
+        case "Patient":
+            return PatientValidator()
+        case "Medication":
+            return MedicationValidator()
+        case "MedicationStatement":
+            return MedicationStatementValidator()
+        case _:
+            return None
+
+
+def validate_resource(resource_type: str, resource_id: str, data: dict[str, Any]) -> Resource:
+    """
+    Validate the resource data and return the parsed FHIR resource
+    """
+    if data is None:
+        raise ValidationError()
+
+    if "resourceType" not in data:
+        raise ValidationError("resourceType is required in the resource data")
+    if not isinstance(data["resourceType"], str):
+        raise ValidationError("resourceType in the resource data must be a string")
+    if data["resourceType"].lower() != resource_type.lower():
+        raise InvalidResourceError("resource type does not match the resource type in the URL")
+
+    if "id" not in data:
+        raise ValidationError("id is required in the resource data")
+    if not isinstance(data["id"], str):
+        raise ValidationError("id in the resource data must be a string")
+    if data["id"].lower() != resource_id.lower():
+        raise ValidationError("id in the resource data does not match the resource id in the URL")
+
+    fhir_resource = convert_resource_to_fhir(data)
+    if fhir_resource is None:
+        raise InvalidResourceError("Resource is invalid")
+
+    validator = create_validator(resource_type)
+    if validator:
+        validator.validate(fhir_resource)
+
+    return fhir_resource
+
+
+@dataclass
+class ValidationResult:
+    """
+    Result of validating a single resource: its canonical serialization, or the error when it is invalid
+    """
+
+    resource_json: str | None = None
+    error: InvalidResourceError | ValidationError | None = None
+
+
+def validate_chunk(chunk: Sequence[tuple[str, str, dict[str, Any]]]) -> list[ValidationResult]:
+    """
+    Validate a chunk of (resource_type, resource_id, data) tuples. Only the serialized resources travel back to the
+    calling process, as those are much cheaper to transfer than the parsed models.
+    """
+    results = []
+    for resource_type, resource_id, data in chunk:
+        try:
+            fhir_resource = validate_resource(resource_type, resource_id, data)
+            results.append(ValidationResult(resource_json=fhir_resource.model_dump_json()))
+        except (InvalidResourceError, ValidationError) as e:
+            results.append(ValidationResult(error=e))
+
+    return results
+
+
+class ValidationExecutor:
+    """
+    Validates resources in bulk. Validation is CPU-bound and holds the GIL, so with workers configured the
+    resources are validated in a pool of processes. Resources are sent to the workers in chunks of chunk_size, to
+    keep the IPC overhead down. Batches that fit in a single chunk, or all batches when there are no workers, are
+    validated in the calling process.
+    """
+
+    def __init__(self, workers: int = 0, chunk_size: int = 50):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._pool: ProcessPoolExecutor | None = None
+
+    def validate_many(self, resources: Sequence[tuple[str, str, dict[str, Any]]]) -> list[ValidationResult]:
+        if self.workers == 0 or len(resources) <= self.chunk_size:
+            return validate_chunk(resources)
+
+        chunks = [resources[i : i + self.chunk_size] for i in range(0, len(resources), self.chunk_size)]
+        results: list[ValidationResult] = []
+        for chunk_results in self._get_pool().map(validate_chunk, chunks):
+            results.extend(chunk_results)
+
+        return results
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            logger.info("Starting %d validation workers", self.workers)
+            # Spawn fresh interpreters, forking a process with running threads (like the web server) is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_up_resource_classes,
+            )
+
+        return self._pool
@@ -0,0 +1,199 @@
+import logging
+import uuid
+from http import HTTPStatus
+from typing import Any, Dict
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, Body, Depends, HTTPException
+from opentelemetry import trace
+
+from app import container
+from app.config import get_config
+from app.data import Pseudonym
+from app.db.models import ResourceEntry
+from app.db.repository.resource_entry import VersionConflictError
+from app.db.session import DbSession
+from app.metadata.fhir import OperationOutcome, OperationOutcomeDetail, OperationOutcomeIssue
+from app.metadata.metadata_service import MetadataService, ResourceUpdate
+from app.metadata.validators.Validator import InvalidResourceError, ValidationError
+from app.routers.resource import create_referral_request, parse_if_match
+from app.services.models.create_referral_request_body import CreateReferralRequestBody
+from app.services.nvi_api_service import NVIAPIServiceInterface
+from app.services.pseudonym_service import PseudonymService
+from app.stats import get_stats
+
+"""
+Batch and transaction bundles, to write many resources with a single request. Every entry is a PUT of a resource,
+like PUT /resource/{type}/{id}, and all entries are stored in a single database transaction. In a batch, failing
+entries are reported in the response and the other entries are stored. In a transaction, nothing is stored when
+any of the entries fails.
+"""
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+class BundleEntryError(Exception):
+    """
+    Raised when an entry of a bundle cannot be processed
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+@router.post(
+    "/",
+    summary="Processes a batch or transaction bundle of resources",
+    tags=["metadata"],
+)
+def post_bundle(
+    data: Dict[str, Any] = Body(...),
+    service: MetadataService = Depends(container.get_request_metadata_service),
+    db_session: DbSession = Depends(container.get_unit_of_work),
+    pseudonym_service: PseudonymService = Depends(container.get_pseudonym_service),
+    nvi_api_service: NVIAPIServiceInterface = Depends(container.get_nvi_service),
+) -> Any:
+    config = get_config()
+
+    if data.get("resourceType") != "Bundle":
+        raise HTTPException(status_code=400, detail="resourceType must be Bundle")
+    bundle_type = data.get("type")
+    if bundle_type not in ("batch", "transaction"):
+        raise HTTPException(status_code=400, detail="Bundle type must be batch or transaction")
+    entries = data.get("entry", [])
+    if not isinstance(entries, list):
+        raise HTTPException(status_code=400, detail="Bundle entries must be a list")
+    if len(entries) > config.app.bundle_max_entries:
+        raise HTTPException(status_code=400, detail=f"Bundle has more than {config.app.bundle_max_entries} entries")
+
+    span = trace.get_current_span()
+    span.set_attribute("data.bundle_type", bundle_type)
+    span.set_attribute("data.bundle_entries", len(entries))
+    get_stats().inc(f"http.post.bundle.{bundle_type}")
+
+    atomic = bundle_type == "transaction"
+    outbox_enabled = config.nvi_api.outbox_enabled
+    responses: list[dict[str, Any]] = [{} for _ in entries]
+    updates: list[tuple[int, ResourceUpdate]] = []
+    referrals: dict[str, CreateReferralRequestBody] = {}
+    referral_keys: dict[int, str] = {}
+
+    for index, entry in enumerate(entries):
+        try:
+            update, referral = create_update(entry, pseudonym_service, config.app.provider_id)
+        except BundleEntryError as e:
+            if atomic:
+                raise HTTPException(status_code=e.status_code, detail=f"Entry {index}: {e}")
+            responses[index] = error_response(e.status_code, str(e))
+            continue
+
+        # Only a single referral is needed per pseudonym. Every entry carries it to the outbox, as any of them can
+        # fail, and the outbox queues it once for the stored entries.
+        if referral is not None:
+            referral_keys[index] = str(referral.pseudonym)
+            referrals.setdefault(referral_keys[index], referral)
+            if outbox_enabled:
+                update.referral = referral
+        updates.append((index, update))
+
+    try:
+        results = service.update_many([update for _, update in updates], atomic)
+    except VersionConflictError as e:
+        raise HTTPException(status_code=412, detail=f"Precondition Failed: {e}")
+    except (InvalidResourceError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    stored_referrals = set()
+    for (index, _), result in zip(updates, results):
+        if result.entry is not None:
+            responses[index] = entry_response(result.entry)
+            if index in referral_keys:
+                stored_referrals.add(referral_keys[index])
+        elif isinstance(result.error, VersionConflictError):
+            responses[index] = error_response(412, f"Precondition Failed: {result.error}")
+        else:
+            responses[index] = error_response(400, str(result.error))
+
+    if not outbox_enabled and stored_referrals:
+        # Commit before calling the NVI, like PUT /resource does
+        db_session.commit()
+        for key, referral in referrals.items():
+            if key in stored_referrals:
+                nvi_api_service.create_referral(referral)
+
+    return {
+        "resourceType": "Bundle",
+        "id": str(uuid.uuid4()),
+        "type": f"{bundle_type}-response",
+        "entry": [{"response": response} for response in responses],
+    }
+
+
+def create_update(
+    entry: Any,
+    pseudonym_service: PseudonymService,
+    ura_number: str,
+) -> tuple[ResourceUpdate, CreateReferralRequestBody | None]:
+    """
+    Create the update for a bundle entry, together with the referral for its pseudonym (if any)
+    """
+    request = entry.get("request") if isinstance(entry, dict) else None
+    resource = entry.get("resource") if isinstance(entry, dict) else None
+    if not isinstance(request, dict) or not isinstance(resource, dict):
+        raise BundleEntryError(400, "Entry must have a request and a resource")
+    if request.get("method") != "PUT":
+        raise BundleEntryError(405, "Only PUT is supported")
+
+    url = str(request.get("url", ""))
+    path, _, query = url.partition("?")
+    parts = path.strip("/").split("/")
+    if parts[0] == "resource":
+        parts = parts[1:]
+    if len(parts) != 2 or not all(parts):
+        raise BundleEntryError(400, "Entry url must be {type}/{id}")
+    resource_type, resource_id = parts
+
+    try:
+        expected_version = parse_if_match(request.get("ifMatch"))
+    except HTTPException as e:
+        raise BundleEntryError(e.status_code, e.detail)
+
+    pseudonym = None
+    referral = None
+    params = parse_qs(query)
+    if "pseudonym" in params:
+        try:
+            typed_pseudonym = Pseudonym(params["pseudonym"][0])
+        except ValueError:
+            raise BundleEntryError(400, "Badly formed pseudonym")
+        pseudonym = pseudonym_service.exchange(typed_pseudonym, ura_number)
+        referral = create_referral_request(typed_pseudonym, ura_number)
+
+    update = ResourceUpdate(
+        resource_type=resource_type,
+        resource_id=resource_id,
+        data=resource,
+        pseudonym=pseudonym,
+        expected_version=expected_version,
+    )
+    return update, referral
+
+
+def entry_response(entry: ResourceEntry) -> dict[str, Any]:
+    status = HTTPStatus.CREATED if entry.version == 1 else HTTPStatus.OK
+    return {
+        "status": f"{status.value} {status.phrase}",
+        "location": f"{entry.resource_type}/{entry.resource_id}/_history/{entry.version}",
+        "etag": str(entry.version),
+        "lastModified": entry.created_dt.isoformat(),
+    }
+
+
+def error_response(status_code: int, detail: str) -> dict[str, Any]:
+    status = HTTPStatus(status_code)
+    outcome = OperationOutcome(
+        issue=[OperationOutcomeIssue(severity="error", code="processing", details=OperationOutcomeDetail(text=detail))]
+    )
+    return {"status": f"{status.value} {status.phrase}", "outcome": outcome.model_dump()}
@@ -0,0 +1,87 @@
+import logging
+from datetime import datetime
+from typing import Any
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from starlette.responses import FileResponse, JSONResponse, Response
+
+from app import container
+from app.services.export_service import ExportService, ExportStatus
+from app.stats import get_stats
+
+"""
+Asynchronous bulk export of the current resources as NDJSON, following the FHIR bulk data kick-off pattern. A
+GET on /$export starts an export job and returns 202 with the status url in Content-Location. The status url
+returns 202 while the job is running, and the manifest with the urls of the exported files when it is done.
+"""
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get(
+    "/$export",
+    summary="Starts an export of all current resources to NDJSON",
+    tags=["metadata"],
+    status_code=202,
+)
+def start_export(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    _type: str | None = Query(default=None, description="Comma separated resource types to export"),
+    _since: datetime | None = Query(default=None, description="Only export resources changed since this time"),
+    service: ExportService = Depends(container.get_export_service),
+) -> Response:
+    get_stats().inc("http.get.export")
+
+    resource_types = [t.strip() for t in _type.split(",") if t.strip()] if _type else None
+    job_id = service.create_job()
+    status_url = str(request.url_for("export_status", job_id=job_id))
+    background_tasks.add_task(service.run_job, job_id, str(request.url), status_url, resource_types, _since)
+
+    return Response(status_code=202, headers={"Content-Location": status_url})
+
+
+@router.get(
+    "/$export/{job_id}",
+    summary="Returns the status of an export, with the manifest when it is completed",
+    tags=["metadata"],
+    name="export_status",
+)
+def export_status(job_id: str, service: ExportService = Depends(container.get_export_service)) -> Any:
+    job = service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+
+    if job.status == ExportStatus.IN_PROGRESS:
+        return Response(status_code=202, headers={"X-Progress": job.status.value, "Retry-After": "5"})
+    if job.status == ExportStatus.FAILED:
+        raise HTTPException(status_code=500, detail=f"Export failed: {job.error}")
+
+    return JSONResponse(content=job.manifest)
+
+
+@router.get(
+    "/$export/{job_id}/{filename}",
+    summary="Returns an exported NDJSON file",
+    tags=["metadata"],
+)
+def export_file(job_id: str, filename: str, service: ExportService = Depends(container.get_export_service)) -> Any:
+    path = service.get_job_file(job_id, filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Export file not found")
+
+    return FileResponse(path, media_type="application/fhir+ndjson")
+
+
+@router.delete(
+    "/$export/{job_id}",
+    summary="Deletes an export and its files",
+    tags=["metadata"],
+    status_code=202,
+)
+def delete_export(job_id: str, service: ExportService = Depends(container.get_export_service)) -> Response:
+    if not service.delete_job(job_id):
+        raise HTTPException(status_code=404, detail="Export not found")
+
+    return Response(status_code=202)
@@ -1,15 +1,22 @@
+import email.utils
+import json
 import logging
 import uuid
-from typing import Annotated, Any, Dict
+from datetime import datetime
+from typing import Annotated, Any, AsyncIterator, Dict, Iterator, Sequence
 
-from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query
-from fhir.resources.R4B.bundle import Bundle, BundleEntry
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request
+from fhir.resources.R4B.bundle import Bundle, BundleEntry, BundleLink
+from fhir.resources.R4B.resource import Resource
 from opentelemetry import trace
-from starlette.responses import Response
+from starlette.responses import Response, StreamingResponse
 
 from app import container
 from app.config import get_config
-from app.data import DataDomain, Pseudonym, UraNumber
+from app.data import DataDomain, PageCursor, Pseudonym, UraNumber
+from app.db.models import ResourceEntry
+from app.db.repository.resource_entry import ResourceEntryPage, ResourceVersion, VersionConflictError
+from app.db.session import DbSession
 from app.metadata.fhir import convert_resource_to_fhir
 from app.metadata.metadata_service import MetadataService
 from app.metadata.validators.Validator import InvalidResourceError, ValidationError
@@ -28,9 +35,12 @@ router = APIRouter()
     tags=["metadata"],
 )
 def search_resource(
+    request: Request,
     pseudonym: str,
     resource_type: str,
-    service: MetadataService = Depends(container.get_metadata_service),
+    _count: int | None = Query(default=None, ge=1, description="Maximum number of entries per page"),
+    _cursor: str | None = Query(default=None, description="Page cursor, taken from a next or previous link"),
+    service: MetadataService = Depends(container.get_request_metadata_service),
     pseudonym_service: PseudonymService = Depends(container.get_pseudonym_service),
 ) -> Any:
     span = trace.get_current_span()
@@ -40,18 +50,20 @@ def search_resource(
 
     get_stats().inc("http.get.resource.search")
 
-    p = pseudonym_service.exchange(Pseudonym(pseudonym), get_config().app.provider_id)
-    entry = service.search_by_pseudonym(p, resource_type)
+    config = get_config()
+    cursor = decode_page_cursor(_cursor)
+    p = pseudonym_service.exchange(Pseudonym(pseudonym), config.app.provider_id)
+    if _count is not None:
+        page = service.page_by_pseudonym(p, resource_type, min(_count, config.app.search_max_count), cursor)
+        return create_search_bundle(page.entries, create_page_links(request, page))
 
-    bundle = Bundle(
-        resource_type="Bundle",
-        id=str(uuid.uuid4()),
-        type="searchset",
-        total=len(entry),
-        entry=[BundleEntry(resource=res.resource) for res in entry],
-    )
+    if config.app.search_streaming:
+        entries = service.stream_by_pseudonym(p, resource_type, config.app.search_stream_batch_size)
+        return StreamingResponse(stream_search_bundle(entries), media_type="application/json")
 
-    return bundle.dict()
+    entry = service.search_by_pseudonym(p, resource_type)
+
+    return create_search_bundle(entry)
 
 
 @router.get(
@@ -64,9 +76,11 @@ def get_resource_history(
     resource_id: str,
     vid: int,
     _pretty: bool = False,
-    service: MetadataService = Depends(container.get_metadata_service),
+    service: MetadataService = Depends(container.get_request_metadata_service),
+    if_none_match: Annotated[str | None, Header()] = None,
+    if_modified_since: Annotated[str | None, Header()] = None,
 ) -> Any:
-    return get_resource_by_version(resource_type, resource_id, vid, service, _pretty)
+    return get_resource_by_version(resource_type, resource_id, vid, service, _pretty, if_none_match, if_modified_since)
 
 
 @router.get(
@@ -78,14 +92,16 @@ def get_resource(
     resource_type: str,
     resource_id: str,
     _pretty: bool = False,
-    service: MetadataService = Depends(container.get_metadata_service),
+    service: MetadataService = Depends(container.get_request_metadata_service),
+    if_none_match: Annotated[str | None, Header()] = None,
+    if_modified_since: Annotated[str | None, Header()] = None,
 ) -> Any:
     span = trace.get_current_span()
     span.update_name(f"GET /resource/{resource_type}/{resource_id}")
     span.set_attribute("data.resource_type", resource_type)
     span.set_attribute("data.resource_id", resource_id)
 
-    return get_resource_by_version(resource_type, resource_id, 0, service, _pretty)
+    return get_resource_by_version(resource_type, resource_id, 0, service, _pretty, if_none_match, if_modified_since)
 
 
 @router.put(
@@ -98,7 +114,8 @@ def put_resource(
     resource_id: str,
     pseudonym: str = Query(required=False, default=None, description="Pseudonym to use for the resource"),
     data: Dict[str, Any] = Body(...),
-    service: MetadataService = Depends(container.get_metadata_service),
+    service: MetadataService = Depends(container.get_request_metadata_service),
+    db_session: DbSession = Depends(container.get_unit_of_work),
     pseudonym_service: PseudonymService = Depends(container.get_pseudonym_service),
     nvi_api_service: NVIAPIServiceInterface = Depends(container.get_nvi_service),
     if_match: Annotated[str | None, Header()] = None,
@@ -121,30 +138,27 @@ def put_resource(
         except ValueError:
             raise HTTPException(status_code=400, detail="Badly formed pseudonym")
 
-    try:
-        resource = service.search(resource_type, resource_id, 0)
-        if resource is not None and if_match is not None and resource.version != int(if_match):
-            logger.error("If-match header mismatch with resource version")
-            raise HTTPException(status_code=412, detail="Precondition Failed: Version mismatch")
-    except InvalidResourceError as e:
-        logger.error(f"Invalid resource: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
-    except ValidationError as e:
-        logger.error(f"Validation error: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
+    expected_version = parse_if_match(if_match)
 
     try:
-        entry = service.update(resource_type, resource_id, data, application_pseudonym)
-
-        if application_pseudonym is not None:
-            referral = CreateReferralRequestBody(
-                pseudonym=typed_pseudonym,
-                data_domain=DataDomain.BeeldBank,
-                ura_number=UraNumber(ura_number),
-                # If defined how authentication should work, define the uzi number here
-                requesting_uzi_number="00000000",
+        referral = create_referral_request(typed_pseudonym, ura_number) if application_pseudonym is not None else None
+        if referral is not None and get_config().nvi_api.outbox_enabled:
+            # The referral is queued in the same transaction and sent by the referral-outbox cron command
+            entry, fhir_resource = service.update(
+                resource_type, resource_id, data, application_pseudonym, referral, expected_version
+            )
+        else:
+            entry, fhir_resource = service.update(
+                resource_type, resource_id, data, application_pseudonym, None, expected_version
             )
-            nvi_api_service.create_referral(referral)
+            if referral is not None:
+                # The resource is committed before calling the NVI, so no locks or connections are held during
+                # the call, and no referral is sent for a write that is not stored
+                db_session.commit()
+                nvi_api_service.create_referral(referral)
+    except VersionConflictError:
+        logger.error("If-match header mismatch with resource version")
+        raise HTTPException(status_code=412, detail="Precondition Failed: Version mismatch")
     except InvalidResourceError as e:
         logger.error(f"Invalid resource: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -152,23 +166,7 @@ def put_resource(
         logger.error(f"Validation error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
-    if entry is None:
-        raise HTTPException(status_code=404, detail="Metadata not found")
-
-    fhir_resource = convert_resource_to_fhir(entry.resource)
-    if fhir_resource is None:
-        raise HTTPException(status_code=404, detail="Metadata not found")
-
-    return Response(
-        content=fhir_resource.model_dump_json(),
-        media_type="application/fhir+json",
-        status_code=201 if entry.version == 1 else 200,
-        headers={
-            "ETag": str(entry.version),
-            "Last-Modified": entry.created_dt.isoformat(),
-            "Location": f"/resource/{resource_type}/{resource_id}/_history/{entry.version}",
-        },
-    )
+    return put_response(resource_type, resource_id, entry, fhir_resource)
 
 
 @router.delete(
@@ -179,7 +177,7 @@ def put_resource(
 def delete_resource(
     resource_type: str,
     resource_id: str,
-    service: MetadataService = Depends(container.get_metadata_service),
+    service: MetadataService = Depends(container.get_request_metadata_service),
 ) -> Any:
     span = trace.get_current_span()
     span.set_attribute("data.resource_type", resource_type)
@@ -217,32 +215,233 @@ def get_resource_by_version(
     vid: int,
     service: MetadataService,
     pretty: bool = False,
+    if_none_match: str | None = None,
+    if_modified_since: str | None = None,
 ) -> Response:
     """
     Get a resource from the metadata service based on the id and version. If vid == 0, it will fetch the
-    latest version
+    latest version. Conditional reads are answered with 304 Not Modified after checking only the version, so the
+    resource itself is not loaded.
     """
     span = trace.get_current_span()
     span.set_attribute("data.resource_type", resource_type)
     span.set_attribute("data.resource_id", resource_id)
 
+    if if_none_match is not None or if_modified_since is not None:
+        version = service.search_version(resource_type, resource_id, vid)
+        if version is not None and is_not_modified(version, if_none_match, if_modified_since):
+            return not_modified_response(version)
+
     resource = service.search(resource_type, resource_id, vid)
+
+    return resource_response(resource, pretty)
+
+
+def parse_if_match(if_match: str | None) -> int | None:
+    """
+    Returns the version from an If-Match header, which can be given as a plain or (weak) quoted ETag
+    """
+    if if_match is None:
+        return None
+
+    value = if_match.strip().removeprefix("W/").strip('"')
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Badly formed If-Match header")
+
+
+def is_not_modified(version: ResourceVersion, if_none_match: str | None, if_modified_since: str | None) -> bool:
+    """
+    Check the If-None-Match and If-Modified-Since headers of a conditional read against the version of a resource.
+    If-Modified-Since is only used without If-None-Match, and ignored when it is not a valid date.
+    """
+    if version.deleted:
+        return False
+
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]
+        return "*" in tags or str(version.version) in tags
+
+    if if_modified_since is not None:
+        since = parse_http_date(if_modified_since)
+        return since is not None and version.created_dt.replace(microsecond=0) <= since.replace(microsecond=0)
+
+    return False
+
+
+def parse_http_date(value: str) -> datetime | None:
+    """
+    Parse an HTTP date, or an ISO 8601 date like the Last-Modified header of this service, into a naive local time
+    like the creation times of entries
+    """
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo is not None else parsed
+
+
+def not_modified_response(version: ResourceVersion) -> Response:
+    get_stats().inc("http.get.resource.not_modified")
+    return Response(
+        status_code=304,
+        headers={
+            "ETag": str(version.version),
+            "Last-Modified": version.created_dt.isoformat(),
+        },
+    )
+
+
+def resource_response(resource: ResourceEntry | None, pretty: bool = False) -> Response:
+    """
+    Create the response for a single (versioned) resource
+    """
     if resource is None:
         raise HTTPException(status_code=404, detail="Metadata not found")
 
     if resource.deleted:
         raise HTTPException(status_code=410, detail="Resource deleted")
 
+    return Response(
+        content=resource_content(resource, pretty),
+        media_type="application/fhir+json",
+        status_code=200,
+        headers={
+            "ETag": str(resource.version),
+            "Last-Modified": resource.created_dt.isoformat(),
+        },
+    )
+
+
+def resource_content(resource: ResourceEntry, pretty: bool = False) -> str:
+    """
+    Returns the serialized resource. Resources stored with their canonical serialization are returned as-is,
+    older entries are converted through the FHIR model.
+    """
+    if resource.resource_json is not None:
+        return json.dumps(json.loads(resource.resource_json), indent=2) if pretty else resource.resource_json
+
     fhir_resource = convert_resource_to_fhir(resource.resource)
     if fhir_resource is None:
         raise HTTPException(status_code=404, detail="Metadata not found")
 
+    return fhir_resource.json(indent=2) if pretty else fhir_resource.model_dump_json()
+
+
+def put_response(
+    resource_type: str,
+    resource_id: str,
+    entry: ResourceEntry | None,
+    fhir_resource: Resource,
+) -> Response:
+    """
+    Create the response for a created or updated resource, based on the FHIR resource that was validated on write
+    """
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Metadata not found")
+
     return Response(
-        content=fhir_resource.json(indent=2) if pretty else fhir_resource.model_dump_json(),
+        content=entry.resource_json if entry.resource_json is not None else fhir_resource.model_dump_json(),
         media_type="application/fhir+json",
-        status_code=200,
+        status_code=201 if entry.version == 1 else 200,
         headers={
-            "ETag": str(resource.version),
-            "Last-Modified": resource.created_dt.isoformat(),
+            "ETag": str(entry.version),
+            "Last-Modified": entry.created_dt.isoformat(),
+            "Location": f"/resource/{resource_type}/{resource_id}/_history/{entry.version}",
         },
     )
+
+
+def create_search_bundle(entries: Sequence[ResourceEntry], links: list[BundleLink] | None = None) -> Any:
+    """
+    Create a searchset bundle for the given entries. A paged bundle (with links) has no total, as counting all
+    matches would cost as much as returning them.
+    """
+    bundle = Bundle(
+        resource_type="Bundle",
+        id=str(uuid.uuid4()),
+        type="searchset",
+        total=len(entries) if links is None else None,
+        link=links,
+        entry=[BundleEntry(resource=res.resource) for res in entries],
+    )
+
+    return bundle.dict()
+
+
+def decode_page_cursor(cursor: str | None) -> PageCursor | None:
+    if cursor is None:
+        return None
+
+    try:
+        return PageCursor.decode(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid page cursor")
+
+
+def create_page_links(request: Request, page: ResourceEntryPage) -> list[BundleLink]:
+    """
+    Create the self, next and previous links of a page, pointing at the same search with another cursor
+    """
+    links = [BundleLink(relation="self", url=str(request.url))]
+    if page.next_cursor is not None:
+        url = request.url.include_query_params(_cursor=page.next_cursor.encode())
+        links.append(BundleLink(relation="next", url=str(url)))
+    if page.previous_cursor is not None:
+        url = request.url.include_query_params(_cursor=page.previous_cursor.encode())
+        links.append(BundleLink(relation="previous", url=str(url)))
+
+    return links
+
+
+def search_bundle_header() -> str:
+    return f'{{"resourceType":"Bundle","id":"{uuid.uuid4()}","type":"searchset","entry":['
+
+
+def search_bundle_entry(entry: ResourceEntry, first: bool) -> str:
+    resource = entry.resource_json if entry.resource_json is not None else json.dumps(entry.resource)
+    return ("" if first else ",") + '{"resource":' + resource + "}"
+
+
+def search_bundle_footer(total: int) -> str:
+    return '],"total":' + str(total) + "}"
+
+
+def stream_search_bundle(entries: Iterator[ResourceEntry]) -> Iterator[str]:
+    """
+    Writes a searchset bundle entry by entry, so only the current entry is kept in memory. The total is only
+    known at the end, so it is written after the entries.
+    """
+    yield search_bundle_header()
+    total = 0
+    for entry in entries:
+        yield search_bundle_entry(entry, total == 0)
+        total += 1
+    yield search_bundle_footer(total)
+
+
+async def async_stream_search_bundle(entries: AsyncIterator[ResourceEntry]) -> AsyncIterator[str]:
+    """
+    Asynchronous variant of stream_search_bundle
+    """
+    yield search_bundle_header()
+    total = 0
+    async for entry in entries:
+        yield search_bundle_entry(entry, total == 0)
+        total += 1
+    yield search_bundle_footer(total)
+
+
+def create_referral_request(pseudonym: Pseudonym, ura_number: str) -> CreateReferralRequestBody:
+    return CreateReferralRequestBody(
+        pseudonym=pseudonym,
+        data_domain=DataDomain.BeeldBank,
+        ura_number=UraNumber(ura_number),
+        # If defined how authentication should work, define the uzi number here
+        requesting_uzi_number="00000000",
+    )
@@ -0,0 +1,236 @@
+import logging
+from typing import Annotated, Any, Dict
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request
+from opentelemetry import trace
+from starlette.responses import Response, StreamingResponse
+
+from app import container
+from app.config import get_config
+from app.data import Pseudonym
+from app.db.repository.resource_entry import VersionConflictError
+from app.metadata.metadata_service import AsyncMetadataService
+from app.metadata.validators.Validator import InvalidResourceError, ValidationError
+from app.routers.resource import (
+    async_stream_search_bundle,
+    create_page_links,
+    create_referral_request,
+    create_search_bundle,
+    decode_page_cursor,
+    is_not_modified,
+    not_modified_response,
+    parse_if_match,
+    put_response,
+    resource_response,
+)
+from app.services.nvi_api_service import AsyncNVIAPIServiceInterface
+from app.services.pseudonym_service import AsyncPseudonymServiceInterface
+from app.stats import get_stats
+
+"""
+Asynchronous variant of the resource router, used when async_mode is enabled. The routes are equal to the ones in
+app.routers.resource, but they do not occupy a threadpool worker while waiting on the database or outbound services.
+"""
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get(
+    "/resource/{resource_type}/_search",
+    summary="Find all resources for given type for the pseudonym",
+    tags=["metadata"],
+)
+async def search_resource(
+    request: Request,
+    pseudonym: str,
+    resource_type: str,
+    _count: int | None = Query(default=None, ge=1, description="Maximum number of entries per page"),
+    _cursor: str | None = Query(default=None, description="Page cursor, taken from a next or previous link"),
+    service: AsyncMetadataService = Depends(container.get_async_metadata_service),
+    pseudonym_service: AsyncPseudonymServiceInterface = Depends(container.get_async_pseudonym_service),
+) -> Any:
+    span = trace.get_current_span()
+    span.update_name(f"GET /resource/{resource_type}/_search?pseudonym={pseudonym}")
+    span.set_attribute("data.pseudonym", pseudonym)
+    span.set_attribute("data.resource_type", resource_type)
+
+    get_stats().inc("http.get.resource.search")
+
+    config = get_config()
+    cursor = decode_page_cursor(_cursor)
+    p = await pseudonym_service.exchange(Pseudonym(pseudonym), config.app.provider_id)
+    if _count is not None:
+        page = await service.page_by_pseudonym(p, resource_type, min(_count, config.app.search_max_count), cursor)
+        return create_search_bundle(page.entries, create_page_links(request, page))
+
+    if config.app.search_streaming:
+        entries = service.stream_by_pseudonym(p, resource_type, config.app.search_stream_batch_size)
+        return StreamingResponse(async_stream_search_bundle(entries), media_type="application/json")
+
+    entry = await service.search_by_pseudonym(p, resource_type)
+
+    return create_search_bundle(entry)
+
+
+@router.get(
+    "/resource/{resource_type}/{resource_id}/_history/{vid}",
+    summary="Find a specific version of the resource in the metadata",
+    tags=["metadata"],
+)
+async def get_resource_history(
+    resource_type: str,
+    resource_id: str,
+    vid: int,
+    _pretty: bool = False,
+    service: AsyncMetadataService = Depends(container.get_async_metadata_service),
+    if_none_match: Annotated[str | None, Header()] = None,
+    if_modified_since: Annotated[str | None, Header()] = None,
+) -> Any:
+    return await get_resource_by_version(
+        resource_type, resource_id, vid, service, _pretty, if_none_match, if_modified_since
+    )
+
+
+@router.get(
+    "/resource/{resource_type}/{resource_id}",
+    summary="Find a specific type/id combination in the metadata",
+    tags=["metadata"],
+)
+async def get_resource(
+    resource_type: str,
+    resource_id: str,
+    _pretty: bool = False,
+    service: AsyncMetadataService = Depends(container.get_async_metadata_service),
+    if_none_match: Annotated[str | None, Header()] = None,
+    if_modified_since: Annotated[str | None, Header()] = None,
+) -> Any:
+    span = trace.get_current_span()
+    span.update_name(f"GET /resource/{resource_type}/{resource_id}")
+    span.set_attribute("data.resource_type", resource_type)
+    span.set_attribute("data.resource_id", resource_id)
+
+    return await get_resource_by_version(
+        resource_type, resource_id, 0, service, _pretty, if_none_match, if_modified_since
+    )
+
+
+@router.put(
+    "/resource/{resource_type}/{resource_id}",
+    summary="Creates or updates a specific type/id combination in the metadata",
+    tags=["metadata"],
+)
+async def put_resource(
+    resource_type: str,
+    resource_id: str,
+    pseudonym: str = Query(required=False, default=None, description="Pseudonym to use for the resource"),
+    data: Dict[str, Any] = Body(...),
+    service: AsyncMetadataService = Depends(container.get_async_metadata_service),
+    pseudonym_service: AsyncPseudonymServiceInterface = Depends(container.get_async_pseudonym_service),
+    nvi_api_service: AsyncNVIAPIServiceInterface = Depends(container.get_async_nvi_service),
+    if_match: Annotated[str | None, Header()] = None,
+) -> Any:
+    span = trace.get_current_span()
+    span.set_attribute("data.resource_type", resource_type)
+    span.set_attribute("data.resource_id", resource_id)
+    span.set_attribute("data.pseudonym", pseudonym)
+
+    application_pseudonym = None
+    ura_number = get_config().app.provider_id
+
+    if pseudonym is not None:
+        try:
+            typed_pseudonym = Pseudonym(pseudonym)
+            application_pseudonym = await pseudonym_service.exchange(typed_pseudonym, ura_number)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Badly formed pseudonym")
+
+    expected_version = parse_if_match(if_match)
+
+    try:
+        referral = create_referral_request(typed_pseudonym, ura_number) if application_pseudonym is not None else None
+        if referral is not None and get_config().nvi_api.outbox_enabled:
+            # The referral is queued in the same transaction and sent by the referral-outbox cron command
+            entry, fhir_resource = await service.update(
+                resource_type, resource_id, data, application_pseudonym, referral, expected_version
+            )
+        else:
+            entry, fhir_resource = await service.update(
+                resource_type, resource_id, data, application_pseudonym, None, expected_version
+            )
+            if referral is not None:
+                await nvi_api_service.create_referral(referral)
+    except VersionConflictError:
+        logger.error("If-match header mismatch with resource version")
+        raise HTTPException(status_code=412, detail="Precondition Failed: Version mismatch")
+    except InvalidResourceError as e:
+        logger.error(f"Invalid resource: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValidationError as e:
+        logger.error(f"Validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return put_response(resource_type, resource_id, entry, fhir_resource)
+
+
+@router.delete(
+    "/resource/{resource_type}/{resource_id}",
+    summary="Removes a given type/id combination from the metadata",
+    tags=["metadata"],
+)
+async def delete_resource(
+    resource_type: str,
+    resource_id: str,
+    service: AsyncMetadataService = Depends(container.get_async_metadata_service),
+) -> Any:
+    span = trace.get_current_span()
+    span.set_attribute("data.resource_type", resource_type)
+    span.set_attribute("data.resource_id", resource_id)
+
+    entry = await service.search(resource_type, resource_id, 0)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Metadata not found")
+
+    await service.delete(resource_type, resource_id)
+
+    return Response(status_code=204)
+
+
+@router.patch(
+    "/resource/{resource_type}/{resource_id}",
+    summary="Patches a specific type/id combination in the metadata",
+    tags=["metadata"],
+)
+async def patch_resource(
+    resource_type: str,
+    resource_id: str,
+) -> Response:
+    # We do not support PATCH
+    return Response(status_code=405)
+
+
+async def get_resource_by_version(
+    resource_type: str,
+    resource_id: str,
+    vid: int,
+    service: AsyncMetadataService,
+    pretty: bool = False,
+    if_none_match: str | None = None,
+    if_modified_since: str | None = None,
+) -> Response:
+    """
+    Get a resource from the metadata service based on the id and version. If vid == 0, it will fetch the
+    latest version. Conditional reads are answered with 304 Not Modified after checking only the version.
+    """
+    span = trace.get_current_span()
+    span.set_attribute("data.resource_type", resource_type)
+    span.set_attribute("data.resource_id", resource_id)
+
+    if if_none_match is not None or if_modified_since is not None:
+        version = await service.search_version(resource_type, resource_id, vid)
+        if version is not None and is_not_modified(version, if_none_match, if_modified_since):
+            return not_modified_response(version)
+
+    resource = await service.search(resource_type, resource_id, vid)
+
+    return resource_response(resource, pretty)
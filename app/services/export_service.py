@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import re
+import shutil
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import IO, Any, Sequence
+
+from app.db.db import Database
+from app.db.repository.resource_entry import ResourceEntryRepository
+from app.stats import get_stats
+
+"""
+Bulk export of the current resources to NDJSON files, with one file per resource type. Exports can be written
+directly to a directory, or run as an asynchronous job. The state of a job is kept in its own directory in the
+export directory, so every worker process can report on jobs started by the others.
+"""
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+ERROR_FILE = "error.txt"
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ExportStatus(str, Enum):
+    IN_PROGRESS = "in-progress"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class ExportFile:
+    type: str
+    filename: str
+    count: int
+
+
+@dataclass
+class ExportJob:
+    id: str
+    status: ExportStatus
+    manifest: dict[str, Any] | None = None
+    error: str | None = None
+
+
+class ExportService:
+    def __init__(self, db: Database, export_dir: str, batch_size: int = 1000):
+        self.db = db
+        self.export_dir = export_dir
+        self.batch_size = batch_size
+
+    def export(
+        self,
+        output_dir: str,
+        resource_types: Sequence[str] | None = None,
+        since: datetime | None = None,
+    ) -> list[ExportFile]:
+        """
+        Write the current resources to {type}.ndjson files in the output directory. Resources are streamed from the
+        database and written as stored, so memory use does not depend on the size of the register.
+        """
+        if since is not None and since.tzinfo is not None:
+            # Creation times are stored as naive local times
+            since = since.astimezone().replace(tzinfo=None)
+
+        os.makedirs(output_dir, exist_ok=True)
+        files: list[ExportFile] = []
+        current_key = None
+        file: IO[str] | None = None
+
+        try:
+            with self.db.get_db_session() as session:
+                repository = session.get_repository(ResourceEntryRepository)
+                for type_key, resource_type, resource_json in repository.stream_current(
+                    resource_types, since, self.batch_size
+                ):
+                    if type_key != current_key:
+                        if file is not None:
+                            file.close()
+                        current_key = type_key
+                        filename = f"{re.sub(r'[^A-Za-z0-9]', '_', resource_type)}.ndjson"
+                        files.append(ExportFile(type=resource_type, filename=filename, count=0))
+                        file = open(os.path.join(output_dir, files[-1].filename), "w")
+
+                    assert file is not None
+                    file.write(resource_json)
+                    file.write("\n")
+                    files[-1].count += 1
+        finally:
+            if file is not None:
+                file.close()
+
+        get_stats().inc("export.resources", sum(f.count for f in files))
+        return files
+
+    def create_job(self) -> str:
+        """
+        Create a new export job, which is in progress until run_job() has finished
+        """
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_dir(job_id))
+        return job_id
+
+    def run_job(
+        self,
+        job_id: str,
+        request_url: str,
+        file_url: str,
+        resource_types: Sequence[str] | None = None,
+        since: datetime | None = None,
+    ) -> None:
+        """
+        Run the export of a job, and write its manifest when done. The file_url is the base url from which the
+        exported files are served.
+        """
+        job_dir = self._job_dir(job_id)
+        transaction_time = datetime.now().astimezone()
+        try:
+            files = self.export(job_dir, resource_types, since)
+        except Exception as e:
+            logger.exception("Export job %s failed", job_id)
+            self._write_atomic(job_dir, ERROR_FILE, str(e))
+            return
+
+        manifest = {
+            "transactionTime": transaction_time.isoformat(),
+            "request": request_url,
+            "requiresAccessToken": False,
+            "output": [
+                {"type": f.type, "url": f"{file_url.rstrip('/')}/{f.filename}", "count": f.count} for f in files
+            ],
+            "error": [],
+        }
+        self._write_atomic(job_dir, MANIFEST_FILE, json.dumps(manifest))
+
+    def get_job(self, job_id: str) -> ExportJob | None:
+        if not self._job_exists(job_id):
+            return None
+
+        job_dir = self._job_dir(job_id)
+        manifest_path = os.path.join(job_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                return ExportJob(id=job_id, status=ExportStatus.COMPLETED, manifest=json.load(f))
+
+        error_path = os.path.join(job_dir, ERROR_FILE)
+        if os.path.exists(error_path):
+            with open(error_path, "r") as f:
+                return ExportJob(id=job_id, status=ExportStatus.FAILED, error=f.read())
+
+        return ExportJob(id=job_id, status=ExportStatus.IN_PROGRESS)
+
+    def get_job_file(self, job_id: str, filename: str) -> str | None:
+        """
+        Returns the path of an exported file of a completed job, when the file is listed in its manifest
+        """
+        job = self.get_job(job_id)
+        if job is None or job.manifest is None:
+            return None
+        if not any(output["url"].endswith(f"/{filename}") for output in job.manifest["output"]):
+            return None
+
+        return os.path.join(self._job_dir(job_id), filename)
+
+    def delete_job(self, job_id: str) -> bool:
+        if not self._job_exists(job_id):
+            return False
+
+        shutil.rmtree(self._job_dir(job_id))
+        return True
+
+    def _job_exists(self, job_id: str) -> bool:
+        return JOB_ID_PATTERN.match(job_id) is not None and os.path.isdir(self._job_dir(job_id))
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.export_dir, job_id)
+
+    @staticmethod
+    def _write_atomic(directory: str, filename: str, content: str) -> None:
+        path = os.path.join(directory, filename)
+        with open(f"{path}.tmp", "w") as f:
+            f.write(content)
+        os.replace(f"{path}.tmp", path)
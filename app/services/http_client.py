@@ -0,0 +1,118 @@
+import ssl
+from typing import Any
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_CA_BUNDLE_PATH
+
+"""
+This module creates long-lived HTTP sessions (and async clients) for the outbound services. A session keeps a pool
+of connections per host alive between requests, and all connections share a single SSL context in which the mTLS
+certificate, key and CA bundle are loaded only once.
+"""
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter that hands a prebuilt SSL context to every connection pool it creates
+    """
+
+    def __init__(self, ssl_context: ssl.SSLContext | None = None, **kwargs: Any) -> None:
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        if self.ssl_context is not None:
+            kwargs["ssl_context"] = self.ssl_context
+        super().init_poolmanager(*args, **kwargs)
+
+    def cert_verify(self, conn: Any, url: str, verify: Any, cert: Any) -> None:
+        if self.ssl_context is None:
+            super().cert_verify(conn, url, verify, cert)
+            return
+
+        # CA bundle and client certificate are already loaded in the shared SSL context. Letting requests set them
+        # on the connection would load them again (and add the default CA bundle) for every new connection.
+        conn.cert_reqs = "CERT_REQUIRED" if verify else "CERT_NONE"
+
+
+def create_ssl_context(
+    mtls_cert: str | None,
+    mtls_key: str | None,
+    mtls_ca: str | None,
+) -> ssl.SSLContext | None:
+    """
+    Create the SSL context for the given mTLS configuration, or None when the defaults can be used
+    """
+    if not mtls_ca and not (mtls_cert and mtls_key):
+        return None
+
+    context = ssl.create_default_context(cafile=mtls_ca if mtls_ca else DEFAULT_CA_BUNDLE_PATH)
+    if mtls_cert and mtls_key:
+        context.load_cert_chain(certfile=mtls_cert, keyfile=mtls_key)
+
+    return context
+
+
+def create_http_session(
+    mtls_cert: str | None = None,
+    mtls_key: str | None = None,
+    mtls_ca: str | None = None,
+    pool_connections: int = 10,
+    pool_maxsize: int = 10,
+    pool_block: bool = False,
+    keep_alive: bool = True,
+) -> requests.Session:
+    """
+    Create a pooled HTTP session
+
+    :param pool_connections: number of hosts to keep a connection pool for
+    :param pool_maxsize: maximum number of connections kept per host
+    :param pool_block: block when all connections for a host are in use instead of opening an extra connection
+    :param keep_alive: keep connections open between requests
+    """
+    adapter = PooledHTTPAdapter(
+        ssl_context=create_ssl_context(mtls_cert, mtls_key, mtls_ca),
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+
+    return session
+
+
+def create_async_http_client(
+    mtls_cert: str | None = None,
+    mtls_key: str | None = None,
+    mtls_ca: str | None = None,
+    pool_maxsize: int = 10,
+    pool_block: bool = False,
+    keep_alive: bool = True,
+    timeout: float | None = None,
+) -> httpx.AsyncClient:
+    """
+    Create a pooled asynchronous HTTP client, configured like the sessions from create_http_session
+
+    :param pool_maxsize: maximum number of connections kept alive
+    :param pool_block: wait for a free connection when pool_maxsize connections are in use
+    :param keep_alive: keep connections open between requests
+    :param timeout: timeout in seconds for requests, or None for no timeout
+    """
+    ssl_context = create_ssl_context(mtls_cert, mtls_key, mtls_ca)
+    limits = httpx.Limits(
+        max_connections=pool_maxsize if pool_block else None,
+        max_keepalive_connections=pool_maxsize if keep_alive else 0,
+    )
+
+    return httpx.AsyncClient(
+        verify=ssl_context if ssl_context is not None else True,
+        limits=limits,
+        timeout=timeout,
+    )
@@ -1,6 +1,6 @@
 from app.services.models.create_referral_request_body import CreateReferralRequestBody
 from app.services.models.referral import ReferralEntry
-from app.services.nvi_api_service import NVIAPIServiceInterface
+from app.services.nvi_api_service import AsyncNVIAPIServiceInterface, NVIAPIServiceInterface
 
 
 class MockNVIAPIService(NVIAPIServiceInterface):
@@ -10,3 +10,8 @@ class MockNVIAPIService(NVIAPIServiceInterface):
             data_domain=body.data_domain,
             ura_number=body.ura_number,
         )
+
+
+class AsyncMockNVIAPIService(AsyncNVIAPIServiceInterface):
+    async def create_referral(self, body: CreateReferralRequestBody) -> ReferralEntry:
+        return MockNVIAPIService().create_referral(body)
@@ -1,11 +1,13 @@
 import logging
 from abc import ABC, abstractmethod
 from dataclasses import asdict
+from typing import Any
 
 import requests
 
 from app.config import ConfigNVIAPI
 from app.data import DataDomain
+from app.services.http_client import create_async_http_client, create_http_session
 from app.services.models.create_referral_request_body import CreateReferralRequestBody
 from app.services.models.referral import ReferralEntry
 
@@ -18,37 +20,83 @@ class NVIAPIServiceInterface(ABC):
         raise NotImplementedError
 
 
+class AsyncNVIAPIServiceInterface(ABC):
+    @abstractmethod
+    async def create_referral(self, body: CreateReferralRequestBody) -> ReferralEntry:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        """
+        Close the connections of the service, on application shutdown
+        """
+
+
+def parse_referral_response(data: dict[str, Any]) -> ReferralEntry:
+    attrs = data | {
+        "data_domain": DataDomain(data["data_domain"]),
+    }
+    return ReferralEntry(**attrs)
+
+
 class NVIAPIService(NVIAPIServiceInterface):
     _config: ConfigNVIAPI
 
     def __init__(self, config: ConfigNVIAPI) -> None:
         self._config = config
+        self._session = create_http_session(
+            mtls_cert=config.mtls_cert,
+            mtls_key=config.mtls_key,
+            mtls_ca=config.mtls_ca,
+            pool_connections=config.pool_connections,
+            pool_maxsize=config.pool_maxsize,
+            pool_block=config.pool_block,
+            keep_alive=config.keep_alive,
+        )
 
     def create_referral(self, body: CreateReferralRequestBody) -> ReferralEntry:
         logger.info(f"Creating new referral based on pseudonym {body.pseudonym}")
         response = self._send_post_request(body)
 
-        data = response.json()
-        attrs = data | {
-            "data_domain": DataDomain(data["data_domain"]),
-        }
-        return ReferralEntry(**attrs)
+        return parse_referral_response(response.json())
 
     def _send_post_request(self, body: CreateReferralRequestBody) -> requests.Response:
-        cert = (
-            (self._config.mtls_cert, self._config.mtls_key)
-            if self._config.mtls_cert and self._config.mtls_key
-            else None
-        )
-
         request_json = asdict(body)
-        response = requests.post(
+        response = self._session.post(
             f"{self._config.endpoint}/registrations/",
             json=request_json,
-            cert=cert,
-            verify=self._config.mtls_ca if self._config.mtls_ca else True,
+            timeout=self._config.timeout,
         )
         if response.status_code != 200:
             raise ValueError(f"Failed to create referral: {response.status_code}")
 
         return response
+
+
+class AsyncNVIAPIService(AsyncNVIAPIServiceInterface):
+    _config: ConfigNVIAPI
+
+    def __init__(self, config: ConfigNVIAPI) -> None:
+        self._config = config
+        self._client = create_async_http_client(
+            mtls_cert=config.mtls_cert,
+            mtls_key=config.mtls_key,
+            mtls_ca=config.mtls_ca,
+            pool_maxsize=config.pool_maxsize,
+            pool_block=config.pool_block,
+            keep_alive=config.keep_alive,
+            timeout=config.timeout,
+        )
+
+    async def create_referral(self, body: CreateReferralRequestBody) -> ReferralEntry:
+        logger.info(f"Creating new referral based on pseudonym {body.pseudonym}")
+        response = await self._client.post(
+            f"{self._config.endpoint}/registrations/",
+            json=asdict(body),
+        )
+        if response.status_code != 200:
+            raise ValueError(f"Failed to create referral: {response.status_code}")
+
+        return parse_referral_response(response.json())
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
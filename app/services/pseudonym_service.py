@@ -1,11 +1,14 @@
 import logging
 import uuid
 from abc import ABC, abstractmethod
+from typing import Any, Callable
 
-import requests
 from requests import HTTPError
 
+from app.cache import TtlLruCache
 from app.data import Pseudonym
+from app.services.http_client import create_async_http_client, create_http_session
+from app.stats import get_stats
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +23,28 @@ class PseudonymServiceInterface(ABC):
         raise NotImplementedError
 
 
+class AsyncPseudonymServiceInterface(ABC):
+    @abstractmethod
+    async def exchange(self, pseudonym: Pseudonym, provider_id: str) -> Pseudonym:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        """
+        Close the connections of the service, on application shutdown
+        """
+
+
+def parse_exchange_response(status_code: int, json: Callable[[], Any]) -> Pseudonym:
+    if status_code != 200:
+        raise PseudonymError(f"Failed to exchange pseudonym: {status_code}")
+
+    data = json()
+    try:
+        return Pseudonym(data.get("pseudonym", ""))
+    except ValueError:
+        raise PseudonymError("Failed to exchange pseudonym: invalid pseudonym")
+
+
 class PseudonymService(PseudonymServiceInterface):
     def __init__(
         self,
@@ -28,40 +53,42 @@ class PseudonymService(PseudonymServiceInterface):
         mtls_cert: str | None,
         mtls_key: str | None,
         mtls_ca: str | None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        keep_alive: bool = True,
     ):
         self.endpoint = endpoint
         self.timeout = timeout
         self.mtls_cert = mtls_cert
         self.mtls_key = mtls_key
         self.mtls_ca = mtls_ca
+        self.session = create_http_session(
+            mtls_cert=mtls_cert,
+            mtls_key=mtls_key,
+            mtls_ca=mtls_ca,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            keep_alive=keep_alive,
+        )
 
     def exchange(self, pseudonym: Pseudonym, provider_id: str) -> Pseudonym:
         logger.info(f"Exchanging pseudonym {str(pseudonym)} for provider {provider_id}")
 
         try:
-            req = requests.post(
+            req = self.session.post(
                 f"{self.endpoint}/exchange",
                 json={
                     "source_pseudonym": str(pseudonym),
                     "target_provider_id": str(provider_id),
                 },
                 timeout=self.timeout,
-                cert=(self.mtls_cert, self.mtls_key) if self.mtls_cert and self.mtls_key else None,
-                verify=self.mtls_ca if self.mtls_ca else True,
             )
         except (Exception, HTTPError) as e:
             raise PseudonymError(f"Failed to exchange pseudonym: {e}")
 
-        if req.status_code != 200:
-            raise PseudonymError(f"Failed to exchange pseudonym: {req.status_code}")
-
-        data = req.json()
-        try:
-            new_pseudonym = Pseudonym(data.get("pseudonym", ""))
-        except ValueError:
-            raise PseudonymError("Failed to exchange pseudonym: invalid pseudonym")
-
-        return new_pseudonym
+        return parse_exchange_response(req.status_code, req.json)
 
 
 class MockPseudonymService(PseudonymServiceInterface):
@@ -70,3 +97,103 @@ class MockPseudonymService(PseudonymServiceInterface):
 
     def exchange(self, _pseudonym: Pseudonym, _provider_id: str) -> Pseudonym:
         return Pseudonym(str(uuid.uuid4()))
+
+
+class CachedPseudonymService(PseudonymServiceInterface):
+    """
+    Pseudonym service that caches the exchanged pseudonyms of an underlying pseudonym service, so repeated
+    exchanges of the same pseudonym for the same provider do not hit the pseudonym API
+    """
+
+    def __init__(self, inner: PseudonymServiceInterface, ttl: int, max_size: int):
+        self.inner = inner
+        self.cache: TtlLruCache[tuple[str, str], Pseudonym] = TtlLruCache(max_size=max_size, ttl=ttl)
+
+    def exchange(self, pseudonym: Pseudonym, provider_id: str) -> Pseudonym:
+        key = (str(pseudonym), str(provider_id))
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            get_stats().inc("pseudonym.exchange.cache.hit")
+            return cached
+
+        get_stats().inc("pseudonym.exchange.cache.miss")
+        new_pseudonym = self.inner.exchange(pseudonym, provider_id)
+        self.cache.set(key, new_pseudonym)
+
+        return new_pseudonym
+
+
+class AsyncPseudonymService(AsyncPseudonymServiceInterface):
+    def __init__(
+        self,
+        endpoint: str,
+        timeout: int,
+        mtls_cert: str | None,
+        mtls_key: str | None,
+        mtls_ca: str | None,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        keep_alive: bool = True,
+    ):
+        self.endpoint = endpoint
+        self.client = create_async_http_client(
+            mtls_cert=mtls_cert,
+            mtls_key=mtls_key,
+            mtls_ca=mtls_ca,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            keep_alive=keep_alive,
+            timeout=timeout,
+        )
+
+    async def exchange(self, pseudonym: Pseudonym, provider_id: str) -> Pseudonym:
+        logger.info(f"Exchanging pseudonym {str(pseudonym)} for provider {provider_id}")
+
+        try:
+            req = await self.client.post(
+                f"{self.endpoint}/exchange",
+                json={
+                    "source_pseudonym": str(pseudonym),
+                    "target_provider_id": str(provider_id),
+                },
+            )
+        except Exception as e:
+            raise PseudonymError(f"Failed to exchange pseudonym: {e}")
+
+        return parse_exchange_response(req.status_code, req.json)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class AsyncMockPseudonymService(AsyncPseudonymServiceInterface):
+    async def exchange(self, _pseudonym: Pseudonym, _provider_id: str) -> Pseudonym:
+        return Pseudonym(str(uuid.uuid4()))
+
+
+class AsyncCachedPseudonymService(AsyncPseudonymServiceInterface):
+    """
+    Asynchronous counterpart of CachedPseudonymService
+    """
+
+    def __init__(self, inner: AsyncPseudonymServiceInterface, ttl: int, max_size: int):
+        self.inner = inner
+        self.cache: TtlLruCache[tuple[str, str], Pseudonym] = TtlLruCache(max_size=max_size, ttl=ttl)
+
+    async def exchange(self, pseudonym: Pseudonym, provider_id: str) -> Pseudonym:
+        key = (str(pseudonym), str(provider_id))
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            get_stats().inc("pseudonym.exchange.cache.hit")
+            return cached
+
+        get_stats().inc("pseudonym.exchange.cache.miss")
+        new_pseudonym = await self.inner.exchange(pseudonym, provider_id)
+        self.cache.set(key, new_pseudonym)
+
+        return new_pseudonym
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
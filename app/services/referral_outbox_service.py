@@ -0,0 +1,106 @@
+import logging
+import random
+from datetime import datetime, timedelta
+
+from app.data import DataDomain, Pseudonym, UraNumber
+from app.db.db import Database
+from app.db.models import ReferralOutboxEntry
+from app.db.repository.referral_outbox import ReferralOutboxRepository
+from app.services.models.create_referral_request_body import CreateReferralRequestBody
+from app.services.nvi_api_service import NVIAPIServiceInterface
+from app.stats import get_stats
+
+logger = logging.getLogger(__name__)
+
+
+class ReferralOutboxService:
+    """
+    Sends the referrals queued in the referral outbox to the NVI. Failed deliveries are retried with an
+    exponential backoff, until the maximum number of attempts is reached.
+
+    A batch is claimed with a lease in a short transaction, and the outcomes are stored in a second one, so no
+    locks or connections are held while calling the NVI. Referrals of a worker that does not report back are sent
+    again once the lease has expired.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        nvi_api_service: NVIAPIServiceInterface,
+        batch_size: int = 100,
+        max_attempts: int = 10,
+        backoff: float = 5.0,
+        backoff_max: float = 3600.0,
+        lease: float = 300.0,
+    ):
+        self.db = db
+        self.nvi_api_service = nvi_api_service
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.lease = lease
+
+    def dispatch_batch(self) -> int:
+        """
+        Send a single batch of due referrals
+
+        :return: the number of referrals that were processed (delivered or not)
+        """
+        now = datetime.now()
+        with self.db.get_db_session() as session:
+            with session.begin():
+                repository = session.get_repository(ReferralOutboxRepository)
+                entries = repository.claim_batch(self.batch_size, now, now + timedelta(seconds=self.lease))
+
+        delivered = []
+        failed = []
+        for entry in entries:
+            if self._dispatch(entry):
+                delivered.append(entry)
+            else:
+                failed.append(entry)
+
+        with self.db.get_db_session() as session:
+            with session.begin():
+                repository = session.get_repository(ReferralOutboxRepository)
+                repository.delete_many([entry.id for entry in delivered])
+                for entry in failed:
+                    repository.save_attempt(entry)
+
+        return len(entries)
+
+    def _dispatch(self, entry: ReferralOutboxEntry) -> bool:
+        try:
+            self.nvi_api_service.create_referral(create_referral_request(entry))
+        except Exception as e:
+            self._reschedule(entry, e)
+            return False
+
+        get_stats().inc("nvi.outbox.delivered")
+        return True
+
+    def _reschedule(self, entry: ReferralOutboxEntry, error: Exception) -> None:
+        entry.attempts += 1
+        entry.last_error = str(error)
+
+        if entry.attempts >= self.max_attempts:
+            logger.error("Giving up on referral %s after %d attempts: %s", entry.id, entry.attempts, error)
+            get_stats().inc("nvi.outbox.failed")
+            entry.failed = True
+            return
+
+        delay = min(self.backoff * 2 ** (entry.attempts - 1), self.backoff_max)
+        entry.next_attempt_dt = datetime.now() + timedelta(seconds=delay + random.uniform(0, delay / 10))
+
+        logger.warning("Referral %s failed (attempt %d), retrying in %.1fs: %s", entry.id, entry.attempts, delay, error)
+        get_stats().inc("nvi.outbox.retry")
+
+
+def create_referral_request(entry: ReferralOutboxEntry) -> CreateReferralRequestBody:
+    return CreateReferralRequestBody(
+        pseudonym=Pseudonym(entry.pseudonym),
+        data_domain=DataDomain(entry.data_domain),
+        ura_number=UraNumber(entry.ura_number),
+        requesting_uzi_number=entry.requesting_uzi_number,
+    )
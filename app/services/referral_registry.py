@@ -0,0 +1,103 @@
+import logging
+
+from anyio import to_thread
+
+from app.cache import TtlLruCache
+from app.db.db import Database
+from app.db.repository.registered_referral import RegisteredReferralRepository
+from app.services.models.create_referral_request_body import CreateReferralRequestBody
+from app.services.models.referral import ReferralEntry
+from app.services.nvi_api_service import AsyncNVIAPIServiceInterface, NVIAPIServiceInterface
+from app.stats import get_stats
+
+logger = logging.getLogger(__name__)
+
+
+class ReferralRegistry:
+    """
+    Keeps track of the referrals that are successfully registered at the NVI. Lookups are served from an
+    in-memory cache first, and from the registered_referral table on a cache miss.
+    """
+
+    def __init__(self, db: Database, cache_size: int):
+        self.db = db
+        self.cache: TtlLruCache[tuple[str, str, str], bool] = TtlLruCache(max_size=cache_size)
+
+    def is_cached(self, body: CreateReferralRequestBody) -> bool:
+        return self.cache.get(self._key(body)) is not None
+
+    def is_registered(self, body: CreateReferralRequestBody) -> bool:
+        key = self._key(body)
+        if self.cache.get(key):
+            return True
+
+        with self.db.get_db_session() as session:
+            registered = session.get_repository(RegisteredReferralRepository).exists(
+                body.pseudonym.value, str(body.data_domain), str(body.ura_number)
+            )
+
+        if registered:
+            self.cache.set(key, True)
+        return registered
+
+    def register(self, body: CreateReferralRequestBody) -> None:
+        with self.db.get_db_session() as session:
+            session.get_repository(RegisteredReferralRepository).add(
+                body.pseudonym.value, str(body.data_domain), str(body.ura_number)
+            )
+
+        self.cache.set(self._key(body), True)
+
+    @staticmethod
+    def _key(body: CreateReferralRequestBody) -> tuple[str, str, str]:
+        return str(body.pseudonym), str(body.data_domain), str(body.ura_number)
+
+
+def registered_referral_entry(body: CreateReferralRequestBody) -> ReferralEntry:
+    return ReferralEntry(str(body.pseudonym), data_domain=body.data_domain, ura_number=body.ura_number)
+
+
+class RegistryNVIAPIService(NVIAPIServiceInterface):
+    """
+    NVI service that only sends referrals that are not registered yet
+    """
+
+    def __init__(self, inner: NVIAPIServiceInterface, registry: ReferralRegistry):
+        self.inner = inner
+        self.registry = registry
+
+    def create_referral(self, body: CreateReferralRequestBody) -> ReferralEntry:
+        if self.registry.is_registered(body):
+            get_stats().inc("nvi.referral.registry.hit")
+            return registered_referral_entry(body)
+
+        get_stats().inc("nvi.referral.registry.miss")
+        entry = self.inner.create_referral(body)
+        self.registry.register(body)
+
+        return entry
+
+
+class AsyncRegistryNVIAPIService(AsyncNVIAPIServiceInterface):
+    """
+    Asynchronous counterpart of RegistryNVIAPIService. The registry table is queried from a worker thread, which is
+    only needed on a cache miss.
+    """
+
+    def __init__(self, inner: AsyncNVIAPIServiceInterface, registry: ReferralRegistry):
+        self.inner = inner
+        self.registry = registry
+
+    async def create_referral(self, body: CreateReferralRequestBody) -> ReferralEntry:
+        if self.registry.is_cached(body) or await to_thread.run_sync(self.registry.is_registered, body):
+            get_stats().inc("nvi.referral.registry.hit")
+            return registered_referral_entry(body)
+
+        get_stats().inc("nvi.referral.registry.miss")
+        entry = await self.inner.create_referral(body)
+        await to_thread.run_sync(self.registry.register, body)
+
+        return entry
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
@@ -0,0 +1,87 @@
+import argparse
+import logging
+import os
+import sys
+
+from app.config import set_config
+from benchmarks.hot_paths import DEFAULT_SIZES, get_benchmarks
+from benchmarks.runner import BenchmarkResult, compare, read_results, result_key, run_benchmark, write_results
+from tests.test_config import get_test_config
+
+"""
+Runs the benchmarks, writes the results to a JSON file and compares them against a baseline:
+
+    python -m benchmarks --output benchmarks/results.json --baseline benchmarks/baseline.json
+
+Exits with 1 when a benchmark is slower than the baseline by more than its threshold.
+"""
+
+
+def parse_threshold(value: str) -> tuple[str, float]:
+    name, _, threshold = value.rpartition("=")
+    if not name:
+        raise argparse.ArgumentTypeError("Threshold must be given as name=fraction")
+    return name, float(threshold)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the benchmarks of the hot paths")
+    parser.add_argument("--output", default="benchmarks/results.json", help="file to write the results to")
+    parser.add_argument("--baseline", help="results file to compare with, skipped when the file does not exist")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown as fraction of the baseline")
+    parser.add_argument(
+        "--threshold-for",
+        type=parse_threshold,
+        action="append",
+        default=[],
+        metavar="NAME=FRACTION",
+        help="allowed slowdown of a single benchmark (name or name[params])",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: tuple(int(size) for size in value.split(",")),
+        default=DEFAULT_SIZES,
+        help="comma separated payload sizes",
+    )
+    parser.add_argument("--rounds", type=int, default=5, help="number of timed rounds per benchmark")
+    parser.add_argument("--filter", help="only run benchmarks with this text in their name")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # Same configuration as the tests, with an in-memory SQLite database and mocked services
+    set_config(get_test_config())
+
+    results: list[BenchmarkResult] = []
+    for benchmark in get_benchmarks(args.sizes):
+        if args.filter and args.filter not in benchmark.name:
+            continue
+        for params in benchmark.params:
+            print(f"{result_key(benchmark.name, params):<70}", end="", flush=True)
+            result = run_benchmark(benchmark, params, args.rounds)
+            print(f"{result.min * 1e6:>12.1f} us")
+            results.append(result)
+
+    write_results(args.output, results)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline is None:
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Baseline {args.baseline} does not exist, skipping comparison")
+        return 0
+
+    comparisons = compare(results, read_results(args.baseline), args.threshold, dict(args.threshold_for))
+    regressions = [c for c in comparisons if c.regressed]
+    print(f"\nCompared {len(comparisons)} benchmarks with {args.baseline}")
+    for comparison in comparisons:
+        marker = "REGRESSION" if comparison.regressed else ""
+        print(f"{comparison.key:<70}{comparison.ratio:>8.2f}x {marker}")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmarks regressed beyond their threshold")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
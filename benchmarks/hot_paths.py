@@ -0,0 +1,135 @@
+import uuid
+from typing import Any, Callable
+
+from starlette.requests import Request
+
+from app.data import Pseudonym
+from app.db.db import Database
+from app.db.models import ResourceEntry
+from app.db.repository.resource_entry import ResourceEntryRepository, ResourceWrite
+from app.metadata.fhir import convert_resource_to_fhir
+from app.metadata.validation import validate_resource
+from app.routers.resource import create_search_bundle, stream_search_bundle
+from app.stats import StatsdMiddleware
+from benchmarks.payloads import PAYLOADS
+from benchmarks.runner import Benchmark
+
+"""
+Benchmarks of the hot paths of reading and writing resources. Payload sizes and the number of stored resources
+are parameterized by size.
+"""
+
+DEFAULT_SIZES = (1, 10, 100)
+REPOSITORY_PAYLOAD_SIZE = 10
+
+
+def bench_convert(resource_type: str, size: int) -> Callable[[], Any]:
+    data = PAYLOADS[resource_type]("1", size)
+    return lambda: convert_resource_to_fhir(data)
+
+
+def bench_validate(resource_type: str, size: int) -> Callable[[], Any]:
+    data = PAYLOADS[resource_type]("1", size)
+    return lambda: validate_resource(resource_type, "1", data)
+
+
+def create_database(size: int) -> tuple[Database, Pseudonym]:
+    """
+    Create a SQLite database with size ImagingStudy resources for a pseudonym, and as many for another pseudonym
+    """
+    db = Database("sqlite:///:memory:", create_tables=True)
+    pseudonym = Pseudonym(uuid.uuid4())
+    writes = [
+        ResourceWrite("ImagingStudy", f"{p}-{i}", PAYLOADS["ImagingStudy"](f"{p}-{i}", REPOSITORY_PAYLOAD_SIZE), p)
+        for p in (pseudonym, Pseudonym(uuid.uuid4()))
+        for i in range(size)
+    ]
+    with db.get_db_session() as session:
+        session.get_repository(ResourceEntryRepository).upsert_many(writes)
+
+    return db, pseudonym
+
+
+def bench_find_by_resource(size: int) -> Callable[[], Any]:
+    db, pseudonym = create_database(size)
+
+    def run() -> Any:
+        with db.get_db_session() as session:
+            return session.get_repository(ResourceEntryRepository).find_by_resource("ImagingStudy", f"{pseudonym}-0", 0)
+
+    return run
+
+
+def bench_find_by_pseudonym(size: int) -> Callable[[], Any]:
+    db, pseudonym = create_database(size)
+
+    def run() -> Any:
+        with db.get_db_session() as session:
+            return session.get_repository(ResourceEntryRepository).find_by_pseudonym(pseudonym, "ImagingStudy")
+
+    return run
+
+
+def bench_upsert(size: int) -> Callable[[], Any]:
+    db, pseudonym = create_database(1)
+    data = PAYLOADS["ImagingStudy"]("1", size)
+
+    def run() -> Any:
+        with db.get_db_session() as session:
+            return session.get_repository(ResourceEntryRepository).upsert("ImagingStudy", "1", data, pseudonym)
+
+    return run
+
+
+def search_entries(size: int) -> list[ResourceEntry]:
+    entries = []
+    for i in range(size):
+        data = PAYLOADS["ImagingStudy"](str(i), REPOSITORY_PAYLOAD_SIZE)
+        resource = convert_resource_to_fhir(data)
+        assert resource is not None
+        entries.append(ResourceEntry(resource=data, resource_json=resource.model_dump_json()))
+    return entries
+
+
+def bench_search_bundle(size: int) -> Callable[[], Any]:
+    entries = search_entries(size)
+    return lambda: create_search_bundle(entries)
+
+
+def bench_stream_search_bundle(size: int) -> Callable[[], Any]:
+    entries = search_entries(size)
+    return lambda: "".join(stream_search_bundle(iter(entries)))
+
+
+def bench_normalize_path() -> Callable[[], Any]:
+    requests = [
+        Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+        for path in (
+            "/health",
+            "/resource/ImagingStudy/_search",
+            "/resource/ImagingStudy/1",
+            "/resource/ImagingStudy/1/_history/2",
+        )
+    ]
+
+    def run() -> None:
+        for request in requests:
+            StatsdMiddleware.normalize_path(request)
+
+    return run
+
+
+def get_benchmarks(sizes: tuple[int, ...] = DEFAULT_SIZES) -> list[Benchmark]:
+    typed = [{"resource_type": resource_type, "size": size} for resource_type in PAYLOADS for size in sizes]
+    sized = [{"size": size} for size in sizes]
+
+    return [
+        Benchmark("convert_resource_to_fhir", bench_convert, typed),
+        Benchmark("validate_resource", bench_validate, typed),
+        Benchmark("repository.find_by_resource", bench_find_by_resource, sized),
+        Benchmark("repository.find_by_pseudonym", bench_find_by_pseudonym, sized),
+        Benchmark("repository.upsert", bench_upsert, sized),
+        Benchmark("search.create_search_bundle", bench_search_bundle, sized),
+        Benchmark("search.stream_search_bundle", bench_stream_search_bundle, sized),
+        Benchmark("stats.normalize_path", bench_normalize_path),
+    ]
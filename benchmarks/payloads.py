@@ -0,0 +1,87 @@
+from typing import Any, Callable
+
+"""
+Deterministic FHIR payloads of a configurable size. The size scales the repeated part of a resource: the names and
+addresses of a Patient, the series of an ImagingStudy and the dosages of a MedicationStatement.
+"""
+
+INSTANCES_PER_SERIES = 5
+
+
+def patient(resource_id: str, size: int) -> dict[str, Any]:
+    return {
+        "resourceType": "Patient",
+        "id": resource_id,
+        "active": True,
+        "gender": "female",
+        "birthDate": "1980-04-01",
+        "identifier": [{"system": "https://example.org/patient", "value": f"{resource_id}-{i}"} for i in range(size)],
+        "name": [{"family": f"Family{i}", "given": ["Given", f"Name{i}"]} for i in range(size)],
+        "address": [
+            {"use": "home", "line": [f"Street {i}"], "city": "Den Haag", "postalCode": "2500AA", "country": "NL"}
+            for i in range(size)
+        ],
+    }
+
+
+def imaging_study(resource_id: str, size: int) -> dict[str, Any]:
+    return {
+        "resourceType": "ImagingStudy",
+        "id": resource_id,
+        "status": "available",
+        "subject": {"reference": "Patient/1", "display": "Given Family"},
+        "started": "2024-01-01T10:00:00+00:00",
+        "numberOfSeries": size,
+        "numberOfInstances": size * INSTANCES_PER_SERIES,
+        "series": [
+            {
+                "uid": f"1.2.3.{series}",
+                "number": series,
+                "modality": {"system": "http://dicom.nema.org/resources/ontology/DCM", "code": "CT"},
+                "bodySite": {"system": "https://example.org/body-site", "code": "123", "display": "Borst"},
+                "started": "2024-01-01T10:00:00+00:00",
+                "performer": [
+                    {"actor": {"reference": "Practitioner/1", "type": "Practitioner", "display": "Dokter Bibber"}},
+                    {"actor": {"reference": "Organization/1", "type": "Organization", "display": "Ziekthuis"}},
+                ],
+                "instance": [
+                    {
+                        "uid": f"1.2.3.{series}.{instance}",
+                        "number": instance,
+                        "sopClass": {"system": "urn:ietf:rfc:3986", "code": "urn:oid:1.2.840.10008.5.1.4.1.1.2"},
+                        "title": f"Instance {instance} of series {series}",
+                    }
+                    for instance in range(INSTANCES_PER_SERIES)
+                ],
+            }
+            for series in range(size)
+        ],
+    }
+
+
+def medication_statement(resource_id: str, size: int) -> dict[str, Any]:
+    return {
+        "resourceType": "MedicationStatement",
+        "id": resource_id,
+        "status": "active",
+        "subject": {"reference": "Patient/1"},
+        "medicationCodeableConcept": {"coding": [{"system": "https://example.org/rxnorm", "code": "123456"}]},
+        "effectivePeriod": {"start": "2024-01-01T00:00:00+00:00", "end": "2024-02-01T00:00:00+00:00"},
+        "note": [{"text": f"Note {i}"} for i in range(size)],
+        "dosage": [
+            {
+                "sequence": i,
+                "text": "Take with food",
+                "route": {"coding": [{"system": "https://example.org/route", "code": "oral"}]},
+                "doseAndRate": [{"doseQuantity": {"value": 10, "unit": "mg", "system": "http://unitsofmeasure.org"}}],
+            }
+            for i in range(size)
+        ],
+    }
+
+
+PAYLOADS: dict[str, Callable[[str, int], dict[str, Any]]] = {
+    "Patient": patient,
+    "ImagingStudy": imaging_study,
+    "MedicationStatement": medication_statement,
+}
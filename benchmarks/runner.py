@@ -0,0 +1,119 @@
+import json
+import platform
+import statistics
+import timeit
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Sequence
+
+"""
+Runs benchmarks with timeit, and compares the results against a baseline. Every benchmark is timed in a number of
+rounds of enough iterations to take at least 0.2 seconds. The fastest round is compared to the baseline, as it is
+the least affected by other load on the machine.
+"""
+
+
+@dataclass
+class Benchmark:
+    name: str
+    # Returns the function to time for the given parameters, anything done in here is not measured
+    factory: Callable[..., Callable[[], Any]]
+    params: Sequence[dict[str, Any]] = field(default_factory=lambda: [{}])
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    params: dict[str, Any]
+    iterations: int
+    rounds: int
+    min: float
+    median: float
+    mean: float
+
+    @property
+    def key(self) -> str:
+        return result_key(self.name, self.params)
+
+
+@dataclass
+class Comparison:
+    key: str
+    baseline: float
+    current: float
+    threshold: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline
+
+    @property
+    def regressed(self) -> bool:
+        return self.ratio > 1 + self.threshold
+
+
+def result_key(name: str, params: dict[str, Any]) -> str:
+    if not params:
+        return name
+    return f"{name}[{','.join(f'{k}={v}' for k, v in params.items())}]"
+
+
+def run_benchmark(benchmark: Benchmark, params: dict[str, Any], rounds: int) -> BenchmarkResult:
+    timer = timeit.Timer(benchmark.factory(**params))
+    iterations, _ = timer.autorange()
+    times = [t / iterations for t in timer.repeat(repeat=rounds, number=iterations)]
+
+    return BenchmarkResult(
+        name=benchmark.name,
+        params=params,
+        iterations=iterations,
+        rounds=rounds,
+        min=min(times),
+        median=statistics.median(times),
+        mean=statistics.mean(times),
+    )
+
+
+def write_results(path: str, results: Sequence[BenchmarkResult]) -> None:
+    data = {
+        "created": datetime.now().astimezone().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {result.key: asdict(result) for result in results},
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def read_results(path: str) -> dict[str, dict[str, Any]]:
+    with open(path, "r") as f:
+        results: dict[str, dict[str, Any]] = json.load(f)["results"]
+        return results
+
+
+def compare(
+    results: Sequence[BenchmarkResult],
+    baseline: dict[str, dict[str, Any]],
+    threshold: float,
+    thresholds: dict[str, float],
+) -> list[Comparison]:
+    """
+    Compare the results with the baseline. A benchmark regressed when it is more than its threshold (a fraction)
+    slower than the baseline. Thresholds can be set per benchmark name, or per key of a single parameterization.
+    Results that are not in the baseline are skipped.
+    """
+    comparisons = []
+    for result in results:
+        if result.key not in baseline:
+            continue
+        comparisons.append(
+            Comparison(
+                key=result.key,
+                baseline=baseline[result.key]["min"],
+                current=result.min,
+                threshold=thresholds.get(result.key, thresholds.get(result.name, threshold)),
+            )
+        )
+
+    return comparisons
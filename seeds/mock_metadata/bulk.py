@@ -0,0 +1,160 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import time
+from typing import Final
+
+from fhir.resources.R4B.medication import Medication
+from fhir.resources.R4B.resource import Resource
+
+from app.config import get_config
+from app.data import Pseudonym
+from app.db.db import Database
+from app.db.repository.resource_entry import ResourceEntryRepository, ResourceWrite
+from app.metadata.validation import ValidationExecutor
+from seeds.mock_metadata.image_study import generate_imagestudy
+from seeds.mock_metadata.medication import generate_medication
+from seeds.mock_metadata.medication_statement import generate_medication_statement
+from seeds.mock_metadata.organization import ORGANIZATION_NAMES, generate_organization
+from seeds.mock_metadata.person import PRACTICIONS, generate_patient, generate_practitioner
+from seeds.mock_metadata.utils import fake, json_dumps
+
+"""
+Generates large synthetic datasets for load testing: N pseudonyms with M resources each. The data of every
+pseudonym is generated from its own seed (derived from --seed and the index of the pseudonym), so a dataset is
+the same for every number of workers. Only the dates that faker picks relative to the current time differ between
+runs. Resources are validated and stored through the bulk import path by a pool of worker processes.
+
+    python -m seeds.mock_metadata.bulk --pseudonyms 1000000 --resources 50 --workers 16
+"""
+
+logger = logging.getLogger(__name__)
+
+# Mix of the resources of a pseudonym, next to its single Patient resource
+RESOURCE_MIX: Final[dict[str, float]] = {
+    "ImagingStudy": 0.35,
+    "MedicationStatement": 0.35,
+    "Medication": 0.15,
+    "Practitioner": 0.10,
+    "Organization": 0.05,
+}
+# Most imaging studies are small, but a long tail (e.g. CT and MR) has many series with many instances
+MAX_SERIES: Final[int] = 50
+MAX_INSTANCES: Final[int] = 200
+
+_db: Database | None = None
+_validation_executor = ValidationExecutor()
+
+
+def generate_resources(seed: int, index: int, count: int) -> tuple[Pseudonym, list[Resource]]:
+    """
+    Generate the pseudonym with the given index and its count resources
+    """
+    fake.seed_instance(f"{seed}-{index}")
+    random.seed(f"{seed}-{index}")
+
+    pseudonym = Pseudonym(fake.uuid4())
+    patient = generate_patient()
+    organization = generate_organization(fake.random_element(elements=ORGANIZATION_NAMES))
+    practitioners = [generate_practitioner(*name) for name in PRACTICIONS]
+    medications: list[Medication] = []
+
+    resources: list[Resource] = [patient]
+    for resource_type in random.choices(list(RESOURCE_MIX), weights=list(RESOURCE_MIX.values()), k=count - 1):
+        if resource_type == "ImagingStudy":
+            resources.append(
+                generate_imagestudy(
+                    patient,
+                    organization,
+                    practitioners,
+                    series_count=min(1 + int(random.lognormvariate(1.0, 0.9)), MAX_SERIES),
+                    instance_count=min(1 + int(random.lognormvariate(1.5, 1.2)), MAX_INSTANCES),
+                )
+            )
+        elif resource_type == "MedicationStatement":
+            medication = random.choice(medications) if medications else generate_medication(organization)
+            resources.append(generate_medication_statement(medication, patient))
+        elif resource_type == "Medication":
+            medications.append(generate_medication(organization))
+            resources.append(medications[-1])
+        elif resource_type == "Practitioner":
+            resources.append(generate_practitioner(*random.choice(PRACTICIONS)))
+        else:
+            resources.append(generate_organization(fake.random_element(elements=ORGANIZATION_NAMES)))
+
+    return pseudonym, resources
+
+
+def seed_range(args: tuple[int, int, int, int, int]) -> tuple[int, int]:
+    """
+    Generate and store the pseudonyms in [start, stop), returns the number of stored and invalid resources
+    """
+    seed, start, stop, count, batch_size = args
+    assert _db is not None
+
+    stored = 0
+    invalid = 0
+    writes: list[ResourceWrite] = []
+    for index in range(start, stop):
+        pseudonym, resources = generate_resources(seed, index, count)
+        for resource in resources:
+            data = json.loads(json_dumps(resource.dict()))
+            writes.append(ResourceWrite(data["resourceType"], data["id"], data, pseudonym))
+
+        if len(writes) >= batch_size or index == stop - 1:
+            results = _validation_executor.validate_many([(w.resource_type, w.resource_id, w.data) for w in writes])
+            valid = []
+            for write, result in zip(writes, results):
+                if result.error is not None:
+                    invalid += 1
+                    continue
+                write.resource_json = result.resource_json
+                valid.append(write)
+
+            with _db.get_db_session() as session:
+                stored += session.get_repository(ResourceEntryRepository).import_many(valid)
+            writes = []
+
+    return stored, invalid
+
+
+def init_worker(dsn: str) -> None:
+    global _db
+    _db = Database(dsn=dsn)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset for load testing")
+    parser.add_argument("--pseudonyms", type=int, default=1000, help="number of pseudonyms")
+    parser.add_argument("--resources", type=int, default=50, help="number of resources per pseudonym")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the dataset")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--batch-size", type=int, default=1000, help="number of resources per transaction")
+    parser.add_argument("--chunk-size", type=int, default=100, help="number of pseudonyms per worker task")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    dsn = get_config().database.dsn
+    tasks = [
+        (args.seed, start, min(start + args.chunk_size, args.pseudonyms), args.resources, args.batch_size)
+        for start in range(0, args.pseudonyms, args.chunk_size)
+    ]
+
+    stored = 0
+    invalid = 0
+    started = time.monotonic()
+    with multiprocessing.get_context("spawn").Pool(args.workers, initializer=init_worker, initargs=(dsn,)) as pool:
+        for task_stored, task_invalid in pool.imap_unordered(seed_range, tasks):
+            stored += task_stored
+            invalid += task_invalid
+            elapsed = time.monotonic() - started
+            logger.info("Stored %d resources (%d invalid), %.0f resources/s", stored, invalid, stored / elapsed)
+
+    logger.info("Done: stored %d resources in %.1fs, %d were invalid", stored, time.monotonic() - started, invalid)
+
+
+if __name__ == "__main__":
+    main()
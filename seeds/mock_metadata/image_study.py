@@ -46,7 +46,12 @@ ORGANIZATION_NAMES: Final[tuple[str, ...]] = (
 )
 
 
-def _imaging_study_series(practitioner: Practitioner, organization: Organization, idx: int) -> ImagingStudySeries:
+def _imaging_study_series(
+    practitioner: Practitioner,
+    organization: Organization,
+    idx: int,
+    instance_count: int = 1,
+) -> ImagingStudySeries:
     return ImagingStudySeries.construct(
         uid=fake.uuid4(),
         number=idx,
@@ -66,6 +71,7 @@ def _imaging_study_series(practitioner: Practitioner, organization: Organization
                 sopClass=generate_coding("sop-class", IMAGING_CODES),
                 title=fake.sentence(),
             )
+            for _ in range(instance_count)
         ],
     )
 
@@ -74,8 +80,11 @@ def generate_imagestudy(
     patient: Patient,
     organization: Organization,
     practitioners: Sequence[Practitioner],
+    series_count: int | None = None,
+    instance_count: int = 1,
 ):
-    series_count = fake.random_number(digits=1) + 1
+    if series_count is None:
+        series_count = fake.random_number(digits=1) + 1
 
     return ImagingStudy.construct(
         **generate_identification("study"),
@@ -88,6 +97,7 @@ def generate_imagestudy(
                 fake.random_element(elements=practitioners),
                 organization,
                 idx,
+                instance_count,
             )
             for idx in range(series_count)
         ],
@@ -49,15 +49,13 @@ def json_dumps(data: dict[str, Any]) -> str:
 
 
 def store(resource: Resource, pseudonym: Pseudonym) -> None:
-    if (
-        METADATA_SERVICE.update(
-            resource.get_resource_type(),
-            resource.id,
-            data=json.loads(json_dumps(resource.dict())),
-            pseudonym=pseudonym,
-        )
-        is None
-    ):
+    entry, _ = METADATA_SERVICE.update(
+        resource.get_resource_type(),
+        resource.id,
+        data=json.loads(json_dumps(resource.dict())),
+        pseudonym=pseudonym,
+    )
+    if entry is None:
         raise Exception("Failed to store resource")
 
 
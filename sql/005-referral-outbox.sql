@@ -0,0 +1,19 @@
+-- Purpose: Queue of referrals that still need to be sent to the NVI. Entries are written in the same transaction
+-- as the resource they belong to, and are removed once the NVI has accepted them.
+create table referral_outbox
+(
+    id                    uuid        default gen_random_uuid() not null
+        constraint referral_outbox_pkey
+            primary key,
+    pseudonym             uuid                                  not null,
+    data_domain           varchar(32)                           not null,
+    ura_number            varchar(8)                            not null,
+    requesting_uzi_number varchar(32)                           not null,
+    attempts              integer     default 0                 not null,
+    next_attempt_dt       timestamp   default now()             not null,
+    last_error            text,
+    failed                boolean     default false             not null,
+    created_dt            timestamp   default now()             not null
+);
+
+create index ix_referral_outbox_next_attempt_dt on referral_outbox (next_attempt_dt) where not failed;
@@ -0,0 +1,9 @@
+-- Purpose: Referrals that are registered at the NVI, so the same referral is not sent again
+create table registered_referral
+(
+    pseudonym   uuid                    not null,
+    data_domain varchar(32)             not null,
+    ura_number  varchar(8)              not null,
+    created_dt  timestamp default now() not null,
+    constraint registered_referral_pkey primary key (pseudonym, data_domain, ura_number)
+);
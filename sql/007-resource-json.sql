@@ -0,0 +1,2 @@
+-- Purpose: Store the canonical serialization of the resource, so reads can return it without parsing the resource
+alter table resource_entry add column resource_json text;
@@ -0,0 +1,2 @@
+-- Purpose: Keyset paging of pseudonym searches, ordered by (created_dt, id)
+create index ix_resource_entry_pseudonym_page on resource_entry (pseudonym, resource_type, created_dt, id);
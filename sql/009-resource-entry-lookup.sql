@@ -0,0 +1,6 @@
+-- Purpose: Resource types and ids are matched case-insensitively on their lowercased values, index those so
+-- lookups are index seeks instead of sequential scans
+create index ix_resource_entry_resource_version on resource_entry (lower(resource_type), lower(resource_id), version desc);
+
+drop index ix_resource_entry_pseudonym_page;
+create index ix_resource_entry_pseudonym_page on resource_entry (pseudonym, lower(resource_type), created_dt, id);
@@ -0,0 +1,17 @@
+-- Purpose: Per-resource version counter, so a new version number is claimed atomically in a single statement
+-- instead of computing max(version) + 1 over all versions
+create table resource_version
+(
+    resource_type varchar(64)  not null,
+    resource_id   varchar(256) not null,
+    version       integer      not null,
+    constraint resource_version_pkey primary key (resource_type, resource_id)
+);
+
+insert into resource_version (resource_type, resource_id, version)
+select lower(resource_type), lower(resource_id), max(version)
+from resource_entry
+group by lower(resource_type), lower(resource_id);
+
+-- Every version is stored as a new row
+alter table resource_entry drop constraint resource_type_id;
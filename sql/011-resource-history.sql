@@ -0,0 +1,69 @@
+-- Purpose: Split the resources into a current state table, holding the latest version of every resource, and
+-- the append-only resource_entry history, which is partitioned by year on created_dt
+
+alter table resource_version rename to resource_current;
+alter table resource_current rename constraint resource_version_pkey to resource_current_pkey;
+alter table resource_current add column entry_id uuid;
+alter table resource_current add column created_dt timestamp;
+
+update resource_entry set created_dt = now() where created_dt is null;
+
+update resource_current c
+set entry_id   = e.id,
+    created_dt = e.created_dt
+from resource_entry e
+where lower(e.resource_type) = c.resource_type
+  and lower(e.resource_id) = c.resource_id
+  and e.version = c.version;
+
+alter table resource_current alter column entry_id set not null;
+alter table resource_current alter column created_dt set not null;
+
+-- Recreate resource_entry as a partitioned table. The partition key has to be part of the primary key.
+alter table resource_entry rename to resource_entry_old;
+drop index ix_resource_entry_resource_version;
+drop index ix_resource_entry_pseudonym_page;
+
+create table resource_entry
+(
+    id            uuid    default gen_random_uuid() not null,
+    pseudonym     uuid,
+    resource_type varchar(64)                       not null,
+    resource_id   varchar(256)                      not null,
+    resource      jsonb                             not null,
+    resource_json text,
+    version       integer default 1                 not null,
+    created_dt    timestamp                         not null,
+    deleted       boolean default false             not null,
+    constraint resource_entry_pkey primary key (id, created_dt)
+) partition by range (created_dt);
+
+create table resource_entry_default partition of resource_entry default;
+
+-- Creates the yearly partition of resource_entry holding the given year, when it does not exist yet
+create function resource_entry_create_partition(year integer) returns void as
+$$
+begin
+    execute format(
+        'create table if not exists resource_entry_%s partition of resource_entry for values from (%L) to (%L)',
+        year, make_date(year, 1, 1), make_date(year + 1, 1, 1)
+    );
+end;
+$$ language plpgsql;
+
+select resource_entry_create_partition(year::integer)
+from generate_series(
+             coalesce((select extract(year from min(created_dt)) from resource_entry_old), extract(year from now())),
+             extract(year from now()) + 5
+     ) as year;
+
+insert into resource_entry (id, pseudonym, resource_type, resource_id, resource, resource_json, version, created_dt,
+                            deleted)
+select id, pseudonym, resource_type, resource_id, resource, resource_json, version, created_dt, deleted
+from resource_entry_old;
+
+drop table resource_entry_old;
+
+create index ix_resource_entry_resource_version on resource_entry (lower(resource_type), lower(resource_id), version desc);
+create index ix_resource_entry_pseudonym_page on resource_entry (pseudonym, lower(resource_type), created_dt, id);
+create index ix_resource_entry_pseudonym on resource_entry (pseudonym);
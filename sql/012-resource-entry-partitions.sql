@@ -0,0 +1,31 @@
+-- Purpose: Let resource_entry_create_partition create the partition of a year that already has rows in the default
+-- partition. Postgres rejects a new partition while the default partition holds rows of its range, so those rows
+-- are moved into the new partition before it is attached. The partitions are created ahead of time by the
+-- resource-partitions cron command.
+
+create or replace function resource_entry_create_partition(year integer) returns void as
+$$
+declare
+    partition_name text := format('resource_entry_%s', year);
+    lower_bound    date := make_date(year, 1, 1);
+    upper_bound    date := make_date(year + 1, 1, 1);
+begin
+    if to_regclass(partition_name) is not null then
+        return;
+    end if;
+
+    -- Keep writers from adding rows of this year to the default partition while its rows are moved
+    lock table resource_entry_default in exclusive mode;
+
+    execute format('create table %I (like resource_entry including defaults)', partition_name);
+    execute format(
+        'with moved as (delete from resource_entry_default where created_dt >= %L and created_dt < %L returning *) '
+            'insert into %I select * from moved',
+        lower_bound, upper_bound, partition_name
+    );
+    execute format(
+        'alter table resource_entry attach partition %I for values from (%L) to (%L)',
+        partition_name, lower_bound, upper_bound
+    );
+end;
+$$ language plpgsql;
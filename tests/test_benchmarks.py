@@ -0,0 +1,34 @@
+from benchmarks.runner import BenchmarkResult, compare, result_key
+
+
+def result(name: str, params: dict[str, int], value: float) -> BenchmarkResult:
+    return BenchmarkResult(name=name, params=params, iterations=1, rounds=1, min=value, median=value, mean=value)
+
+
+def test_compare_with_thresholds() -> None:
+    baseline = {
+        "a[size=1]": {"min": 1.0},
+        "a[size=2]": {"min": 1.0},
+        "b": {"min": 1.0},
+    }
+    results = [
+        result("a", {"size": 1}, 1.1),
+        result("a", {"size": 2}, 1.3),
+        result("b", {}, 1.3),
+        result("c", {}, 5.0),
+    ]
+
+    comparisons = compare(results, baseline, 0.2, {"b": 0.5})
+    assert [(c.key, c.regressed) for c in comparisons] == [
+        ("a[size=1]", False),
+        ("a[size=2]", True),
+        ("b", False),
+    ]
+
+    comparisons = compare(results, baseline, 0.2, {"a[size=2]": 0.5})
+    assert [c.key for c in comparisons if c.regressed] == ["b"]
+
+
+def test_result_key() -> None:
+    assert result_key("a", {}) == "a"
+    assert result_key("a", {"resource_type": "Patient", "size": 10}) == "a[resource_type=Patient,size=10]"
@@ -0,0 +1,137 @@
+import uuid
+from typing import Any
+
+import inject
+from sqlalchemy import select
+
+from app.config import get_config
+from app.db.db import Database
+from app.db.models import ReferralOutboxEntry
+from tests import test_resources
+
+client = test_resources.client
+
+
+def put_entry(resource_id: str, if_match: str | None = None) -> dict[str, Any]:
+    request = {"method": "PUT", "url": f"Patient/{resource_id}?pseudonym={uuid.uuid4()}"}
+    if if_match is not None:
+        request["ifMatch"] = if_match
+
+    return {"resource": {"resourceType": "Patient", "id": resource_id}, "request": request}
+
+
+def post_bundle(bundle_type: str, entries: list[dict[str, Any]]) -> Any:
+    return client.post("/", json={"resourceType": "Bundle", "type": bundle_type, "entry": entries})
+
+
+def test_batch() -> None:
+    response = post_bundle(
+        "batch",
+        [
+            put_entry("bundle-1"),
+            put_entry("bundle-2"),
+            {"resource": {"resourceType": "Patient", "id": "other"}, "request": {"method": "PUT", "url": "Patient/x"}},
+            put_entry("bundle-3", if_match="5"),
+            put_entry("bundle-1"),
+            {"request": {"method": "DELETE", "url": "Patient/bundle-1"}, "resource": {}},
+        ],
+    )
+    assert response.status_code == 200
+    assert response.json()["type"] == "batch-response"
+
+    statuses = [entry["response"]["status"] for entry in response.json()["entry"]]
+    assert statuses == [
+        "201 Created",
+        "201 Created",
+        "400 Bad Request",
+        "201 Created",
+        "200 OK",
+        "405 Method Not Allowed",
+    ]
+    assert response.json()["entry"][4]["response"]["location"] == "Patient/bundle-1/_history/2"
+
+    response = post_bundle("batch", [put_entry("bundle-2", if_match="2")])
+    assert response.json()["entry"][0]["response"]["status"] == "412 Precondition Failed"
+
+    response = client.get("/resource/patient/bundle-1")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == "2"
+
+
+def test_transaction() -> None:
+    response = post_bundle("transaction", [put_entry("transaction-1"), put_entry("transaction-2", if_match="3")])
+    assert response.status_code == 200
+    assert response.json()["type"] == "transaction-response"
+
+    # Nothing is stored when one of the entries fails
+    response = post_bundle("transaction", [put_entry("transaction-1"), put_entry("transaction-2", if_match="3")])
+    assert response.status_code == 412
+    assert client.get("/resource/patient/transaction-1").headers["ETag"] == "1"
+
+    response = post_bundle(
+        "transaction", [put_entry("transaction-3"), {"request": {"method": "PUT", "url": "Patient"}, "resource": {}}]
+    )
+    assert response.status_code == 400
+    assert client.get("/resource/patient/transaction-3").status_code == 404
+
+
+def test_invalid_bundle() -> None:
+    assert post_bundle("searchset", []).status_code == 400
+    assert client.post("/", json={"resourceType": "Patient"}).status_code == 400
+
+
+def test_malformed_entry_does_not_fail_the_batch() -> None:
+    malformed = put_entry("malformed-2")
+    malformed["resource"]["id"] = 5
+    wrong_type = put_entry("malformed-3")
+    wrong_type["resource"]["resourceType"] = ["Patient"]
+
+    response = post_bundle("batch", [put_entry("malformed-1"), malformed, wrong_type, put_entry("malformed-4")])
+    assert response.status_code == 200
+
+    responses = [entry["response"] for entry in response.json()["entry"]]
+    assert [response["status"] for response in responses] == [
+        "201 Created",
+        "400 Bad Request",
+        "400 Bad Request",
+        "201 Created",
+    ]
+    assert responses[1]["outcome"]["issue"][0]["details"]["text"] == "id in the resource data must be a string"
+    assert responses[3]["location"] == "Patient/malformed-4/_history/1"
+
+    # In a transaction, the malformed entry fails the whole bundle
+    response = post_bundle("transaction", [put_entry("malformed-5"), malformed])
+    assert response.status_code == 400
+    assert client.get("/resource/patient/malformed-5").status_code == 404
+
+
+def test_batch_queues_referral_when_first_entry_fails() -> None:
+    pseudonym = str(uuid.uuid4())
+    entries = [
+        {
+            "resource": {"resourceType": "Patient", "id": "other"},
+            "request": {"method": "PUT", "url": f"Patient/outbox-1?pseudonym={pseudonym}"},
+        },
+        {
+            "resource": {"resourceType": "Patient", "id": "outbox-2"},
+            "request": {"method": "PUT", "url": f"Patient/outbox-2?pseudonym={pseudonym}"},
+        },
+        {
+            "resource": {"resourceType": "Patient", "id": "outbox-3"},
+            "request": {"method": "PUT", "url": f"Patient/outbox-3?pseudonym={pseudonym}"},
+        },
+    ]
+
+    config = get_config()
+    config.nvi_api.outbox_enabled = True
+    try:
+        response = post_bundle("batch", entries)
+    finally:
+        config.nvi_api.outbox_enabled = False
+
+    statuses = [entry["response"]["status"] for entry in response.json()["entry"]]
+    assert statuses == ["400 Bad Request", "201 Created", "201 Created"]
+
+    with inject.instance(Database).get_db_session() as session:
+        outbox = session.execute(select(ReferralOutboxEntry)).scalars().all()
+    assert [str(entry.pseudonym) for entry in outbox] == [pseudonym]
@@ -0,0 +1,130 @@
+import asyncio
+import tempfile
+import uuid
+from pathlib import Path
+
+from app.cache import TtlLruCache
+from app.config import set_config
+from app.data import Pseudonym
+from app.db.db import AsyncDatabase, Database
+from app.metadata.caching_adapter import ENTRY_OVERHEAD, AsyncCachingMetadataAdapter, CachingMetadataAdapter
+from app.metadata.db.async_db_adapter import AsyncDbMetadataAdapter
+from app.metadata.db.db_adapter import DbMetadataAdapter
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+
+def create_adapter(max_bytes: int = 1024 * 1024) -> CachingMetadataAdapter:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    return CachingMetadataAdapter(DbMetadataAdapter(db), max_size=100, max_bytes=max_bytes)
+
+
+def store(adapter: CachingMetadataAdapter, resource_id: str, gender: str) -> None:
+    data = {"resourceType": "Patient", "id": resource_id, "gender": gender}
+    resource_json = f'{{"resourceType":"Patient","id":"{resource_id}","gender":"{gender}"}}'
+    adapter.update("Patient", resource_id, data, Pseudonym(uuid.uuid4()), resource_json=resource_json)
+
+
+def test_reads_are_cached_until_updated() -> None:
+    adapter = create_adapter()
+    store(adapter, "1", "male")
+
+    entry = adapter.search("Patient", "1", 0)
+    assert entry is not None and entry.version == 1
+    entry = adapter.search("patient", "1", 0)
+    assert entry is not None and entry.version == 1
+    assert entry.resource_json is not None and '"male"' in entry.resource_json
+    assert (adapter.hits, adapter.misses) == (1, 1)
+    assert adapter.hit_ratio == 0.5
+
+    store(adapter, "1", "female")
+    entry = adapter.search("Patient", "1", 0)
+    assert entry is not None and entry.version == 2
+    assert adapter.misses == 2
+
+    # Older versions stay cached, they never change
+    entry = adapter.search("Patient", "1", 1)
+    assert entry is not None and entry.version == 1
+    store(adapter, "1", "other")
+    entry = adapter.search("Patient", "1", 1)
+    assert entry is not None and entry.version == 1
+    assert adapter.hits == 2
+
+
+def test_delete_invalidates_all_versions() -> None:
+    adapter = create_adapter()
+    store(adapter, "1", "male")
+    adapter.search("Patient", "1", 0)
+    adapter.search("Patient", "1", 1)
+
+    adapter.delete("Patient", "1")
+
+    entry = adapter.search("Patient", "1", 0)
+    assert entry is not None and entry.deleted
+    entry = adapter.search("Patient", "1", 1)
+    assert entry is not None and entry.deleted
+    assert adapter.hits == 0
+
+
+def test_memory_budget_evicts_least_recently_used() -> None:
+    adapter = create_adapter(max_bytes=2 * (ENTRY_OVERHEAD + 60))
+    for resource_id in ("1", "2", "3"):
+        store(adapter, resource_id, "male")
+        adapter.search("Patient", resource_id, 0)
+
+    assert len(adapter.cache) == 2
+    assert adapter.cache.bytes <= adapter.cache.max_bytes  # type: ignore[operator]
+    assert adapter.cache.get(("patient", "1", 0)) is None
+    assert adapter.cache.get(("patient", "3", 0)) is not None
+
+
+def test_cache_skips_values_over_budget() -> None:
+    cache: TtlLruCache[str, str] = TtlLruCache(max_size=10, max_bytes=5, sizeof=len)
+    cache.set("a", "abc")
+    cache.set("b", "abcdef")
+    cache.set("c", "ab")
+
+    assert cache.get("a") == "abc"
+    assert cache.get("b") is None
+    assert cache.get("c") == "ab"
+    assert cache.bytes == 5
+
+    cache.set("a", "a")
+    assert cache.bytes == 3
+    cache.invalidate_where(lambda key: key == "c")
+    assert cache.bytes == 1
+
+
+def test_async_adapter_shares_the_cache() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The async engine cannot share an in-memory database with the sync engine that creates the tables
+        dsn = f"sqlite:///{Path(tmp_dir) / 'metadata.db'}"
+        adapter = CachingMetadataAdapter(DbMetadataAdapter(Database(dsn, create_tables=True)), 100, 1024 * 1024)
+        async_db = AsyncDatabase(dsn)
+        async_adapter = AsyncCachingMetadataAdapter(AsyncDbMetadataAdapter(async_db), adapter.state)
+
+        async def run() -> None:
+            store(adapter, "1", "male")
+            entry = await async_adapter.search("Patient", "1", 0)
+            assert entry is not None and entry.version == 1
+            # Cached by the async adapter, served by the sync one
+            entry = adapter.search("Patient", "1", 0)
+            assert entry is not None and entry.version == 1
+            assert (adapter.hits, adapter.misses) == (1, 1)
+
+            # An async write invalidates the resource for both
+            data = {"resourceType": "Patient", "id": "1", "gender": "female"}
+            await async_adapter.update("Patient", "1", data, Pseudonym(uuid.uuid4()))
+            entry = adapter.search("Patient", "1", 0)
+            assert entry is not None and entry.version == 2
+            entry = await async_adapter.search("Patient", "1", 0)
+            assert entry is not None and entry.version == 2
+            assert (adapter.hits, adapter.misses) == (2, 2)
+
+            await async_adapter.delete("Patient", "1")
+            entry = adapter.search("Patient", "1", 1)
+            assert entry is not None and entry.deleted
+            await async_db.engine.dispose()
+
+        asyncio.run(run())
@@ -0,0 +1,75 @@
+import uuid
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+
+from app.db.repository.resource_entry import ResourceVersion
+from app.routers.resource import is_not_modified
+from tests import test_resources
+
+client = test_resources.client
+
+
+def put_patient(resource_id: str) -> None:
+    response = client.put(
+        f"/resource/Patient/{resource_id}?pseudonym={uuid.uuid4()}",
+        json={"resourceType": "Patient", "id": resource_id},
+    )
+    assert response.status_code in (200, 201)
+
+
+def test_if_none_match() -> None:
+    put_patient("conditional-1")
+    response = client.get("/resource/Patient/conditional-1")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get("/resource/Patient/conditional-1", headers={"If-None-Match": f'W/"{etag}"'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    put_patient("conditional-1")
+    response = client.get("/resource/Patient/conditional-1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = client.get(f"/resource/Patient/conditional-1/_history/{etag}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_if_modified_since() -> None:
+    put_patient("conditional-2")
+
+    future = format_datetime(datetime.now().astimezone() + timedelta(hours=1))
+    response = client.get("/resource/Patient/conditional-2", headers={"If-Modified-Since": future})
+    assert response.status_code == 304
+
+    past = format_datetime(datetime.now().astimezone() - timedelta(hours=1))
+    response = client.get("/resource/Patient/conditional-2", headers={"If-Modified-Since": past})
+    assert response.status_code == 200
+
+    response = client.get("/resource/Patient/conditional-2", headers={"If-Modified-Since": "not a date"})
+    assert response.status_code == 200
+
+
+def test_conditional_read_of_missing_or_deleted_resource() -> None:
+    response = client.get("/resource/Patient/conditional-missing", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+
+    put_patient("conditional-3")
+    assert client.delete("/resource/Patient/conditional-3").status_code == 204
+    response = client.get("/resource/Patient/conditional-3", headers={"If-None-Match": "*"})
+    assert response.status_code == 410
+
+
+def test_is_not_modified() -> None:
+    created_dt = datetime(2024, 1, 1, 12, 0, 0, 500000)
+    version = ResourceVersion(version=3, created_dt=created_dt, deleted=False)
+
+    assert is_not_modified(version, '"1", "3"', None)
+    assert not is_not_modified(version, '"1", "2"', None)
+    # If-None-Match takes precedence over If-Modified-Since
+    assert not is_not_modified(version, '"2"', created_dt.isoformat())
+    assert is_not_modified(version, None, "2024-01-01T12:00:00")
+    assert not is_not_modified(version, None, "2024-01-01T11:59:59")
+    assert not is_not_modified(version, None, None)
@@ -0,0 +1,68 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.config import set_config
+from app.data import Pseudonym
+from app.db.db import Database
+from app.db.repository.current_resource import CurrentResourceRepository
+from app.db.repository.resource_entry import ResourceEntryRepository, VersionConflictError
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+
+def test_claim_version() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    now = datetime.now()
+
+    with db.get_db_session() as session:
+        repository = session.get_repository(CurrentResourceRepository)
+        assert repository.claim_version("Patient", "1", uuid.uuid4(), now) == 1
+        assert repository.claim_version("Patient", "1", uuid.uuid4(), now) == 2
+        # Resources are matched case-insensitively
+        assert repository.claim_version("patient", "1", uuid.uuid4(), now) == 3
+        assert repository.claim_version("Patient", "2", uuid.uuid4(), now) == 1
+
+
+def test_upsert_appends_versions() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+
+    with db.get_db_session() as session:
+        repository = session.get_repository(ResourceEntryRepository)
+        pseudonym = Pseudonym(str(uuid.uuid4()))
+        for version in range(1, 4):
+            entry = repository.upsert("Patient", "1", {"resourceType": "Patient", "id": "1"}, pseudonym)
+            assert entry is not None
+            assert entry.version == version
+
+        first = repository.find_by_resource("Patient", "1", 1)
+        latest = repository.find_by_resource("PATIENT", "1", 0)
+        assert first is not None and first.version == 1
+        assert latest is not None and latest.version == 3
+
+        # Searches only return the current version
+        assert [entry.version for entry in repository.find_by_pseudonym(pseudonym, "Patient")] == [3]
+
+
+def test_conditional_upsert() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    pseudonym = Pseudonym(str(uuid.uuid4()))
+    data = {"resourceType": "Patient", "id": "1"}
+
+    with db.get_db_session() as session:
+        repository = session.get_repository(ResourceEntryRepository)
+        # A resource that does not exist yet is created regardless of the expected version
+        entry = repository.upsert("Patient", "1", data, pseudonym, expected_version=5)
+        assert entry is not None and entry.version == 1
+
+        entry = repository.upsert("Patient", "1", data, pseudonym, expected_version=1)
+        assert entry is not None and entry.version == 2
+
+        with pytest.raises(VersionConflictError):
+            repository.upsert("Patient", "1", data, pseudonym, expected_version=1)
+
+        latest = repository.find_by_resource("Patient", "1", 0)
+        assert latest is not None and latest.version == 2
+        assert repository.find_by_resource("Patient", "1", 3) is None
@@ -0,0 +1,82 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import inject
+
+from app import container
+from app.config import set_config
+from app.data import Pseudonym
+from app.db.db import Database
+from app.metadata.db.db_adapter import DbMetadataAdapter
+from app.services.export_service import ExportService
+from tests import test_resources
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+client = test_resources.client
+
+
+def test_export_writes_current_resources(tmp_path: Path) -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    adapter = DbMetadataAdapter(db)
+    pseudonym = Pseudonym(uuid.uuid4())
+    adapter.update("Patient", "1", {"resourceType": "Patient", "id": "1", "gender": "male"}, pseudonym)
+    adapter.update("Patient", "1", {"resourceType": "Patient", "id": "1", "gender": "female"}, pseudonym)
+    adapter.update("Patient", "2", {"resourceType": "Patient", "id": "2"}, pseudonym)
+    adapter.update("Practitioner", "3", {"resourceType": "Practitioner", "id": "3"}, pseudonym)
+    adapter.update("Patient", "4", {"resourceType": "Patient", "id": "4"}, pseudonym)
+    adapter.delete("Patient", "4")
+
+    files = ExportService(db, str(tmp_path), batch_size=1).export(str(tmp_path / "all"))
+    assert [(f.type, f.filename, f.count) for f in files] == [
+        ("Patient", "Patient.ndjson", 2),
+        ("Practitioner", "Practitioner.ndjson", 1),
+    ]
+
+    lines = (tmp_path / "all" / "Patient.ndjson").read_text().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"resourceType": "Patient", "id": "1", "gender": "female"},
+        {"resourceType": "Patient", "id": "2"},
+    ]
+
+    files = ExportService(db, str(tmp_path)).export(str(tmp_path / "typed"), ["practitioner"])
+    assert [f.type for f in files] == ["Practitioner"]
+
+    files = ExportService(db, str(tmp_path)).export(str(tmp_path / "since"), None, datetime.now() + timedelta(1))
+    assert files == []
+
+
+def test_export_operation(tmp_path: Path) -> None:
+    service = ExportService(inject.instance(Database), str(tmp_path))
+    test_resources.app.dependency_overrides[container.get_export_service] = lambda: service
+    try:
+        response = client.put(
+            f"/resource/Patient/export-1?pseudonym={uuid.uuid4()}",
+            json={"resourceType": "Patient", "id": "export-1"},
+        )
+        assert response.status_code == 201
+
+        response = client.get("/$export?_type=Patient")
+        assert response.status_code == 202
+        status_url = response.headers["Content-Location"]
+
+        response = client.get(status_url)
+        assert response.status_code == 200
+        manifest = response.json()
+        assert manifest["request"].endswith("/$export?_type=Patient")
+        assert [output["type"] for output in manifest["output"]] == ["Patient"]
+
+        response = client.get(manifest["output"][0]["url"])
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == "application/fhir+ndjson"
+        ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+        assert "export-1" in ids
+
+        assert client.get(f"{status_url}/manifest.json").status_code == 404
+        assert client.delete(status_url).status_code == 202
+        assert client.get(status_url).status_code == 404
+    finally:
+        test_resources.app.dependency_overrides.clear()
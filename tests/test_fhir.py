@@ -0,0 +1,35 @@
+from fhir.resources.R4B.imagingstudy import ImagingStudy
+from fhir.resources.R4B.patient import Patient
+
+from app.metadata.fhir import (
+    ALLOWED_RESOURCES,
+    convert_resource_to_fhir,
+    get_resource_class,
+    warm_up_resource_classes,
+)
+
+
+def test_get_resource_class() -> None:
+    assert get_resource_class("Patient") is Patient
+    assert get_resource_class("ImagingStudy") is ImagingStudy
+    assert get_resource_class("Bundle") is None
+    assert get_resource_class("patient") is None
+
+
+def test_warm_up_resolves_all_allowed_resources() -> None:
+    warm_up_resource_classes()
+
+    for resource_type in ALLOWED_RESOURCES:
+        resource_class = get_resource_class(resource_type)
+        assert resource_class is not None
+        assert resource_class.__name__ == resource_type
+
+
+def test_convert_resource_to_fhir() -> None:
+    resource = convert_resource_to_fhir({"resourceType": "Patient", "id": "123"})
+    assert isinstance(resource, Patient)
+    assert resource.id == "123"
+
+    assert convert_resource_to_fhir({"resourceType": "Bundle", "type": "searchset"}) is None
+    assert convert_resource_to_fhir({"resourceType": "Patient", "gender": 12}) is None
+    assert convert_resource_to_fhir({"id": "123"}) is None
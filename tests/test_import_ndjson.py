@@ -0,0 +1,66 @@
+import argparse
+import json
+import uuid
+from pathlib import Path
+
+from app.config import set_config
+from app.cron.import_ndjson import ImportNdjsonCommand
+from app.db.db import Database
+from app.db.repository.resource_entry import ResourceEntryRepository
+from app.metadata.validation import ValidationExecutor
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+
+def test_import_stores_valid_lines(tmp_path: Path) -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    pseudonym = uuid.uuid4()
+    lines = [
+        f"{pseudonym}\t" + json.dumps({"resourceType": "Patient", "id": "1", "gender": "male"}),
+        f"{pseudonym}\t" + json.dumps({"resourceType": "Patient", "id": "1", "gender": "female"}),
+        "",
+        f"{pseudonym}\t" + json.dumps({"resourceType": "Patient", "id": "2", "birthDate": "not-a-date"}),
+        f"{pseudonym}\tnot json",
+        f"{pseudonym}\t" + json.dumps({"resourceType": "Patient", "id": "3"}),
+    ]
+    path = tmp_path / "patients.ndjson"
+    path.write_text("\n".join(lines) + "\n")
+
+    command = ImportNdjsonCommand(db, ValidationExecutor())
+    code = command.run(argparse.Namespace(files=[str(path)], chunk_size=2))
+
+    assert code == 1
+    with db.get_db_session() as session:
+        repository = session.get_repository(ResourceEntryRepository)
+        first = repository.find_by_resource("Patient", "1", 0)
+        assert first is not None
+        assert first.version == 2
+        assert first.resource["gender"] == "female"
+        assert first.pseudonym == pseudonym
+        assert repository.find_by_resource("Patient", "2", 0) is None
+        assert repository.find_by_resource("Patient", "3", 0) is not None
+
+
+def test_import_skips_resources_without_string_keys(tmp_path: Path) -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    pseudonym = uuid.uuid4()
+    resources = [
+        json.dumps({"resourceType": "Patient", "id": "1"}),
+        json.dumps({"resourceType": "Patient", "id": 2}),
+        json.dumps({"resourceType": "Patient"}),
+        json.dumps({"resourceType": ["Patient"], "id": "4"}),
+        json.dumps({"resourceType": "Patient", "id": "5"}),
+    ]
+    lines = [f"{pseudonym}\t" + resource for resource in resources]
+    path = tmp_path / "patients.ndjson"
+    path.write_text("\n".join(lines) + "\n")
+
+    command = ImportNdjsonCommand(db, ValidationExecutor())
+    with open(path) as file:
+        assert command.import_file(str(path), file, chunk_size=2) == (2, 3)
+
+    with db.get_db_session() as session:
+        repository = session.get_repository(ResourceEntryRepository)
+        assert repository.find_by_resource("Patient", "1", 0) is not None
+        assert repository.find_by_resource("Patient", "5", 0) is not None
@@ -0,0 +1,97 @@
+import json
+import uuid
+from datetime import datetime
+
+from sqlalchemy import select, text
+
+from app.config import get_config, set_config
+from app.data import Pseudonym
+from app.db.db import Database
+from app.db.invalidation import INVALIDATION_CHANNEL, Invalidation
+from app.db.models import CurrentResource
+from app.db.repository.resource_entry import ResourceEntryRepository, ResourceWrite
+from tests.test_config import get_test_config
+
+"""
+Tests of the Postgres import path (COPY into the staging table and IMPORT_MOVE), which only run when
+METADATA_TEST_POSTGRES_DSN is set (see tests/conftest.py)
+"""
+
+set_config(get_test_config())
+
+
+def patient(resource_id: str, gender: str, pseudonym: uuid.UUID) -> ResourceWrite:
+    data = {"resourceType": "Patient", "id": resource_id, "gender": gender}
+    return ResourceWrite("Patient", resource_id, data, Pseudonym(pseudonym), resource_json=json.dumps(data))
+
+
+def test_import_appends_consecutive_versions(postgres_db: Database) -> None:
+    pseudonym = uuid.uuid4()
+    with postgres_db.get_db_session() as session:
+        repository = session.get_repository(ResourceEntryRepository)
+        repository.upsert_many([patient("existing", "male", pseudonym)])
+        repository.upsert_many([patient("existing", "female", pseudonym)])
+
+        imported = repository.import_many(
+            [
+                patient("staged", "male", pseudonym),
+                patient("existing", "other", pseudonym),
+                patient("STAGED", "female", pseudonym),
+                patient("staged", "unknown", pseudonym),
+                patient("existing", "male", pseudonym),
+            ]
+        )
+        assert imported == 5
+
+        # A resource staged several times gets consecutive versions, in the order in which it was staged
+        genders = {}
+        for version in (1, 2, 3):
+            entry = repository.find_by_resource("Patient", "staged", version)
+            assert entry is not None and entry.version == version
+            genders[version] = entry.resource["gender"]
+        assert genders == {1: "male", 2: "female", 3: "unknown"}
+
+        # A resource with versions continues from its current version
+        entry = repository.find_by_resource("Patient", "existing", 2)
+        assert entry is not None and entry.resource["gender"] == "female"
+        entry = repository.find_by_resource("Patient", "existing", 3)
+        assert entry is not None and entry.resource["gender"] == "other"
+
+        # The current state points to the last staged version
+        for resource_id, version, gender in (("staged", 3, "unknown"), ("existing", 4, "male")):
+            entry = repository.find_by_resource("Patient", resource_id, 0)
+            assert entry is not None
+            assert (entry.version, entry.resource["gender"]) == (version, gender)
+            assert entry.resource_json is not None and f'"{gender}"' in entry.resource_json
+
+            current = session.session.scalars(
+                select(CurrentResource).where(
+                    CurrentResource.resource_type == "patient", CurrentResource.resource_id == resource_id
+                )
+            ).one()
+            assert (current.version, current.entry_id, current.created_dt) == (version, entry.id, entry.created_dt)
+
+        # The history is partitioned by year, the entries are stored in the partition of this year
+        count = session.execute(text(f"select count(*) from resource_entry_{datetime.now().year}")).scalar_one()
+        assert count == 7
+
+
+def test_import_sends_a_flush(postgres_db: Database) -> None:
+    config = get_config()
+    config.database.invalidation_enabled = True
+    listener = postgres_db.engine.raw_connection()
+    try:
+        connection = listener.driver_connection
+        connection.autocommit = True  # type: ignore[union-attr]
+        connection.execute(f"listen {INVALIDATION_CHANNEL}")  # type: ignore[union-attr]
+
+        with postgres_db.get_db_session() as session:
+            writes = [patient(str(n), "male", uuid.uuid4()) for n in range(3)]
+            assert session.get_repository(ResourceEntryRepository).import_many(writes) == 3
+
+        notifications = list(connection.notifies(timeout=5, stop_after=1))  # type: ignore[union-attr]
+    finally:
+        config.database.invalidation_enabled = False
+        listener.close()
+
+    assert [Invalidation.decode(n.payload) for n in notifications] == [Invalidation(flush=True)]
@@ -7,7 +7,7 @@ from app.services.models.create_referral_request_body import CreateReferralReque
 from app.services.nvi_api_service import NVIAPIService
 
 
-@patch("app.services.nvi_api_service.requests.post")
+@patch("app.services.nvi_api_service.requests.Session.post")
 def test_update_nvi_success(post_mock: MagicMock) -> None:
     post_mock.return_value.status_code = 200
     post_mock.return_value.json.return_value = {
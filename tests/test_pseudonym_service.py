@@ -0,0 +1,81 @@
+import asyncio
+import uuid
+from unittest.mock import MagicMock, patch
+
+from app.cache import TtlLruCache
+from app.data import Pseudonym
+from app.services.pseudonym_service import (
+    AsyncCachedPseudonymService,
+    AsyncPseudonymService,
+    CachedPseudonymService,
+    PseudonymService,
+    PseudonymServiceInterface,
+)
+
+
+def test_cached_exchange_hits_inner_service_once() -> None:
+    inner = MagicMock(spec=PseudonymServiceInterface)
+    inner.exchange.side_effect = lambda _p, _id: Pseudonym(uuid.uuid4())
+    service = CachedPseudonymService(inner, ttl=60, max_size=10)
+
+    pseudonym = Pseudonym(uuid.uuid4())
+    first = service.exchange(pseudonym, "1234")
+    second = service.exchange(pseudonym, "1234")
+
+    assert str(first) == str(second)
+    assert inner.exchange.call_count == 1
+
+    # A different provider is a different cache key
+    service.exchange(pseudonym, "5678")
+    assert inner.exchange.call_count == 2
+
+
+def test_cache_ttl_expiry() -> None:
+    now = [0.0]
+    cache: TtlLruCache[str, int] = TtlLruCache(max_size=10, ttl=5, clock=lambda: now[0])
+
+    cache.set("foo", 1)
+    assert cache.get("foo") == 1
+
+    now[0] = 5.0
+    assert cache.get("foo") is None
+    assert len(cache) == 0
+
+
+def test_cache_lru_eviction() -> None:
+    cache: TtlLruCache[str, int] = TtlLruCache(max_size=2)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+@patch("app.services.pseudonym_service.create_http_session")
+def test_exchange_reuses_pooled_session(create_session_mock: MagicMock) -> None:
+    new_pseudonym = str(uuid.uuid4())
+    session = create_session_mock.return_value
+    session.post.return_value.status_code = 200
+    session.post.return_value.json.return_value = {"pseudonym": new_pseudonym}
+
+    service = PseudonymService("http://pseudonym-api", 1, None, None, None, pool_maxsize=4)
+    service.exchange(Pseudonym(uuid.uuid4()), "1234")
+    result = service.exchange(Pseudonym(uuid.uuid4()), "1234")
+
+    assert str(result) == new_pseudonym
+    assert create_session_mock.call_count == 1
+    assert create_session_mock.call_args.kwargs["pool_maxsize"] == 4
+    assert session.post.call_count == 2
+
+
+def test_async_service_closes_its_client() -> None:
+    service = AsyncPseudonymService(endpoint="http://localhost", timeout=1, mtls_cert=None, mtls_key=None, mtls_ca=None)
+    cached = AsyncCachedPseudonymService(service, ttl=60, max_size=10)
+
+    asyncio.run(cached.aclose())
+    assert service.client.is_closed
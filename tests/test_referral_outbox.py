@@ -0,0 +1,98 @@
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from sqlalchemy import event, select
+
+from app.config import set_config
+from app.data import DataDomain, Pseudonym, UraNumber
+from app.db.db import Database
+from app.db.models import ReferralOutboxEntry
+from app.metadata.db.db_adapter import DbMetadataAdapter
+from app.services.models.create_referral_request_body import CreateReferralRequestBody
+from app.services.nvi_api_service import NVIAPIServiceInterface
+from app.services.referral_outbox_service import ReferralOutboxService
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+
+def outbox_entries(db: Database) -> list[ReferralOutboxEntry]:
+    with db.get_db_session() as session:
+        return list(session.execute(select(ReferralOutboxEntry)).scalars().all())
+
+
+def store_with_referral(db: Database) -> None:
+    pseudonym = Pseudonym(uuid.uuid4())
+    referral = CreateReferralRequestBody(
+        pseudonym=pseudonym,
+        data_domain=DataDomain.BeeldBank,
+        ura_number=UraNumber("1234"),
+        requesting_uzi_number="00000000",
+    )
+    DbMetadataAdapter(db).update("Patient", "123", {"resourceType": "Patient", "id": "123"}, pseudonym, referral)
+
+
+def test_outbox_is_written_with_resource() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    store_with_referral(db)
+
+    entries = outbox_entries(db)
+    assert len(entries) == 1
+    assert entries[0].ura_number == "00001234"
+    assert entries[0].attempts == 0
+
+
+def test_dispatch_removes_delivered_referrals() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    store_with_referral(db)
+    store_with_referral(db)
+
+    nvi = MagicMock(spec=NVIAPIServiceInterface)
+    service = ReferralOutboxService(db, nvi, batch_size=10)
+
+    assert service.dispatch_batch() == 2
+    assert nvi.create_referral.call_count == 2
+    assert outbox_entries(db) == []
+
+
+def test_dispatch_reschedules_failed_referrals() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    store_with_referral(db)
+
+    nvi = MagicMock(spec=NVIAPIServiceInterface)
+    nvi.create_referral.side_effect = ValueError("Failed to create referral: 503")
+    service = ReferralOutboxService(db, nvi, batch_size=10, max_attempts=2, backoff=60)
+
+    assert service.dispatch_batch() == 1
+    entries = outbox_entries(db)
+    assert entries[0].attempts == 1
+    assert entries[0].last_error == "Failed to create referral: 503"
+    assert entries[0].failed is False
+
+    # The entry is not due until the backoff has passed
+    assert service.dispatch_batch() == 0
+
+
+def test_nvi_is_called_outside_a_transaction() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    store_with_referral(db)
+    commits = []
+    event.listen(db.engine, "commit", lambda connection: commits.append(datetime.now()))
+
+    def create_referral(body: CreateReferralRequestBody) -> None:
+        # The lease is committed before the call, and nothing is committed while it runs
+        assert len(commits) == 1
+        entries = outbox_entries(db)
+        assert entries[0].next_attempt_dt > datetime.now() + timedelta(seconds=200)
+        raise ValueError("Failed to create referral: 504")
+
+    nvi = MagicMock(spec=NVIAPIServiceInterface)
+    nvi.create_referral.side_effect = create_referral
+    service = ReferralOutboxService(db, nvi, batch_size=10, backoff=60, lease=300)
+
+    assert service.dispatch_batch() == 1
+    assert len(commits) == 2
+    entries = outbox_entries(db)
+    assert entries[0].attempts == 1
+    assert entries[0].next_attempt_dt < datetime.now() + timedelta(seconds=100)
@@ -0,0 +1,68 @@
+import uuid
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.config import set_config
+from app.data import DataDomain, Pseudonym, UraNumber
+from app.db.db import Database
+from app.services.models.create_referral_request_body import CreateReferralRequestBody
+from app.services.nvi_api_service import NVIAPIServiceInterface
+from app.services.referral_registry import ReferralRegistry, RegistryNVIAPIService
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+
+def create_body(pseudonym: Pseudonym) -> CreateReferralRequestBody:
+    return CreateReferralRequestBody(
+        pseudonym=pseudonym,
+        data_domain=DataDomain.BeeldBank,
+        ura_number=UraNumber("1234"),
+        requesting_uzi_number="00000000",
+    )
+
+
+def test_registered_referral_is_only_sent_once() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    inner = MagicMock(spec=NVIAPIServiceInterface)
+    service = RegistryNVIAPIService(inner, ReferralRegistry(db, cache_size=10))
+
+    pseudonym = Pseudonym(uuid.uuid4())
+    service.create_referral(create_body(pseudonym))
+    result = service.create_referral(create_body(pseudonym))
+
+    assert inner.create_referral.call_count == 1
+    assert result.pseudonym == str(pseudonym)
+
+    service.create_referral(create_body(Pseudonym(uuid.uuid4())))
+    assert inner.create_referral.call_count == 2
+
+
+def test_registry_falls_back_to_database() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    pseudonym = Pseudonym(uuid.uuid4())
+    ReferralRegistry(db, cache_size=10).register(create_body(pseudonym))
+
+    # A fresh registry has an empty cache, but finds the referral in the database
+    registry = ReferralRegistry(db, cache_size=10)
+    assert not registry.is_cached(create_body(pseudonym))
+    assert registry.is_registered(create_body(pseudonym))
+    assert registry.is_cached(create_body(pseudonym))
+
+    # Registering twice is a no-op
+    registry.register(create_body(pseudonym))
+
+
+def test_failed_referral_is_not_registered() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    inner = MagicMock(spec=NVIAPIServiceInterface)
+    inner.create_referral.side_effect = ValueError("Failed to create referral: 500")
+    registry = ReferralRegistry(db, cache_size=10)
+    service = RegistryNVIAPIService(inner, registry)
+
+    body = create_body(Pseudonym(uuid.uuid4()))
+    with pytest.raises(ValueError):
+        service.create_referral(body)
+
+    assert not registry.is_registered(body)
@@ -0,0 +1,34 @@
+import json
+import uuid
+from datetime import datetime
+
+from app.db.models import ResourceEntry
+from app.routers.resource import resource_content
+
+
+def create_entry(resource: dict[str, object], resource_json: str | None) -> ResourceEntry:
+    return ResourceEntry(
+        id=uuid.uuid4(),
+        resource_type="Patient",
+        resource_id="123",
+        resource=resource,
+        resource_json=resource_json,
+        version=1,
+        created_dt=datetime.now(),
+        deleted=False,
+    )
+
+
+def test_stored_json_is_returned_as_is() -> None:
+    # The stored serialization is returned without looking at the resource column
+    entry = create_entry({"resourceType": "Patient", "id": "999"}, '{"resourceType":"Patient","id":"123"}')
+
+    assert resource_content(entry) == '{"resourceType":"Patient","id":"123"}'
+    assert resource_content(entry, pretty=True) == json.dumps({"resourceType": "Patient", "id": "123"}, indent=2)
+
+
+def test_entries_without_stored_json_are_converted() -> None:
+    entry = create_entry({"resourceType": "Patient", "id": "123"}, None)
+
+    assert json.loads(resource_content(entry)) == {"resourceType": "Patient", "id": "123"}
+    assert json.loads(resource_content(entry, pretty=True)) == {"resourceType": "Patient", "id": "123"}
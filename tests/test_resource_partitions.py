@@ -0,0 +1,56 @@
+import argparse
+import uuid
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.config import set_config
+from app.cron.resource_partitions import ResourcePartitionsCommand
+from app.db.db import Database
+from app.db.repository.resource_entry import ResourceEntryRepository
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+# A year far enough ahead that the migrations did not create its partition
+FUTURE_YEAR = datetime.now().year + 20
+
+
+def count(db: Database, table: str) -> int:
+    with db.get_db_session() as session:
+        return int(session.execute(text(f"select count(*) from only {table}")).scalar_one())
+
+
+def test_partitions_are_created_ahead(postgres_db: Database) -> None:
+    command = ResourcePartitionsCommand(postgres_db)
+    assert command.run(argparse.Namespace(years_ahead=8)) == 0
+    # Running it again is a no-op
+    assert command.run(argparse.Namespace(years_ahead=8)) == 0
+
+    assert count(postgres_db, f"resource_entry_{datetime.now().year + 8}") == 0
+
+
+def test_entries_are_moved_out_of_the_default_partition(postgres_db: Database) -> None:
+    with postgres_db.get_db_session() as session:
+        session.execute(
+            text(
+                "insert into resource_entry (pseudonym, resource_type, resource_id, resource, version, created_dt) "
+                "values (:pseudonym, 'Patient', 'future', '{}', 1, :created_dt)"
+            ),
+            {"pseudonym": uuid.uuid4(), "created_dt": datetime(FUTURE_YEAR, 6, 1)},
+        )
+        session.commit()
+    assert count(postgres_db, "resource_entry_default") == 1
+
+    assert ResourcePartitionsCommand(postgres_db).run(argparse.Namespace(years_ahead=2)) == 0
+
+    assert count(postgres_db, "resource_entry_default") == 0
+    assert count(postgres_db, f"resource_entry_{FUTURE_YEAR}") == 1
+    with postgres_db.get_db_session() as session:
+        entry = session.get_repository(ResourceEntryRepository).find_by_resource("Patient", "future", 1)
+        assert entry is not None and entry.created_dt.year == FUTURE_YEAR
+
+
+def test_nothing_is_partitioned_on_sqlite() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    assert ResourcePartitionsCommand(db).run(argparse.Namespace(years_ahead=2)) == 0
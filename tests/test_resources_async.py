@@ -0,0 +1,89 @@
+import tempfile
+import unittest
+import uuid
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import inject
+from fastapi.testclient import TestClient
+
+from app import container
+from app.application import create_fastapi_app
+from app.config import set_config
+from app.container import setup_container
+from tests import test_resources
+from tests.test_config import get_test_config
+
+
+class TestAsyncApi(unittest.TestCase):
+    PATIENT_ID = "456"
+    PSEUDONYM = str(uuid.uuid4())
+
+    tmp_dir: tempfile.TemporaryDirectory[str]
+    client: TestClient
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+        # The async engine cannot share an in-memory database with the sync engine that creates the tables
+        config = get_test_config()
+        config.app.async_mode = True
+        config.database.dsn = f"sqlite:///{Path(cls.tmp_dir.name) / 'metadata.db'}"
+        set_config(config)
+
+        inject.clear()
+        cls.client = TestClient(create_fastapi_app())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        inject.clear()
+        set_config(get_test_config())
+        setup_container()
+        cls.tmp_dir.cleanup()
+
+    def test_http_clients_are_closed_on_shutdown(self) -> None:
+        pseudonym_service = container.get_async_pseudonym_service()
+        nvi_service = container.get_async_nvi_service()
+
+        with patch.object(pseudonym_service, "aclose", new_callable=AsyncMock) as close_pseudonym:
+            with patch.object(nvi_service, "aclose", new_callable=AsyncMock) as close_nvi:
+                with TestClient(self.client.app):
+                    close_pseudonym.assert_not_awaited()
+
+        close_pseudonym.assert_awaited_once()
+        close_nvi.assert_awaited_once()
+
+    def test_resources(self) -> None:
+        url = f"/resource/patient/{self.PATIENT_ID}"
+
+        response = self.client.put(
+            url=url,
+            content=test_resources.TestApi.get_patient_resource(self.PATIENT_ID).model_dump_json(),
+            params={"pseudonym": self.PSEUDONYM},
+        )
+        assert response.status_code == 201
+        assert response.headers["ETag"] == "1"
+
+        response = self.client.put(
+            url=url,
+            content=test_resources.TestApi.get_patient_resource(self.PATIENT_ID, "Jane").model_dump_json(),
+            params={"pseudonym": self.PSEUDONYM},
+            headers={"If-Match": "1"},
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] == "2"
+
+        response = self.client.get(url=url)
+        assert response.status_code == 200
+        assert response.json()["name"][0]["given"][0] == "Jane"
+
+        response = self.client.get(url=f"{url}/_history/1")
+        assert response.status_code == 200
+        assert response.json()["name"][0]["given"][0] == "John"
+
+        response = self.client.delete(url=url)
+        assert response.status_code == 204
+
+        response = self.client.get(url=url)
+        assert response.status_code == 410
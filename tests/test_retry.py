@@ -0,0 +1,173 @@
+import asyncio
+import time
+from typing import Any
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app import container
+from app.config import set_config
+from app.db.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    RetryExhaustedError,
+    RetryPolicy,
+    deadline,
+)
+from tests import test_resources
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Flaky:
+    """
+    Fails with an OperationalError the given number of times before succeeding
+    """
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OperationalError("select 1", {}, Exception("connection lost"))
+        return "ok"
+
+
+def create_policy(clock: Clock, backoff: list[float], deadline: float = 10.0, threshold: int = 5) -> RetryPolicy:
+    breaker = CircuitBreaker(failure_threshold=threshold, reset_timeout=30.0, clock=clock)
+    return RetryPolicy(backoff, deadline, breaker, clock=clock, sleep=clock.sleep)
+
+
+def test_operational_errors_are_retried() -> None:
+    clock = Clock()
+    policy = create_policy(clock, [1.0, 2.0, 4.0])
+    flaky = Flaky(failures=2)
+
+    assert policy.call(flaky) == "ok"
+    assert flaky.calls == 3
+    assert len(clock.sleeps) == 2
+    assert policy.breaker.failures == 0
+
+
+def test_other_database_errors_are_not_retried() -> None:
+    clock = Clock()
+    policy = create_policy(clock, [1.0, 2.0])
+
+    def fail() -> None:
+        raise IntegrityError("insert", {}, Exception("duplicate key"))
+
+    with pytest.raises(IntegrityError):
+        policy.call(fail)
+    assert clock.sleeps == []
+
+
+def test_retries_stop_at_the_deadline() -> None:
+    clock = Clock()
+    policy = create_policy(clock, [1.0, 2.0, 4.0, 8.0], deadline=5.0)
+    flaky = Flaky(failures=10)
+
+    with pytest.raises(RetryExhaustedError):
+        policy.call(flaky)
+    # The third retry (after 4 seconds) would end past the deadline
+    assert flaky.calls == 3
+    assert clock.now <= 5.0
+
+
+def test_request_deadline_limits_retries() -> None:
+    policy = create_policy(Clock(), [0.5, 0.5], deadline=10.0)
+    # The request deadline is set on the real clock
+    policy.clock = time.monotonic
+    flaky = Flaky(failures=10)
+
+    with deadline(0.1):
+        with pytest.raises(RetryExhaustedError):
+            policy.call(flaky)
+    assert flaky.calls == 1
+
+
+def test_breaker_opens_and_recovers() -> None:
+    clock = Clock()
+    policy = create_policy(clock, [], threshold=2)
+
+    for _ in range(2):
+        with pytest.raises(RetryExhaustedError):
+            policy.call(Flaky(failures=1))
+
+    flaky = Flaky(failures=0)
+    with pytest.raises(CircuitOpenError) as e:
+        policy.call(flaky)
+    assert e.value.retry_after == 30.0
+    assert flaky.calls == 0
+
+    # After the reset timeout a failing probe opens the breaker again
+    clock.now += 30.0
+    with pytest.raises(RetryExhaustedError):
+        policy.call(Flaky(failures=1))
+    with pytest.raises(CircuitOpenError):
+        policy.call(flaky)
+
+    # A successful probe closes it
+    clock.now += 30.0
+    assert policy.call(flaky) == "ok"
+    assert policy.breaker.state == CircuitState.closed
+
+
+def test_half_open_breaker_allows_a_single_probe() -> None:
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0, clock=clock)
+    breaker.record_failure()
+    clock.now += 30.0
+
+    breaker.allow()
+    assert breaker.state == CircuitState.half_open
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_async_retries() -> None:
+    policy = create_policy(Clock(), [0.0, 0.0])
+    flaky = Flaky(failures=2)
+    rollbacks = []
+
+    async def call() -> str:
+        return flaky()
+
+    async def rollback() -> None:
+        rollbacks.append(True)
+
+    assert asyncio.run(policy.call_async(call, rollback)) == "ok"
+    assert flaky.calls == 3
+    assert len(rollbacks) == 2
+
+
+def test_open_breaker_returns_service_unavailable() -> None:
+    class UnavailableService:
+        def search(self, *args: Any) -> None:
+            raise CircuitOpenError(12.5)
+
+    test_resources.app.dependency_overrides[container.get_request_metadata_service] = lambda: UnavailableService()
+    try:
+        response = test_resources.client.get("/resource/Patient/1")
+    finally:
+        test_resources.app.dependency_overrides.clear()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "13"
+    assert response.json()["issue"][0]["code"] == "transient"
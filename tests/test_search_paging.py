@@ -0,0 +1,69 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.config import set_config
+from app.data import PageCursor, Pseudonym
+from app.db.db import Database
+from app.metadata.db.db_adapter import DbMetadataAdapter
+from app.metadata.metadata_service import MetadataService
+from tests import test_resources
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+
+def create_service(pseudonym: Pseudonym, count: int) -> MetadataService:
+    service = MetadataService(DbMetadataAdapter(Database("sqlite:///:memory:", create_tables=True)))
+    for resource_id in range(count):
+        service.update("Patient", str(resource_id), {"resourceType": "Patient", "id": str(resource_id)}, pseudonym)
+
+    return service
+
+
+def test_page_cursor() -> None:
+    cursor = PageCursor(datetime.now(), uuid.uuid4(), backwards=True)
+    assert PageCursor.decode(cursor.encode()) == cursor
+
+    with pytest.raises(ValueError):
+        PageCursor.decode("not-a-cursor")
+
+
+def test_paging() -> None:
+    pseudonym = Pseudonym(str(uuid.uuid4()))
+    service = create_service(pseudonym, 7)
+
+    page = service.page_by_pseudonym(pseudonym, "Patient", 3)
+    assert [e.resource_id for e in page.entries] == ["0", "1", "2"]
+    assert page.previous_cursor is None
+    assert page.next_cursor is not None
+
+    page = service.page_by_pseudonym(pseudonym, "Patient", 3, page.next_cursor)
+    assert [e.resource_id for e in page.entries] == ["3", "4", "5"]
+    assert page.previous_cursor is not None
+    assert page.next_cursor is not None
+    next_cursor = page.next_cursor
+
+    page = service.page_by_pseudonym(pseudonym, "Patient", 3, page.previous_cursor)
+    assert [e.resource_id for e in page.entries] == ["0", "1", "2"]
+    assert page.previous_cursor is None
+
+    page = service.page_by_pseudonym(pseudonym, "Patient", 3, next_cursor)
+    assert [e.resource_id for e in page.entries] == ["6"]
+    assert page.next_cursor is None
+    assert page.previous_cursor is not None
+
+
+def test_paged_search() -> None:
+    response = test_resources.client.get(
+        "/resource/patient/_search", params={"pseudonym": str(uuid.uuid4()), "_count": 10}
+    )
+    assert response.status_code == 200
+    assert "total" not in response.json()
+    assert response.json()["link"][0]["relation"] == "self"
+
+    response = test_resources.client.get(
+        "/resource/patient/_search", params={"pseudonym": str(uuid.uuid4()), "_count": 10, "_cursor": "foo"}
+    )
+    assert response.status_code == 400
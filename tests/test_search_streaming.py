@@ -0,0 +1,41 @@
+import json
+import uuid
+
+from app.config import set_config
+from app.data import Pseudonym
+from app.db.db import Database
+from app.metadata.db.db_adapter import DbMetadataAdapter
+from app.metadata.metadata_service import MetadataService
+from app.routers.resource import create_search_bundle, stream_search_bundle
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+
+def create_service() -> MetadataService:
+    return MetadataService(DbMetadataAdapter(Database("sqlite:///:memory:", create_tables=True)))
+
+
+def test_streamed_bundle_equals_search_bundle() -> None:
+    service = create_service()
+    pseudonym = Pseudonym(str(uuid.uuid4()))
+    for resource_id in ["1", "2", "3"]:
+        service.update("Patient", resource_id, {"resourceType": "Patient", "id": resource_id}, pseudonym)
+
+    streamed = json.loads("".join(stream_search_bundle(service.stream_by_pseudonym(pseudonym, "Patient", 2))))
+    expected = create_search_bundle(service.search_by_pseudonym(pseudonym, "Patient"))
+
+    assert streamed["total"] == 3
+    assert streamed["type"] == "searchset"
+    assert streamed["entry"] == json.loads(json.dumps(expected["entry"]))
+
+
+def test_streamed_bundle_without_results() -> None:
+    service = create_service()
+
+    streamed = json.loads(
+        "".join(stream_search_bundle(service.stream_by_pseudonym(Pseudonym(str(uuid.uuid4())), "Patient", 2)))
+    )
+
+    assert streamed["total"] == 0
+    assert streamed["entry"] == []
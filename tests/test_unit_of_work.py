@@ -0,0 +1,165 @@
+import uuid
+from typing import Any, Iterator
+from unittest.mock import MagicMock
+
+import inject
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import InvalidRequestError
+
+from app import container
+from app.config import set_config
+from app.data import Pseudonym
+from app.db.db import Database
+from app.db.session import DbSession
+from app.metadata.caching_adapter import CachingMetadataAdapter
+from app.metadata.db.db_adapter import DbMetadataAdapter
+from app.metadata.metadata_service import MetadataService
+from app.services.nvi_api_service import NVIAPIServiceInterface
+from tests import test_resources
+from tests.test_config import get_test_config
+
+set_config(get_test_config())
+
+
+def patient(resource_id: str, gender: str) -> dict[str, Any]:
+    return {"resourceType": "Patient", "id": resource_id, "gender": gender}
+
+
+def count_checkouts(db: Database) -> list[int]:
+    checkouts = [0]
+
+    def on_checkout(*args: Any) -> None:
+        checkouts[0] += 1
+
+    event.listen(db.engine, "checkout", on_checkout)
+    return checkouts
+
+
+def test_operations_share_a_single_connection() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    service = MetadataService(DbMetadataAdapter(db))
+    service.update("Patient", "1", patient("1", "male"), Pseudonym(uuid.uuid4()))
+    checkouts = count_checkouts(db)
+
+    assert service.search("Patient", "1", 0) is not None
+    service.delete("Patient", "1")
+    assert checkouts[0] == 2
+
+    with db.unit_of_work() as db_session:
+        request_service = service.with_session(db_session)
+        entry = request_service.search("Patient", "1", 0)
+        assert entry is not None and entry.deleted
+        request_service.update("Patient", "1", patient("1", "female"), Pseudonym(uuid.uuid4()))
+        request_service.delete("Patient", "1")
+    assert checkouts[0] == 3
+
+
+def test_unit_of_work_is_committed() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    service = MetadataService(DbMetadataAdapter(db))
+
+    with db.unit_of_work() as db_session:
+        request_service = service.with_session(db_session)
+        # The read begins the transaction, the writes join it
+        assert request_service.search("Patient", "1", 0) is None
+        request_service.update("Patient", "1", patient("1", "male"), Pseudonym(uuid.uuid4()))
+        request_service.update("Patient", "2", patient("2", "male"), Pseudonym(uuid.uuid4()))
+
+    entry = service.search("Patient", "2", 0)
+    assert entry is not None and entry.version == 1
+
+
+def test_unit_of_work_is_rolled_back_on_error() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    service = MetadataService(DbMetadataAdapter(db))
+
+    with pytest.raises(RuntimeError):
+        with db.unit_of_work() as db_session:
+            request_service = service.with_session(db_session)
+            assert request_service.search("Patient", "1", 0) is None
+            request_service.update("Patient", "1", patient("1", "male"), Pseudonym(uuid.uuid4()))
+            raise RuntimeError("request failed")
+
+    assert service.search("Patient", "1", 0) is None
+
+
+def test_writes_join_the_unit_of_work() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    service = MetadataService(DbMetadataAdapter(db))
+
+    with db.unit_of_work() as db_session:
+        # Without a read first, the write still joins the transaction of the unit of work
+        service.with_session(db_session).update("Patient", "1", patient("1", "male"), Pseudonym(uuid.uuid4()))
+        assert db_session.session.in_transaction()
+    assert not db_session.session.in_transaction()
+
+
+def test_begin_after_a_read_outside_a_unit_of_work_fails() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+
+    with db.get_db_session() as db_session:
+        db_session.execute(text("select 1"))
+        # The write would otherwise be left uncommitted
+        with pytest.raises(InvalidRequestError):
+            with db_session.begin():
+                pass
+
+
+def test_cache_is_invalidated_after_commit() -> None:
+    db = Database("sqlite:///:memory:", create_tables=True)
+    adapter = CachingMetadataAdapter(DbMetadataAdapter(db), max_size=100, max_bytes=1024 * 1024)
+    service = MetadataService(adapter)
+    service.update("Patient", "1", patient("1", "male"), Pseudonym(uuid.uuid4()))
+
+    with db.unit_of_work() as db_session:
+        bound = adapter.with_session(db_session)
+        assert bound.search("Patient", "1", 0) is not None
+        old_version = adapter.cache.get(("patient", "1", 0))
+        assert old_version is not None
+
+        MetadataService(bound).update("Patient", "1", patient("1", "female"), Pseudonym(uuid.uuid4()))
+        # Another request reads and caches the old version before the update is committed
+        adapter.cache.set(("patient", "1", 0), old_version)
+
+    entry = service.search("Patient", "1", 0)
+    assert entry is not None and entry.version == 2
+    # The bound adapter shares the cache and its statistics
+    assert (adapter.hits, adapter.misses) == (0, 2)
+
+
+def test_resource_is_committed_before_the_referral_is_sent() -> None:
+    sessions: list[DbSession] = []
+
+    def unit_of_work() -> Iterator[DbSession]:
+        with inject.instance(Database).unit_of_work() as db_session:
+            sessions.append(db_session)
+            # Begin the request transaction up front, like a read before the write does
+            db_session.execute(text("select 1"))
+            yield db_session
+
+    def create_referral(referral: Any) -> None:
+        assert not sessions[0].session.in_transaction()
+
+    nvi = MagicMock(spec=NVIAPIServiceInterface)
+    nvi.create_referral.side_effect = create_referral
+    test_resources.app.dependency_overrides[container.get_unit_of_work] = unit_of_work
+    test_resources.app.dependency_overrides[container.get_nvi_service] = lambda: nvi
+    try:
+        response = test_resources.client.put(
+            f"/resource/Patient/referral-1?pseudonym={uuid.uuid4()}",
+            json={"resourceType": "Patient", "id": "referral-1"},
+        )
+        assert response.status_code == 201
+
+        entry = {
+            "resource": {"resourceType": "Patient", "id": "referral-2"},
+            "request": {"method": "PUT", "url": f"Patient/referral-2?pseudonym={uuid.uuid4()}"},
+        }
+        sessions.clear()
+        response = test_resources.client.post("/", json={"resourceType": "Bundle", "type": "batch", "entry": [entry]})
+        assert response.json()["entry"][0]["response"]["status"] == "201 Created"
+    finally:
+        test_resources.app.dependency_overrides.clear()
+
+    assert nvi.create_referral.call_count == 2
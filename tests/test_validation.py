@@ -0,0 +1,56 @@
+from typing import Any
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app import container
+from app.metadata.validation import ValidationExecutor
+from app.metadata.validators.Validator import InvalidResourceError, ValidationError
+from tests import test_resources
+
+
+def create_resources() -> list[tuple[str, str, dict[str, Any]]]:
+    return [
+        ("Patient", "1", {"resourceType": "Patient", "id": "1"}),
+        ("Patient", "2", {"resourceType": "Patient", "id": "3"}),
+        ("Patient", "3", {"resourceType": "ImagingStudy", "id": "3"}),
+        ("Patient", "4", {"resourceType": "Patient", "id": "4", "birthDate": "not-a-date"}),
+        ("Patient", "5", {"resourceType": "Patient", "id": "5"}),
+        ("Patient", "6", {"resourceType": "Patient", "id": 6}),
+        ("Patient", "7", {"resourceType": ["Patient"], "id": "7"}),
+    ]
+
+
+def assert_results(executor: ValidationExecutor) -> None:
+    results = executor.validate_many(create_resources())
+
+    assert [result.resource_json is not None for result in results] == [True, False, False, False, True, False, False]
+    assert results[0].resource_json == '{"resourceType":"Patient","id":"1"}'
+    assert isinstance(results[1].error, ValidationError)
+    assert isinstance(results[2].error, InvalidResourceError)
+    assert isinstance(results[3].error, InvalidResourceError)
+    # Fields of the wrong type fail only their own resource
+    assert isinstance(results[5].error, ValidationError)
+    assert isinstance(results[6].error, ValidationError)
+
+
+def test_validate_inline() -> None:
+    assert_results(ValidationExecutor())
+
+
+def test_validate_in_workers() -> None:
+    executor = ValidationExecutor(workers=2, chunk_size=2)
+    try:
+        assert_results(executor)
+    finally:
+        executor.shutdown()
+
+
+def test_workers_are_shut_down_with_the_app() -> None:
+    executor = container.get_validation_executor()
+
+    with patch.object(executor, "shutdown") as shutdown:
+        with TestClient(test_resources.app):
+            shutdown.assert_not_called()
+
+    shutdown.assert_called_once()